@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the scraper
+
+Usage:
+    python benchmark.py extraction --listings 5 --rounds 3
+    python benchmark.py scrape --limit 100 --concurrency 1 2 4 --latency-ms 150 --bandwidth-kbps 512
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+import urllib.parse
+
+from camoufox import AsyncCamoufox
+
+import main as scraper
+from extraction import extract_listing, extract_listing_per_element
+from main import build_browser_options, open_listings_page
+from replay_server import ReplayServer
+from timing import current_timer
+
+
+def print_timings(label, timings):
+    """Print mean/p50/max of a list of durations in seconds"""
+    print(
+        f"{label:<14} mean {statistics.mean(timings) * 1000:8.1f} ms | "
+        f"p50 {statistics.median(timings) * 1000:8.1f} ms | "
+        f"max {max(timings) * 1000:8.1f} ms")
+
+
+async def benchmark_extraction(listings=5, rounds=3, proxy=None):
+    """Compare single-evaluate extraction against the per-element path
+
+    Each listing page is loaded once, then both extractors run ``rounds``
+    times against the same DOM so only extraction cost is measured.
+    """
+    evaluate_timings = []
+    per_element_timings = []
+    mismatches = 0
+
+    async with AsyncCamoufox(**build_browser_options(proxy)) as browser:
+        page = await browser.new_page()
+        await open_listings_page(page)
+
+        links = await page.query_selector_all("td.searchResultsTitleValue > a.classifiedTitle")
+        listing_urls = []
+        for link in links[:listings]:
+            href = await link.get_attribute("href")
+            if href:
+                listing_urls.append(urllib.parse.urljoin(scraper.BASE_URL, href))
+
+        for listing_url in listing_urls:
+            await page.goto(listing_url, timeout=60000)
+            await page.wait_for_selector("#classifiedDetail", timeout=30000)
+
+            for _ in range(rounds):
+                start = time.perf_counter()
+                fast = await extract_listing(page, listing_url)
+                evaluate_timings.append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                slow = await extract_listing_per_element(page, listing_url)
+                per_element_timings.append(time.perf_counter() - start)
+
+            if fast != slow:
+                mismatches += 1
+                print(f"⚠️  Extractors disagree on {listing_url}")
+
+    if not evaluate_timings:
+        print("No listings were benchmarked")
+        return
+
+    print(f"\n{'='*80}")
+    print(f"📊 Extraction benchmark: {len(listing_urls)} listings x {rounds} rounds")
+    print_timings("evaluate", evaluate_timings)
+    print_timings("per-element", per_element_timings)
+    print(
+        f"⚡ Speedup: {statistics.mean(per_element_timings) / statistics.mean(evaluate_timings):.1f}x")
+    print(f"🔍 Mismatching listings: {mismatches}")
+    print(f"{'='*80}\n")
+
+
+def process_tree_rss(pid=None):
+    """Resident memory in bytes of a process and all its descendants
+
+    Reads /proc, so it only works on Linux; returns None elsewhere.
+    """
+    pid = pid or os.getpid()
+    children = {}
+    rss = {}
+    try:
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    # The command name may contain spaces, fields resume after ")"
+                    fields = f.read().rsplit(")", 1)[1].split()
+            except OSError:
+                continue
+            children.setdefault(int(fields[1]), []).append(int(entry))
+            rss[int(entry)] = int(fields[21]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return None
+
+    total = 0
+    stack = [pid]
+    while stack:
+        current = stack.pop()
+        total += rss.get(current, 0)
+        stack.extend(children.get(current, []))
+    return total
+
+
+async def sample_peak_rss(peak, interval=0.5):
+    """Keep ``peak["bytes"]`` at the highest process_tree_rss seen until cancelled"""
+    while True:
+        rss = process_tree_rss()
+        if rss is not None:
+            peak["bytes"] = max(peak["bytes"], rss)
+        await asyncio.sleep(interval)
+
+
+async def benchmark_run(limit, concurrency, engine, block_resources):
+    """One full run_scraper-equivalent run, measured from the outside"""
+    peak = {"bytes": 0}
+    sampler = asyncio.create_task(sample_peak_rss(peak))
+    start = time.perf_counter()
+    count = 0
+    try:
+        async for _ in scraper.iter_scraper(limit, concurrency=concurrency, engine=engine,
+                                            block_resources=block_resources):
+            count += 1
+    finally:
+        sampler.cancel()
+        await asyncio.gather(sampler, return_exceptions=True)
+    elapsed = time.perf_counter() - start
+
+    # iter_scraper installs its timer in our context, so it is still readable here
+    timer = current_timer.get()
+    launch = timer.samples.get("browser_launch", [None])[0]
+    first_results = timer.samples.get("results_page", [None])[0]
+    p50 = timer.percentile("listing", 50)
+    p95 = timer.percentile("listing", 95)
+    return {
+        "concurrency": concurrency,
+        "listings": count,
+        "seconds": round(elapsed, 2),
+        "listings_per_second": round(count / elapsed, 2) if elapsed else None,
+        "p50_listing_seconds": round(p50, 3) if p50 is not None else None,
+        "p95_listing_seconds": round(p95, 3) if p95 is not None else None,
+        "browser_launch_seconds": round(launch, 2) if launch is not None else None,
+        "first_results_page_seconds": round(first_results, 2) if first_results is not None else None,
+        "peak_rss_mb": round(peak["bytes"] / 1024 / 1024, 1) if peak["bytes"] else None,
+    }
+
+
+def print_scrape_results(results):
+    """Print one row per benchmark run"""
+    def fmt(value, spec):
+        return "-" if value is None else format(value, spec)
+
+    print(f"\n{'='*80}")
+    print(f"{'conc':>4} {'listings':>8} {'secs':>8} {'list/s':>7} {'p50 s':>7} {'p95 s':>7} "
+          f"{'launch s':>8} {'1st page s':>10} {'peak MB':>8}")
+    for result in results:
+        print(
+            f"{result['concurrency']:>4} {result['listings']:>8} {result['seconds']:>8.2f} "
+            f"{fmt(result['listings_per_second'], '7.2f')} {fmt(result['p50_listing_seconds'], '7.3f')} "
+            f"{fmt(result['p95_listing_seconds'], '7.3f')} {fmt(result['browser_launch_seconds'], '8.2f')} "
+            f"{fmt(result['first_results_page_seconds'], '10.2f')} {fmt(result['peak_rss_mb'], '8.1f')}")
+    print(f"{'='*80}\n")
+
+
+async def benchmark_scrape(limit=50, concurrency_levels=(1, 2, 4), engine="evaluate", block_resources=False,
+                           base_url=None, replay_options=None, output=None):
+    """End-to-end throughput across concurrency settings
+
+    Without ``base_url`` a local ReplayServer is started with
+    ``replay_options`` and the scraper is pointed at it; a fresh browser is
+    launched for every run so launch cost is part of each measurement.
+    """
+    replay = None
+    if base_url is None:
+        replay = ReplayServer(**(replay_options or {})).start()
+        base_url = replay.url
+        # Politeness spacing would cap every run at one listing per second
+        os.environ.setdefault("MIN_HOST_INTERVAL", "0")
+    scraper.set_base_url(base_url)
+    print(f"Benchmarking against {base_url}")
+
+    results = []
+    try:
+        for concurrency in concurrency_levels:
+            results.append(await benchmark_run(limit, concurrency, engine, block_resources))
+    finally:
+        if replay is not None:
+            replay.stop()
+
+    print_scrape_results(results)
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump({"base_url": base_url, "limit": limit, "engine": engine,
+                       "block_resources": block_resources, "replay": replay_options,
+                       "results": results}, f, indent=2)
+        print(f"Results written to {output}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scraper benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    extraction_parser = subparsers.add_parser(
+        "extraction", help="Compare extraction paths on live listing pages")
+    extraction_parser.add_argument("--listings", type=int, default=5)
+    extraction_parser.add_argument("--rounds", type=int, default=3)
+    extraction_parser.add_argument("--proxy", help="Proxy server URL")
+
+    scrape_parser = subparsers.add_parser(
+        "scrape", help="End-to-end throughput against the offline replay server")
+    scrape_parser.add_argument("--limit", type=int, default=50)
+    scrape_parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4])
+    scrape_parser.add_argument("--engine", choices=["evaluate", "html"], default="evaluate")
+    scrape_parser.add_argument("--block-resources", action="store_true")
+    scrape_parser.add_argument("--base-url", help="Target an already running server instead")
+    scrape_parser.add_argument("--listings", type=int, default=500, help="Listings the replay server has")
+    scrape_parser.add_argument("--latency-ms", type=float, default=0)
+    scrape_parser.add_argument("--jitter-ms", type=float, default=0)
+    scrape_parser.add_argument("--bandwidth-kbps", type=float, help="Throughput cap in KB/s")
+    scrape_parser.add_argument("--page-padding-kb", type=int, default=0)
+    scrape_parser.add_argument("--output", help="Write results as JSON to this file")
+
+    args = parser.parse_args()
+
+    if args.command == "extraction":
+        proxy = {"server": args.proxy} if args.proxy else None
+        asyncio.run(benchmark_extraction(args.listings, args.rounds, proxy))
+    elif args.command == "scrape":
+        replay_options = {
+            "listings": args.listings,
+            "latency_ms": args.latency_ms,
+            "jitter_ms": args.jitter_ms,
+            "bandwidth_kbps": args.bandwidth_kbps,
+            "page_padding_kb": args.page_padding_kb,
+        }
+        asyncio.run(benchmark_scrape(args.limit, args.concurrency, args.engine, args.block_resources,
+                                     args.base_url, replay_options, args.output))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+from camoufox import AsyncCamoufox
+
+from governor import HostSaturated
+from main import build_browser_options, new_session_page, open_listings_page
+from metrics import phase_seconds
+from resilience import SessionBlocked
+from session_cache import session_key
+
+
+class PooledBrowser:
+    """A launched Camoufox browser with a page that already passed Cloudflare"""
+
+    def __init__(self, camoufox, browser, page, slot=None, proxy=None, governor=None):
+        self.camoufox = camoufox
+        self.browser = browser
+        self.page = page
+        self.slot = slot
+        self.proxy = proxy
+        self.governor = governor
+        self.created_at = time.time()
+        self.uses = 0
+
+    @property
+    def age(self):
+        return time.time() - self.created_at
+
+    async def is_healthy(self):
+        """Check that the browser is still connected and the page responds"""
+        try:
+            if not self.browser.is_connected() or self.page.is_closed():
+                return False
+            await asyncio.wait_for(self.page.evaluate("1"), timeout=5)
+            return True
+        except Exception:
+            return False
+
+    async def close(self):
+        try:
+            await self.camoufox.__aexit__(None, None, None)
+        except Exception as e:
+            print(f"Error closing pooled browser: {str(e)}")
+        finally:
+            if self.governor is not None:
+                self.governor.release()
+
+
+class BrowserPool:
+    """Long-lived pool of pre-warmed Camoufox browsers
+
+    Browsers are launched and cleared through Cloudflare ahead of time, then
+    leased to scrapes and returned afterwards. A browser is recycled once it
+    has served ``max_uses`` leases, is older than ``max_age_minutes`` or
+    fails its health check. With a ``session_cache`` new browsers start from
+    a cached Cloudflare clearance when one is available.
+
+    With a ``proxy_pool`` each of the ``size`` slots gets a sticky proxy:
+    a recycled browser reuses its slot's proxy (and its clearance) until the
+    proxy is reported banned or unhealthy, then the slot rotates.
+
+    With a ``governor`` (ResourceGovernor) every pooled browser holds one of
+    its browser slots, so launches wait for memory, and scrapes waiting
+    for a lease count towards its queue of waiting scrapes.
+    """
+
+    def __init__(self, size=1, max_uses=20, max_age_minutes=30, proxy=None, session_cache=None,
+                 proxy_pool=None, governor=None):
+        self.size = size
+        self.max_uses = max_uses
+        self.max_age = max_age_minutes * 60
+        self.proxy = proxy
+        self.session_cache = session_cache
+        self.proxy_pool = proxy_pool
+        self.governor = governor
+        self._idle = asyncio.Queue()
+        self._tasks = set()
+        self._closed = False
+
+    async def _launch(self, slot):
+        """Launch a browser and warm it up on the listings page"""
+        proxy = self.proxy
+        if proxy is None and self.proxy_pool is not None:
+            proxy = self.proxy_pool.acquire(sticky_key=slot)
+
+        key = session_key(proxy)
+        session = self.session_cache.load(key) if self.session_cache else None
+        user_agent = session['user_agent'] if session else None
+
+        if self.governor is not None:
+            await self.governor.acquire(queue=False)
+        camoufox = AsyncCamoufox(**build_browser_options(proxy, user_agent))
+        launch_start = time.perf_counter()
+        try:
+            browser = await camoufox.__aenter__()
+        except BaseException:
+            if self.governor is not None:
+                self.governor.release()
+            raise
+        phase_seconds.observe(time.perf_counter() - launch_start, phase="browser_launch")
+        try:
+            page = await new_session_page(browser, session)
+            warm_start = time.perf_counter()
+            cleared = await open_listings_page(page, self.session_cache, key, warm=session is not None)
+            if self.proxy_pool is not None:
+                self.proxy_pool.report(proxy, ok=cleared, latency=time.perf_counter() - warm_start,
+                                       banned=not cleared)
+            if not cleared:
+                if self.proxy_pool is not None:
+                    raise Exception(f"Proxy {proxy['server']} could not pass Cloudflare")
+                print("Warm-up could not confirm Cloudflare clearance, browser kept anyway")
+        except BaseException:
+            # Also when stop() cancels the warm-up, or the Firefox process and its slot leak
+            try:
+                await camoufox.__aexit__(None, None, None)
+            finally:
+                if self.governor is not None:
+                    self.governor.release()
+            raise
+        return PooledBrowser(camoufox, browser, page, slot, proxy, self.governor)
+
+    async def _replenish(self, slot, retry_delay=10):
+        """Launch a replacement browser for ``slot`` and put it in the idle queue"""
+        while not self._closed:
+            try:
+                pooled = await self._launch(slot)
+            except Exception as e:
+                print(f"Failed to launch pooled browser: {str(e)}, retrying in {retry_delay}s...")
+                await asyncio.sleep(retry_delay)
+                continue
+
+            if self._closed:
+                await pooled.close()
+            else:
+                self._idle.put_nowait(pooled)
+            return
+
+    def _spawn_replacement(self, slot):
+        task = asyncio.create_task(self._replenish(slot))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def start(self):
+        """Start warming up ``size`` browsers in the background"""
+        for slot in range(self.size):
+            self._spawn_replacement(slot)
+
+    async def stop(self):
+        """Close every idle browser and cancel pending warm-ups"""
+        self._closed = True
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+        while not self._idle.empty():
+            await self._idle.get_nowait().close()
+
+    @property
+    def idle(self):
+        """Number of warm browsers waiting for a lease"""
+        return self._idle.qsize()
+
+    def _is_expired(self, pooled):
+        return pooled.uses >= self.max_uses or pooled.age >= self.max_age
+
+    async def _next_idle(self, timeout):
+        """Wait for an idle browser, raising HostSaturated if none frees up within ``timeout``"""
+        if self.governor is None or not self._idle.empty():
+            return await asyncio.wait_for(self._idle.get(), timeout=timeout)
+        async with self.governor.queued():
+            try:
+                return await asyncio.wait_for(self._idle.get(), timeout=timeout)
+            except asyncio.TimeoutError:
+                raise HostSaturated(f"No pooled browser became free within {timeout}s") from None
+
+    @asynccontextmanager
+    async def lease(self, timeout=180):
+        """Borrow a warm browser, returning or recycling it afterwards"""
+        while True:
+            pooled = await self._next_idle(timeout)
+            if not self._is_expired(pooled) and await pooled.is_healthy():
+                break
+            await pooled.close()
+            self._spawn_replacement(pooled.slot)
+
+        healthy = True
+        try:
+            yield pooled
+        except SessionBlocked:
+            # Cloudflare stopped trusting this browser, so it is not reused
+            healthy = False
+            raise
+        except Exception:
+            healthy = await pooled.is_healthy()
+            raise
+        finally:
+            pooled.uses += 1
+            if self._closed or not healthy or self._is_expired(pooled):
+                await pooled.close()
+                if not self._closed:
+                    self._spawn_replacement(pooled.slot)
+            else:
+                self._idle.put_nowait(pooled)
@@ -0,0 +1,285 @@
+import json
+import os
+import sqlite3
+import time
+import uuid
+
+
+class CheckpointNotFound(LookupError):
+    """No checkpoint with the requested ID"""
+
+
+class CheckpointInUse(Exception):
+    """The checkpoint belongs to a crawl that is still running"""
+
+
+class CrawlState:
+    """Where a crawl is: its current search and results page, and the listings done so far
+
+    iter_scraper keeps one per run, so a session replaced mid-run (see
+    resilience.SessionBlocked) carries on from the current results page
+    instead of walking the earlier ones again.
+    """
+
+    def __init__(self):
+        self.target_index = 0
+        self.offset = 0
+        self.pending = []
+        # URL -> index of the search that yielded it
+        self.done = {}
+        self.complete = False
+
+    def count(self, target_index=None):
+        """Listings done for a search, the current one by default"""
+        if target_index is None:
+            target_index = self.target_index
+        return sum(1 for index in self.done.values() if index == target_index)
+
+    def start_target(self, target_index):
+        self.target_index = target_index
+        self.offset = 0
+        self.pending = []
+
+    def start_page(self, offset, urls):
+        """A results page at row ``offset`` is being worked on; ``urls`` are its listings to fetch"""
+        self.offset = offset
+        self.pending = list(urls)
+
+    def record(self, listing):
+        url = listing["url"]
+        self.done[url] = self.target_index
+        if url in self.pending:
+            self.pending.remove(url)
+
+    @property
+    def resumed(self):
+        """Whether the crawl starts from earlier progress"""
+        return bool(self.done) or self.target_index > 0 or self.offset > 0
+
+
+class Checkpoint(CrawlState):
+    """CrawlState persisted in a CheckpointStore, with the listings scraped so far
+
+    Listings are written in batches of the store's ``interval``, and always
+    before the crawl moves to another results page, so after a crash only
+    listings of the current page are fetched again on resume.
+    """
+
+    def __init__(self, store, checkpoint_id, options, status="created", created_at=None):
+        super().__init__()
+        self.store = store
+        self.conn = store.conn
+        self.id = checkpoint_id
+        self.options = options
+        self.status = status
+        self.created_at = created_at or time.time()
+        self.complete = status == "completed"
+        self._buffer = []
+        self._next_seq = 0
+
+    def begin(self):
+        if self.id in self.store.active:
+            raise CheckpointInUse(f"Checkpoint {self.id} belongs to a crawl that is still running")
+        self.store.active.add(self.id)
+        self.status = "running"
+        self.save()
+
+    def results(self):
+        """Listings scraped by earlier runs of this crawl, in scrape order"""
+        rows = self.conn.execute(
+            "SELECT listing FROM checkpoint_results WHERE checkpoint_id = ? AND seq < ? ORDER BY seq",
+            (self.id, self._next_seq)).fetchall()
+        for (listing,) in rows:
+            yield json.loads(listing)
+
+    def start_target(self, target_index):
+        super().start_target(target_index)
+        self.save()
+
+    def start_page(self, offset, urls):
+        super().start_page(offset, urls)
+        self.save()
+
+    def record(self, listing):
+        super().record(listing)
+        self._buffer.append((self._next_seq, listing["url"], self.target_index, json.dumps(listing)))
+        self._next_seq += 1
+        if len(self._buffer) >= self.store.interval:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO checkpoint_results (checkpoint_id, seq, url, target_index, listing) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(self.id, *row) for row in self._buffer])
+            self._update()
+        self._buffer = []
+
+    def save(self):
+        """Flush the listings, then store the position"""
+        self.flush()
+        with self.conn:
+            self._update()
+
+    def _update(self):
+        self.conn.execute(
+            "UPDATE checkpoints SET status = ?, target_index = ?, page_offset = ?, pending = ?, updated_at = ? "
+            "WHERE id = ?",
+            (self.status, self.target_index, self.offset, json.dumps(self.pending), time.time(), self.id))
+
+    def finish(self, status):
+        """End this run of the crawl: "completed", or "interrupted" to resume later"""
+        self.status = status
+        self.complete = status == "completed"
+        try:
+            self.save()
+        finally:
+            self.store.active.discard(self.id)
+
+    def to_dict(self):
+        return {
+            "checkpoint_id": self.id,
+            "status": self.status,
+            "count": self._next_seq,
+            "target_index": self.target_index,
+            "offset": self.offset,
+            "pending": self.pending,
+            "options": self.options,
+            "created_at": self.created_at,
+        }
+
+
+class CheckpointStore:
+    """SQLite store of crawl checkpoints, so a crawl that dies can be resumed
+
+    A checkpoint holds the crawl's options (whatever the caller needs to
+    start it again), its position (search index, results page offset and
+    the listings pending on that page) and every listing scraped so far.
+    Checkpoints not updated for ``ttl_hours`` are pruned.
+    """
+
+    def __init__(self, path=None, interval=None, ttl_hours=None):
+        if path is None:
+            path = os.getenv("CHECKPOINT_DB_PATH", "data/checkpoints.db")
+        if interval is None:
+            interval = int(os.getenv("CHECKPOINT_INTERVAL", 10))
+        if ttl_hours is None:
+            ttl_hours = float(os.getenv("CHECKPOINT_TTL_HOURS", 72))
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.interval = max(1, interval)
+        self.ttl = ttl_hours * 3600
+        # Checkpoints of crawls running in this process
+        self.active = set()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                id TEXT PRIMARY KEY,
+                options TEXT NOT NULL,
+                status TEXT NOT NULL,
+                target_index INTEGER NOT NULL DEFAULT 0,
+                page_offset INTEGER NOT NULL DEFAULT 0,
+                pending TEXT NOT NULL DEFAULT '[]',
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS checkpoint_results (
+                checkpoint_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                url TEXT NOT NULL,
+                target_index INTEGER NOT NULL,
+                listing TEXT NOT NULL,
+                PRIMARY KEY (checkpoint_id, seq)
+            );
+        """)
+        self.conn.commit()
+
+    def create(self, options=None):
+        """Start a checkpoint for a new crawl started with ``options``"""
+        self.prune()
+        now = time.time()
+        checkpoint = Checkpoint(self, uuid.uuid4().hex, options or {}, created_at=now)
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO checkpoints (id, options, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (checkpoint.id, json.dumps(options or {}), checkpoint.status, now, now))
+        return checkpoint
+
+    def open(self, checkpoint_id):
+        """Checkpoint ``checkpoint_id`` with its saved position, to resume it"""
+        if checkpoint_id in self.active:
+            raise CheckpointInUse(f"Checkpoint {checkpoint_id} belongs to a crawl that is still running")
+        row = self.conn.execute(
+            "SELECT options, status, target_index, page_offset, pending, created_at FROM checkpoints WHERE id = ?",
+            (checkpoint_id,)).fetchone()
+        if row is None:
+            raise CheckpointNotFound(f"No checkpoint with ID {checkpoint_id}")
+        options, status, target_index, offset, pending, created_at = row
+        checkpoint = Checkpoint(self, checkpoint_id, json.loads(options), status, created_at)
+        checkpoint.target_index = target_index
+        checkpoint.offset = offset
+        checkpoint.pending = json.loads(pending)
+        done = self.conn.execute(
+            "SELECT url, target_index FROM checkpoint_results WHERE checkpoint_id = ? ORDER BY seq",
+            (checkpoint_id,)).fetchall()
+        checkpoint.done = dict(done)
+        checkpoint._next_seq = len(done)
+        return checkpoint
+
+    def get(self, checkpoint_id):
+        """Summary of a checkpoint, or None"""
+        row = self.conn.execute(
+            "SELECT c.status, c.target_index, c.page_offset, c.pending, c.options, c.created_at, c.updated_at, "
+            "(SELECT COUNT(*) FROM checkpoint_results r WHERE r.checkpoint_id = c.id) "
+            "FROM checkpoints c WHERE c.id = ?", (checkpoint_id,)).fetchone()
+        if row is None:
+            return None
+        status, target_index, offset, pending, options, created_at, updated_at, count = row
+        return {
+            "checkpoint_id": checkpoint_id,
+            # A "running" checkpoint no crawl holds was left behind by a crash
+            "status": status if status != "running" or checkpoint_id in self.active else "interrupted",
+            "count": count,
+            "target_index": target_index,
+            "offset": offset,
+            "pending": json.loads(pending),
+            "options": json.loads(options),
+            "created_at": created_at,
+            "updated_at": updated_at,
+        }
+
+    def list(self, limit=50):
+        """Summaries of the most recently updated checkpoints"""
+        rows = self.conn.execute(
+            "SELECT id FROM checkpoints ORDER BY updated_at DESC LIMIT ?", (limit,)).fetchall()
+        return [self.get(checkpoint_id) for (checkpoint_id,) in rows]
+
+    def delete(self, checkpoint_id):
+        """Forget a checkpoint; False if it didn't exist"""
+        if checkpoint_id in self.active:
+            raise CheckpointInUse(f"Checkpoint {checkpoint_id} belongs to a crawl that is still running")
+        with self.conn:
+            self.conn.execute("DELETE FROM checkpoint_results WHERE checkpoint_id = ?", (checkpoint_id,))
+            deleted = self.conn.execute("DELETE FROM checkpoints WHERE id = ?", (checkpoint_id,)).rowcount
+        return deleted > 0
+
+    def prune(self):
+        """Delete checkpoints not updated for ``ttl_hours``"""
+        stale = [
+            checkpoint_id for (checkpoint_id,) in self.conn.execute(
+                "SELECT id FROM checkpoints WHERE updated_at < ?", (time.time() - self.ttl,)).fetchall()
+            if checkpoint_id not in self.active
+        ]
+        with self.conn:
+            self.conn.executemany("DELETE FROM checkpoint_results WHERE checkpoint_id = ?", [(i,) for i in stale])
+            self.conn.executemany("DELETE FROM checkpoints WHERE id = ?", [(i,) for i in stale])
+        return len(stale)
+
+    def close(self):
+        self.conn.close()
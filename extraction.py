@@ -0,0 +1,369 @@
+import re
+import urllib.parse
+
+
+# Selectors from SELECTORS.md, shared by every extraction path
+SELECTORS = {
+    'title': "#classifiedDetail > div.classifiedDetail > div.classifiedDetailTitle > h1",
+    'price': "#classifiedDetail > div.classifiedDetail > div.classifiedDetailContent > div.classifiedInfo > h3 > span",
+    'province': "#classifiedDetail > div.classifiedDetail > div.classifiedDetailContent > div.classifiedInfo > h2 > a:nth-child(1)",
+    'area': "#classifiedDetail > div.classifiedDetail > div.classifiedDetailContent > div.classifiedInfo > h2 > a:nth-child(3)",
+    'neighborhood': "#classifiedDetail > div.classifiedDetail > div.classifiedDetailContent > div.classifiedInfo > h2 > a:nth-child(5)",
+    'date': "#classifiedDetail > div.classifiedDetail > div.classifiedDetailContent > div.classifiedInfo > ul > li:nth-child(2) > span",
+    'description': "#classifiedDescription",
+    'individual_container': ".classifiedUserContent",
+    'individual_name_style': ".username-info-area style",
+    'individual_phones': "#phoneInfoPart li",
+    'agent_container': ".user-info-module",
+    'agent_store_name': ".user-info-store-name a",
+    'agent_name': ".user-info-agent h3",
+    'agent_phones': ".user-info-phones .dl-group",
+    'info_lists': "ul.classifiedInfoList",
+}
+
+# Sections of a detail page that can be picked with ``fields``, and the keys
+# each one fills; the URL is always there. Owner details (name from the CSS
+# ``content:`` trick, phone lists) are the costly part most callers skip.
+LISTING_FIELDS = {
+    "title": ("title",),
+    "price": ("price",),
+    "location": ("province", "area", "neighborhood"),
+    "date": ("date",),
+    "description": ("description",),
+    "owner": ("owner_type", "owner_name", "owner_phone", "store_name"),
+    "attributes": ("attributes",),
+}
+
+# Selectors for the rows of #searchResultsTable
+RESULT_SELECTORS = {
+    'rows': "#searchResultsTable tr.searchResultsItem",
+    'headers': "#searchResultsTable thead td",
+    'link': "td.searchResultsTitleValue > a.classifiedTitle",
+    'price': "td.searchResultsPriceValue",
+    'date': "td.searchResultsDateValue",
+    'location': "td.searchResultsLocationValue",
+    'attributes': "td.searchResultsAttributeValue",
+}
+
+
+# Runs inside the page and returns the listing in one protocol round trip.
+# Mirrors extract_listing_per_element field for field, skipping the
+# sections not in ``fields`` (all of them when null).
+EXTRACT_LISTING_JS = r"""
+({sel, fields}) => {
+    const text = (el) => (el ? (el.textContent || "").trim() : "N/A");
+    const one = (selector) => text(document.querySelector(selector));
+    const wants = (section) => !fields || fields.includes(section);
+    const listing = {};
+
+    if (wants("title")) listing.title = one(sel.title);
+    if (wants("price")) listing.price = one(sel.price);
+    if (wants("location")) {
+        listing.province = one(sel.province);
+        listing.area = one(sel.area);
+        listing.neighborhood = one(sel.neighborhood);
+    }
+    if (wants("date")) listing.date = one(sel.date);
+
+    if (wants("description")) {
+        listing.description = "N/A";
+        const descElement = document.querySelector(sel.description);
+        if (descElement && descElement.textContent) {
+            listing.description = descElement.textContent.trim().split(/\s+/).join(" ");
+        }
+    }
+
+    if (wants("owner")) {
+        let ownerName = "N/A";
+        let storeName = "N/A";
+        const phones = [];
+        listing.owner_type = "N/A";
+
+        if (document.querySelector(sel.individual_container)) {
+            listing.owner_type = "Individual";
+
+            const style = document.querySelector(sel.individual_name_style);
+            const styleContent = style ? style.textContent : "";
+            if (styleContent && styleContent.includes("content:")) {
+                const match = styleContent.match(/content:\s*["']([^"']+)["']/);
+                if (match) ownerName = match[1].trim();
+            }
+
+            for (const item of document.querySelectorAll(sel.individual_phones)) {
+                const type = item.querySelector("strong");
+                const number = item.querySelector("span[data-content]");
+                if (type && number) {
+                    const typeText = type.textContent;
+                    const numberText = number.getAttribute("data-content");
+                    if (typeText && numberText) phones.push(`${typeText.trim()}: ${numberText.trim()}`);
+                }
+            }
+        } else if (document.querySelector(sel.agent_container)) {
+            listing.owner_type = "Agent";
+
+            const store = document.querySelector(sel.agent_store_name);
+            if (store) storeName = (store.textContent || "").trim() || "N/A";
+
+            const agent = document.querySelector(sel.agent_name);
+            if (agent) ownerName = (agent.textContent || "").trim() || "N/A";
+
+            for (const group of document.querySelectorAll(sel.agent_phones)) {
+                const type = group.querySelector("dt");
+                const number = group.querySelector("dd");
+                if (type && number && type.textContent && number.textContent) {
+                    phones.push(`${type.textContent.trim()}: ${number.textContent.trim()}`);
+                }
+            }
+        }
+        listing.owner_name = ownerName;
+        listing.owner_phone = phones.length ? phones.join(" | ") : "N/A";
+        listing.store_name = storeName;
+    }
+
+    if (wants("attributes")) {
+        const attributes = {};
+        for (const list of document.querySelectorAll(sel.info_lists)) {
+            for (const item of list.querySelectorAll("li")) {
+                const label = item.querySelector("strong");
+                const value = item.querySelector("span");
+                if (label && value && label.textContent && value.textContent) {
+                    attributes[label.textContent.trim()] = value.textContent.trim();
+                }
+            }
+        }
+        listing.attributes = attributes;
+    }
+
+    return listing;
+}
+"""
+
+
+EXTRACT_RESULT_ROWS_JS = r"""
+(sel) => {
+    const clean = (text) => (text || "").trim().split(/\s+/).join(" ");
+    const cell = (row, selector) => {
+        const el = row.querySelector(selector);
+        return el ? clean(el.textContent) : "N/A";
+    };
+    // Text pieces of an element, e.g. "Nilüfer<br>Görükle" -> ["Nilüfer", "Görükle"]
+    const pieces = (el) => {
+        const out = [];
+        if (!el) return out;
+        const walker = document.createTreeWalker(el, NodeFilter.SHOW_TEXT);
+        while (walker.nextNode()) {
+            const text = clean(walker.currentNode.textContent);
+            if (text) out.push(text);
+        }
+        return out;
+    };
+    const headers = Array.from(document.querySelectorAll(sel.headers), (el) => clean(el.textContent));
+
+    const rows = [];
+    for (const row of document.querySelectorAll(sel.rows)) {
+        const link = row.querySelector(sel.link);
+        const href = link ? link.getAttribute("href") : null;
+        if (!href) continue;
+
+        // Attribute columns (m², rooms...) are named by their header cell
+        const attributes = {};
+        const cells = Array.from(row.children);
+        for (const el of row.querySelectorAll(sel.attributes)) {
+            const column = cells.indexOf(el);
+            const label = headers[column] || `column_${column}`;
+            attributes[label] = clean(el.textContent);
+        }
+        rows.push({
+            href: href,
+            title: clean(link.textContent) || "N/A",
+            price: cell(row, sel.price),
+            date: cell(row, sel.date),
+            location: pieces(row.querySelector(sel.location)),
+            attributes: attributes,
+        });
+    }
+    return rows;
+}
+"""
+
+
+def summary_from_row(row):
+    """Listing record built from its results-table row alone (summary mode)"""
+    location = row.get("location") or []
+    return {
+        "url": row["url"],
+        "title": row.get("title", "N/A"),
+        "price": row.get("price", "N/A"),
+        "area": location[0] if location else "N/A",
+        "neighborhood": location[1] if len(location) > 1 else "N/A",
+        "date": row.get("date", "N/A"),
+        "attributes": row.get("attributes") or {},
+        "summary": True,
+    }
+
+
+async def extract_result_rows(page, base_url):
+    """Extract the rows of the open results page with a single page.evaluate"""
+    rows = await page.evaluate(EXTRACT_RESULT_ROWS_JS, RESULT_SELECTORS)
+    return [
+        {"url": urllib.parse.urljoin(base_url, row.pop("href")), **row}
+        for row in rows
+    ]
+
+
+def wants(fields, section):
+    """Whether ``section`` (a LISTING_FIELDS key) is extracted; with ``fields`` None every one is"""
+    return fields is None or section in fields
+
+
+async def extract_listing(page, listing_url, fields=None):
+    """Extract a listing from the open detail page with a single page.evaluate
+
+    Only the LISTING_FIELDS sections in ``fields`` are extracted, all of
+    them by default.
+    """
+    listing_data = await page.evaluate(
+        EXTRACT_LISTING_JS, {"sel": SELECTORS, "fields": list(fields) if fields is not None else None})
+    return {"url": listing_url, **listing_data}
+
+
+async def _text_of(page, name):
+    element = await page.query_selector(SELECTORS[name])
+    return (await element.text_content()).strip() if element else "N/A"
+
+
+async def extract_listing_per_element(page, listing_url, fields=None):
+    """Extract a listing with one query per element (slower fallback path), see extract_listing"""
+    listing_data = {"url": listing_url}
+    if wants(fields, "title"):
+        listing_data["title"] = await _text_of(page, 'title')
+    if wants(fields, "price"):
+        listing_data["price"] = await _text_of(page, 'price')
+    if wants(fields, "location"):
+        for name in ("province", "area", "neighborhood"):
+            listing_data[name] = await _text_of(page, name)
+    if wants(fields, "date"):
+        listing_data["date"] = await _text_of(page, 'date')
+
+    if wants(fields, "description"):
+        # Extract clean text content from the entire classifiedDescription div
+        desc_element = await page.query_selector(SELECTORS['description'])
+        description = "N/A"
+        if desc_element:
+            description_text = await desc_element.text_content()
+            if description_text:
+                # Clean up the text: remove extra whitespace, newlines, etc.
+                description = " ".join(description_text.strip().split())
+        listing_data["description"] = description
+
+    if wants(fields, "owner"):
+        listing_data.update(await extract_owner_per_element(page))
+
+    if wants(fields, "attributes"):
+        # Scrape additional listing attributes from classifiedInfoList
+        listing_attributes = {}
+        classified_info_lists = await page.query_selector_all(SELECTORS['info_lists'])
+
+        for info_list in classified_info_lists:
+            list_items = await info_list.query_selector_all("li")
+
+            for item in list_items:
+                label_element = await item.query_selector("strong")
+                value_element = await item.query_selector("span")
+
+                if label_element and value_element:
+                    label = await label_element.text_content()
+                    value = await value_element.text_content()
+
+                    if label and value:
+                        listing_attributes[label.strip()] = value.strip()
+        listing_data["attributes"] = listing_attributes
+
+    return listing_data
+
+
+async def extract_owner_per_element(page):
+    """Owner type, name, phones and store of the open detail page, one query per element"""
+    # Check if it's an individual user or agent/real estate office
+    individual_user_container = await page.query_selector(SELECTORS['individual_container'])
+    agent_container = await page.query_selector(SELECTORS['agent_container'])
+
+    owner_name = "N/A"
+    owner_phone = "N/A"
+    owner_type = "N/A"
+    store_name = "N/A"
+
+    if individual_user_container:
+        # Individual user listing
+        owner_type = "Individual"
+
+        # Get username from CSS content property in style tag
+        try:
+            style_element = await page.query_selector(SELECTORS['individual_name_style'])
+            if style_element:
+                style_content = await style_element.text_content()
+                if style_content and 'content:' in style_content:
+                    # Extract content between quotes
+                    match = re.search(
+                        r'content:\s*["\']([^"\']+)["\']', style_content)
+                    if match:
+                        owner_name = match.group(1).strip()
+        except:
+            pass
+
+        # Get phone numbers from phoneInfoPart
+        phone_list = []
+        phone_items = await page.query_selector_all(SELECTORS['individual_phones'])
+
+        for item in phone_items:
+            phone_type_element = await item.query_selector("strong")
+            phone_number_element = await item.query_selector("span[data-content]")
+
+            if phone_type_element and phone_number_element:
+                phone_type = await phone_type_element.text_content()
+                phone_number = await phone_number_element.get_attribute("data-content")
+                if phone_type and phone_number:
+                    phone_list.append(
+                        f"{phone_type.strip()}: {phone_number.strip()}")
+
+        owner_phone = " | ".join(phone_list) if phone_list else "N/A"
+
+    elif agent_container:
+        # Agent/real estate office listing
+        owner_type = "Agent"
+
+        # Get store/agency name
+        store_name_element = await page.query_selector(SELECTORS['agent_store_name'])
+        if store_name_element:
+            store_name = await store_name_element.text_content()
+            store_name = store_name.strip() if store_name else "N/A"
+
+        # Get agent's personal name
+        agent_name_element = await page.query_selector(SELECTORS['agent_name'])
+        if agent_name_element:
+            owner_name = await agent_name_element.text_content()
+            owner_name = owner_name.strip() if owner_name else "N/A"
+
+        # Get phone numbers from dl-group divs
+        phone_list = []
+        phone_groups = await page.query_selector_all(SELECTORS['agent_phones'])
+
+        for group in phone_groups:
+            phone_type_element = await group.query_selector("dt")
+            phone_number_element = await group.query_selector("dd")
+
+            if phone_type_element and phone_number_element:
+                phone_type = await phone_type_element.text_content()
+                phone_number = await phone_number_element.text_content()
+                if phone_type and phone_number:
+                    phone_list.append(
+                        f"{phone_type.strip()}: {phone_number.strip()}")
+
+        owner_phone = " | ".join(phone_list) if phone_list else "N/A"
+
+    return {
+        "owner_type": owner_type,
+        "owner_name": owner_name,
+        "owner_phone": owner_phone,
+        "store_name": store_name,
+    }
@@ -0,0 +1,339 @@
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager, nullcontext
+from contextvars import ContextVar
+
+from metrics import tabs_recycled_total
+from timing import phase
+
+
+# Governor of the scrape running in the current task, see timing.current_timer
+current_governor = ContextVar("current_governor", default=None)
+
+# Process names of Camoufox's main process; its content processes are its children
+BROWSER_PROCESS_NAMES = ("camoufox", "firefox")
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+MB = 1024 * 1024
+
+
+class HostSaturated(Exception):
+    """The host has no memory or browser slot left for another scrape"""
+
+    def __init__(self, message, retry_after=30):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class ScrapeQueueFull(HostSaturated):
+    """Too many scrapes are already waiting for a browser"""
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _cgroup_available():
+    """Memory left under this container's cgroup limit in bytes, None without one"""
+    # cgroup v2, then v1 (whose "no limit" is a huge number)
+    for limit_path, usage_path, stat_path in (
+            ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory.current", "/sys/fs/cgroup/memory.stat"),
+            ("/sys/fs/cgroup/memory/memory.limit_in_bytes", "/sys/fs/cgroup/memory/memory.usage_in_bytes",
+             "/sys/fs/cgroup/memory/memory.stat")):
+        limit, usage = _read(limit_path), _read(usage_path)
+        if limit is None or usage is None:
+            continue
+        if limit.strip() == "max" or int(limit) >= 1 << 60:
+            return None
+        # Clean page cache is reclaimed before the OOM killer steps in
+        reclaimable = 0
+        for line in (_read(stat_path) or "").splitlines():
+            name, _, value = line.partition(" ")
+            if name in ("inactive_file", "total_inactive_file"):
+                reclaimable = int(value)
+                break
+        return int(limit) - int(usage) + reclaimable
+    return None
+
+
+def available_memory():
+    """Bytes of memory this process can still use (host or container), None off Linux"""
+    meminfo = _read("/proc/meminfo")
+    if meminfo is None:
+        return None
+    available = None
+    for line in meminfo.splitlines():
+        if line.startswith("MemAvailable:"):
+            available = int(line.split()[1]) * 1024
+            break
+    container = _cgroup_available()
+    if container is not None:
+        available = container if available is None else min(available, container)
+    return available
+
+
+def _processes():
+    """(pid, parent pid, name) of every process in /proc"""
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        stat = _read(f"/proc/{entry}/stat")
+        if stat is None:
+            continue
+        # The name is in parentheses and may itself contain spaces or parentheses
+        name = stat[stat.find("(") + 1:stat.rfind(")")]
+        fields = stat[stat.rfind(")") + 2:].split()
+        yield int(entry), int(fields[1]), name
+
+
+def _rss(pid):
+    statm = _read(f"/proc/{pid}/statm")
+    return int(statm.split()[1]) * PAGE_SIZE if statm else 0
+
+
+def browser_rss(root_pid=None):
+    """Resident memory in bytes of the browsers started by this process, None off Linux
+
+    Sums every browser process tree below ``root_pid`` (this process by
+    default). Pages shared between processes are counted in each, so this
+    overestimates a little.
+    """
+    if not os.path.isdir("/proc/self"):
+        return None
+    children = {}
+    names = {}
+    for pid, ppid, name in _processes():
+        children.setdefault(ppid, []).append(pid)
+        names[pid] = name
+
+    total = 0
+    stack = [(pid, False) for pid in children.get(root_pid or os.getpid(), [])]
+    while stack:
+        pid, in_browser = stack.pop()
+        in_browser = in_browser or names.get(pid, "").lower().startswith(BROWSER_PROCESS_NAMES)
+        if in_browser:
+            total += _rss(pid)
+        stack.extend((child, in_browser) for child in children.get(pid, []))
+    return total
+
+
+class ResourceGovernor:
+    """Browser and tab admission sized to the host's memory
+
+    Every Camoufox browser is a whole Firefox process tree, so each one
+    takes a slot: at most ``max_browsers`` at once (0 sizes it from memory
+    alone), and a new one only while the memory available to the process
+    (the container's cgroup limit when there is one) leaves
+    ``browser_memory_mb`` for it on top of ``reserve_mb``. Browsers
+    launched in the last ``launch_grace`` seconds haven't grown to their
+    full size yet, so they are counted at ``browser_memory_mb`` as well.
+    Both per-browser and per-tab estimates are scaled up when the running
+    browsers measure bigger on average (see browser_rss) than
+    ``browser_memory_mb``, re-measured every ``measure_interval`` seconds.
+
+    A scrape waits up to ``wait_timeout`` seconds for a slot (or a pooled
+    browser); at most ``max_waiting`` scrapes wait, further ones get
+    ScrapeQueueFull. A wait that times out raises HostSaturated.
+    Concurrent detail tabs are capped at ``tab_memory_mb`` each, see
+    tab_count.
+    """
+
+    def __init__(self, max_browsers=None, browser_memory_mb=None, tab_memory_mb=None, reserve_mb=None,
+                 max_waiting=None, wait_timeout=None, launch_grace=30, poll_interval=1.0, measure_interval=5):
+        if max_browsers is None:
+            max_browsers = int(os.getenv("MAX_BROWSERS", 0))
+        if browser_memory_mb is None:
+            browser_memory_mb = int(os.getenv("BROWSER_MEMORY_MB", 500))
+        if tab_memory_mb is None:
+            tab_memory_mb = int(os.getenv("TAB_MEMORY_MB", 150))
+        if reserve_mb is None:
+            reserve_mb = int(os.getenv("MEMORY_RESERVE_MB", 256))
+        if max_waiting is None:
+            max_waiting = int(os.getenv("MAX_WAITING_SCRAPES", 4))
+        if wait_timeout is None:
+            wait_timeout = float(os.getenv("BROWSER_WAIT_TIMEOUT", 60))
+        self.max_browsers = max(0, max_browsers)
+        self.browser_memory = browser_memory_mb * MB
+        self.tab_memory = tab_memory_mb * MB
+        self.reserve = reserve_mb * MB
+        self.max_waiting = max(0, max_waiting)
+        self.wait_timeout = wait_timeout
+        self.launch_grace = launch_grace
+        self.poll_interval = poll_interval
+        self.measure_interval = measure_interval
+        self.browsers = 0
+        self.waiting = 0
+        self._launches = []
+        self._scale = 1.0
+        self._rss = None
+        self._measured_at = None
+
+    def _measure(self):
+        """Re-measure the browsers when the last measurement is ``measure_interval`` old"""
+        now = time.monotonic()
+        if self._measured_at is None or now - self._measured_at >= self.measure_interval:
+            self._measured_at = now
+            self._rss = browser_rss()
+            rss = self._rss if self.browsers else None
+            self._scale = max(1.0, rss / self.browsers / self.browser_memory) if rss else 1.0
+
+    def _memory_scale(self):
+        """Average measured browser size over ``browser_memory_mb``, at least 1"""
+        self._measure()
+        return self._scale
+
+    @property
+    def measured_rss(self):
+        """Resident memory of the browsers (see browser_rss), up to ``measure_interval`` seconds old"""
+        self._measure()
+        return self._rss
+
+    @property
+    def browser_estimate(self):
+        """Bytes a new browser is expected to take"""
+        return int(self.browser_memory * self._memory_scale())
+
+    @property
+    def tab_estimate(self):
+        """Bytes a new detail tab is expected to take"""
+        return int(self.tab_memory * self._memory_scale())
+
+    def _spare_memory(self):
+        """Memory beyond the reserve and the browsers still starting up, None if unknown"""
+        available = available_memory()
+        if available is None:
+            return None
+        now = time.monotonic()
+        self._launches = [started for started in self._launches if now - started < self.launch_grace]
+        return available - self.reserve - len(self._launches) * self.browser_estimate
+
+    def _can_launch(self):
+        if self.max_browsers and self.browsers >= self.max_browsers:
+            return False
+        spare = self._spare_memory()
+        # With no browser running there is nothing to wait for, so let it try
+        return spare is None or spare >= self.browser_estimate or self.browsers == 0
+
+    def check(self):
+        """Raise right away when a new scrape stands no chance of getting a browser soon"""
+        if self.waiting >= self.max_waiting:
+            raise ScrapeQueueFull(f"{self.waiting} scrape(s) are already waiting for a browser")
+        available = available_memory()
+        if available is not None and available < self.reserve:
+            raise HostSaturated(
+                f"Only {available // MB} MB of memory left, below the {self.reserve // MB} MB reserve")
+
+    @asynccontextmanager
+    async def queued(self):
+        """Count the block as a scrape waiting for a browser, raising ScrapeQueueFull when too many are"""
+        if self.waiting >= self.max_waiting:
+            raise ScrapeQueueFull(f"{self.waiting} scrape(s) are already waiting for a browser")
+        self.waiting += 1
+        try:
+            with phase("browser_wait"):
+                yield
+        finally:
+            self.waiting -= 1
+
+    async def acquire(self, wait_timeout=None, queue=True):
+        """Take a browser slot, waiting up to ``wait_timeout`` seconds (default the governor's) for one
+
+        Pool warm-ups pass ``queue=False``: they don't count as (or get
+        turned away as) scrapes waiting for a browser.
+        """
+        if not self._can_launch():
+            deadline = time.monotonic() + (self.wait_timeout if wait_timeout is None else wait_timeout)
+            async with self.queued() if queue else nullcontext():
+                while not self._can_launch():
+                    if time.monotonic() >= deadline:
+                        if self.max_browsers and self.browsers >= self.max_browsers:
+                            reason = f"all {self.max_browsers} browser slots are busy"
+                        else:
+                            reason = f"not enough memory for another browser ({self.browsers} running)"
+                        raise HostSaturated(f"No browser could be started: {reason}")
+                    await asyncio.sleep(self.poll_interval)
+        self.browsers += 1
+        self._launches.append(time.monotonic())
+
+    def release(self):
+        self.browsers = max(0, self.browsers - 1)
+
+    @asynccontextmanager
+    async def browser_slot(self):
+        """Hold a browser slot for the block, see acquire"""
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def tab_count(self, wanted):
+        """How many of ``wanted`` concurrent tabs memory allows, at least the one already open"""
+        spare = self._spare_memory()
+        if spare is None:
+            return wanted
+        allowed = max(1, min(wanted, 1 + spare // self.tab_estimate))
+        if allowed < wanted:
+            print(f"🧠 Low on memory, scraping with {allowed} of {wanted} tabs")
+        return allowed
+
+    def to_dict(self):
+        available = available_memory()
+        rss = self.measured_rss
+        return {
+            "browsers": self.browsers,
+            "max_browsers": self.max_browsers,
+            "waiting": self.waiting,
+            "available_memory_mb": available // MB if available is not None else None,
+            "browser_rss_mb": rss // MB if rss is not None else None,
+            "browser_estimate_mb": self.browser_estimate // MB,
+        }
+
+
+class TabRecycler:
+    """Hands out the tab detail pages are scraped in, replacing it every ``recycle_after`` navigations
+
+    Closing a tab drops whatever its documents leaked; the new one opens in
+    the same browser context, so cookies and the Cloudflare clearance carry
+    over. The session's own ``page`` is never closed (its owner, e.g. the
+    browser pool, still holds it) but parked on about:blank. A
+    ``recycle_after`` of 0 keeps the page for good.
+    """
+
+    def __init__(self, page, recycle_after=None):
+        if recycle_after is None:
+            recycle_after = int(os.getenv("TAB_RECYCLE_AFTER", 100))
+        self.page = page
+        self.recycle_after = recycle_after
+        self.tab = page
+        self.navigations = 0
+
+    async def get(self, navigations):
+        """The tab to make ``navigations`` more navigations in"""
+        if self.recycle_after and self.navigations >= self.recycle_after:
+            tab = await self.page.context.new_page()
+            await self._retire(self.tab)
+            self.tab = tab
+            self.navigations = 0
+            tabs_recycled_total.inc()
+        self.navigations += navigations
+        return self.tab
+
+    async def _retire(self, tab):
+        try:
+            if tab is self.page:
+                await tab.goto("about:blank")
+            else:
+                await tab.close()
+        except Exception as e:
+            print(f"Error retiring tab: {str(e)}")
+
+    async def close(self):
+        if self.tab is not self.page:
+            await self._retire(self.tab)
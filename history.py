@@ -0,0 +1,278 @@
+import hashlib
+import os
+import sqlite3
+import time
+
+from records import ListingRecord
+
+
+CHANGE_KINDS = ("new", "relisted", "removed", "price_changed", "description_changed")
+
+
+def description_hash(description):
+    if not description:
+        return None
+    return hashlib.sha256(description.encode('utf-8')).hexdigest()
+
+
+def history_scope(targets):
+    """Scope key of a run: the searches it crawled, without the host"""
+    return " ".join(sorted(target.url("") for target in targets))
+
+
+class ListingHistory:
+    """SQLite history of every listing observation, with derived changes
+
+    Each scraped listing is stored as an observation and compared with the
+    listing's latest known state (a primary key lookup), producing "new",
+    "relisted", "price_changed" and "description_changed" changes as the
+    run goes. Listings missing from ``removed_after_runs`` consecutive
+    complete runs of the same searches become "removed". Changes get
+    increasing IDs, so consumers poll for deltas with changes_since.
+    """
+
+    def __init__(self, path=None, removed_after_runs=None):
+        if path is None:
+            path = os.getenv("HISTORY_DB_PATH", "data/listing_history.db")
+        if removed_after_runs is None:
+            removed_after_runs = int(os.getenv("HISTORY_REMOVED_AFTER_RUNS", 2))
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.removed_after_runs = max(1, removed_after_runs)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS listings (
+                listing_id INTEGER PRIMARY KEY,
+                url TEXT NOT NULL,
+                title TEXT,
+                price INTEGER,
+                currency TEXT,
+                description_hash TEXT,
+                first_seen REAL NOT NULL,
+                last_seen REAL NOT NULL,
+                removed_at REAL
+            );
+            CREATE TABLE IF NOT EXISTS observations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                listing_id INTEGER NOT NULL,
+                run_id INTEGER NOT NULL,
+                observed_at REAL NOT NULL,
+                price INTEGER,
+                currency TEXT,
+                description_hash TEXT,
+                summary INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS observations_listing ON observations (listing_id, observed_at);
+            CREATE TABLE IF NOT EXISTS changes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                listing_id INTEGER NOT NULL,
+                run_id INTEGER NOT NULL,
+                kind TEXT NOT NULL,
+                observed_at REAL NOT NULL,
+                url TEXT,
+                title TEXT,
+                old_price INTEGER,
+                new_price INTEGER,
+                currency TEXT
+            );
+            CREATE INDEX IF NOT EXISTS changes_observed_at ON changes (observed_at);
+            CREATE TABLE IF NOT EXISTS runs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                scope TEXT NOT NULL,
+                started_at REAL NOT NULL,
+                finished_at REAL,
+                complete INTEGER,
+                observed INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS scope_members (
+                scope TEXT NOT NULL,
+                listing_id INTEGER NOT NULL,
+                last_run INTEGER NOT NULL,
+                missed_runs INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (scope, listing_id)
+            );
+        """)
+        self.conn.commit()
+
+    def begin_run(self, scope):
+        """Start recording a scrape of the searches identified by ``scope``"""
+        cursor = self.conn.execute("INSERT INTO runs (scope, started_at) VALUES (?, ?)", (scope, time.time()))
+        self.conn.commit()
+        return HistoryRun(self, cursor.lastrowid, scope)
+
+    def changes_since(self, since=None, after_id=None, kinds=None, limit=500):
+        """Changes observed after ``since`` (epoch seconds) and/or change ID ``after_id``, oldest first"""
+        where = []
+        params = []
+        if since is not None:
+            where.append("observed_at > ?")
+            params.append(since)
+        if after_id is not None:
+            where.append("id > ?")
+            params.append(after_id)
+        if kinds:
+            where.append(f"kind IN ({', '.join('?' for _ in kinds)})")
+            params.extend(kinds)
+        sql = ("SELECT id, listing_id, kind, observed_at, url, title, old_price, new_price, currency "
+               "FROM changes")
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY id LIMIT ?"
+        rows = self.conn.execute(sql, (*params, limit)).fetchall()
+        return [change_dict(row) for row in rows]
+
+    def price_history(self, listing_id):
+        """Observed prices of a listing, oldest first, with consecutive repeats collapsed"""
+        rows = self.conn.execute(
+            "SELECT observed_at, price, currency FROM observations "
+            "WHERE listing_id = ? AND price IS NOT NULL ORDER BY observed_at", (listing_id,)).fetchall()
+        history = []
+        for observed_at, price, currency in rows:
+            if history and (history[-1]["price"], history[-1]["currency"]) == (price, currency):
+                history[-1]["last_seen"] = observed_at
+                continue
+            history.append({"first_seen": observed_at, "last_seen": observed_at, "price": price, "currency": currency})
+        return history
+
+    def get(self, listing_id):
+        row = self.conn.execute(
+            "SELECT url, title, price, currency, first_seen, last_seen, removed_at "
+            "FROM listings WHERE listing_id = ?", (listing_id,)).fetchone()
+        if row is None:
+            return None
+        url, title, price, currency, first_seen, last_seen, removed_at = row
+        return {
+            "listing_id": listing_id,
+            "url": url,
+            "title": title,
+            "price": price,
+            "currency": currency,
+            "first_seen": first_seen,
+            "last_seen": last_seen,
+            "removed_at": removed_at,
+        }
+
+    def close(self):
+        self.conn.close()
+
+
+def change_dict(row):
+    change_id, listing_id, kind, observed_at, url, title, old_price, new_price, currency = row
+    return {
+        "id": change_id,
+        "kind": kind,
+        "listing_id": listing_id,
+        "observed_at": observed_at,
+        "url": url,
+        "title": title,
+        "old_price": old_price,
+        "new_price": new_price,
+        "price_change": new_price - old_price if kind == "price_changed" else None,
+        "currency": currency,
+    }
+
+
+class HistoryRun:
+    """Observations of one scrape, see ListingHistory.begin_run"""
+
+    def __init__(self, history, run_id, scope):
+        self.history = history
+        self.conn = history.conn
+        self.run_id = run_id
+        self.scope = scope
+        self.started_at = time.time()
+        self.observed = 0
+
+    def observe(self, listing):
+        """Store a scraped listing (dict or ListingRecord); returns the changes it revealed"""
+        record = listing if isinstance(listing, ListingRecord) else ListingRecord.from_raw(listing)
+        if record.listing_id is None:
+            return []
+        now = time.time()
+        digest = description_hash(record.description)
+        previous = self.conn.execute(
+            "SELECT price, currency, description_hash, removed_at FROM listings WHERE listing_id = ?",
+            (record.listing_id,)).fetchone()
+
+        changes = []
+        if previous is None:
+            changes.append(("new", None, record.price))
+        else:
+            old_price, old_currency, old_digest, removed_at = previous
+            if removed_at is not None:
+                changes.append(("relisted", old_price, record.price))
+            # Summary rows carry no description, so only known values are compared
+            if record.price is not None and old_price is not None and (
+                    record.price != old_price or record.currency != old_currency):
+                changes.append(("price_changed", old_price, record.price))
+            if digest is not None and old_digest is not None and digest != old_digest:
+                changes.append(("description_changed", None, None))
+
+        with self.conn:
+            self.conn.execute("""
+                INSERT INTO listings
+                    (listing_id, url, title, price, currency, description_hash, first_seen, last_seen)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(listing_id) DO UPDATE SET
+                    url = excluded.url,
+                    title = COALESCE(excluded.title, title),
+                    price = COALESCE(excluded.price, price),
+                    currency = COALESCE(excluded.currency, currency),
+                    description_hash = COALESCE(excluded.description_hash, description_hash),
+                    last_seen = excluded.last_seen,
+                    removed_at = NULL
+            """, (record.listing_id, record.url, record.title, record.price, record.currency, digest, now, now))
+            self.conn.execute(
+                "INSERT INTO observations "
+                "(listing_id, run_id, observed_at, price, currency, description_hash, summary) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (record.listing_id, self.run_id, now, record.price, record.currency, digest, record.summary))
+            self.conn.execute("""
+                INSERT INTO scope_members (scope, listing_id, last_run) VALUES (?, ?, ?)
+                ON CONFLICT(scope, listing_id) DO UPDATE SET last_run = excluded.last_run, missed_runs = 0
+            """, (self.scope, record.listing_id, self.run_id))
+            self.conn.executemany(
+                "INSERT INTO changes "
+                "(listing_id, run_id, kind, observed_at, url, title, old_price, new_price, currency) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(record.listing_id, self.run_id, kind, now, record.url, record.title, old, new, record.currency)
+                 for kind, old, new in changes])
+        self.observed += 1
+        return [kind for kind, _, _ in changes]
+
+    def finish(self, complete=False):
+        """End the run; ``complete`` runs saw every listing of their searches
+
+        Only complete runs count towards removals, since a run stopped by
+        its limit simply didn't get to the other listings. Returns the
+        number of listings marked removed.
+        """
+        now = time.time()
+        removed = []
+        with self.conn:
+            if complete:
+                self.conn.execute(
+                    "UPDATE scope_members SET missed_runs = missed_runs + 1 WHERE scope = ? AND last_run != ?",
+                    (self.scope, self.run_id))
+                # Listings seen by another search since this run started are still up
+                removed = self.conn.execute("""
+                    SELECT l.listing_id, l.url, l.title, l.price, l.currency
+                    FROM scope_members m JOIN listings l ON l.listing_id = m.listing_id
+                    WHERE m.scope = ? AND m.missed_runs >= ? AND l.removed_at IS NULL AND l.last_seen < ?
+                """, (self.scope, self.history.removed_after_runs, self.started_at)).fetchall()
+                self.conn.executemany(
+                    "UPDATE listings SET removed_at = ? WHERE listing_id = ?",
+                    [(now, listing_id) for listing_id, *_ in removed])
+                self.conn.executemany(
+                    "INSERT INTO changes "
+                    "(listing_id, run_id, kind, observed_at, url, title, old_price, new_price, currency) "
+                    "VALUES (?, ?, 'removed', ?, ?, ?, ?, NULL, ?)",
+                    [(listing_id, self.run_id, now, url, title, price, currency)
+                     for listing_id, url, title, price, currency in removed])
+            self.conn.execute(
+                "UPDATE runs SET finished_at = ?, complete = ?, observed = ? WHERE id = ?",
+                (now, complete, self.observed, self.run_id))
+        return len(removed)
@@ -0,0 +1,204 @@
+import asyncio
+import os
+import re
+import urllib.parse
+from concurrent.futures import ProcessPoolExecutor
+
+import lxml.html
+from lxml.cssselect import CSSSelector
+
+from extraction import LISTING_FIELDS, RESULT_SELECTORS, SELECTORS, wants
+
+
+# Compiled once per process from the same selectors the browser paths use
+_COMPILED = {name: CSSSelector(selector) for name, selector in SELECTORS.items()}
+_RESULTS = {name: CSSSelector(selector) for name, selector in RESULT_SELECTORS.items()}
+_LI = CSSSelector("li")
+_STRONG = CSSSelector("strong")
+_SPAN = CSSSelector("span")
+_PHONE_NUMBER = CSSSelector("span[data-content]")
+_DT = CSSSelector("dt")
+_DD = CSSSelector("dd")
+
+_parser_pool = None
+
+
+def _first(tree, name):
+    matches = _COMPILED[name](tree)
+    return matches[0] if matches else None
+
+
+def _text(element):
+    return element.text_content() if element is not None else "N/A"
+
+
+def parse_listing_html(html, listing_url, fields=None):
+    """Parse a listing detail page's HTML into the listing dict
+
+    Produces the same fields as the browser extraction paths, without a
+    page, for the LISTING_FIELDS sections in ``fields`` (all by default).
+    """
+    tree = lxml.html.fromstring(html)
+
+    title = _text(_first(tree, 'title'))
+    price = _text(_first(tree, 'price'))
+    province = _text(_first(tree, 'province'))
+    area = _text(_first(tree, 'area'))
+    neighborhood = _text(_first(tree, 'neighborhood'))
+    date = _text(_first(tree, 'date'))
+
+    description = "N/A"
+    desc_element = _first(tree, 'description') if wants(fields, "description") else None
+    if desc_element is not None:
+        description_text = desc_element.text_content()
+        if description_text:
+            description = " ".join(description_text.strip().split())
+
+    owner_name = "N/A"
+    owner_phone = "N/A"
+    owner_type = "N/A"
+    store_name = "N/A"
+    phone_list = []
+
+    with_owner = wants(fields, "owner")
+    if with_owner and _first(tree, 'individual_container') is not None:
+        owner_type = "Individual"
+
+        style_element = _first(tree, 'individual_name_style')
+        style_content = style_element.text_content() if style_element is not None else ""
+        if style_content and 'content:' in style_content:
+            match = re.search(r'content:\s*["\']([^"\']+)["\']', style_content)
+            if match:
+                owner_name = match.group(1).strip()
+
+        for item in _COMPILED['individual_phones'](tree):
+            phone_types = _STRONG(item)
+            phone_numbers = _PHONE_NUMBER(item)
+            if phone_types and phone_numbers:
+                phone_type = phone_types[0].text_content()
+                phone_number = phone_numbers[0].get("data-content")
+                if phone_type and phone_number:
+                    phone_list.append(f"{phone_type.strip()}: {phone_number.strip()}")
+
+    elif with_owner and _first(tree, 'agent_container') is not None:
+        owner_type = "Agent"
+
+        store_name_element = _first(tree, 'agent_store_name')
+        if store_name_element is not None:
+            store_name = store_name_element.text_content().strip() or "N/A"
+
+        agent_name_element = _first(tree, 'agent_name')
+        if agent_name_element is not None:
+            owner_name = agent_name_element.text_content().strip() or "N/A"
+
+        for group in _COMPILED['agent_phones'](tree):
+            phone_types = _DT(group)
+            phone_numbers = _DD(group)
+            if phone_types and phone_numbers:
+                phone_type = phone_types[0].text_content()
+                phone_number = phone_numbers[0].text_content()
+                if phone_type and phone_number:
+                    phone_list.append(f"{phone_type.strip()}: {phone_number.strip()}")
+
+    if phone_list:
+        owner_phone = " | ".join(phone_list)
+
+    listing_attributes = {}
+    for info_list in _COMPILED['info_lists'](tree) if wants(fields, "attributes") else []:
+        for item in _LI(info_list):
+            labels = _STRONG(item)
+            values = _SPAN(item)
+            if labels and values:
+                label = labels[0].text_content()
+                value = values[0].text_content()
+                if label and value:
+                    listing_attributes[label.strip()] = value.strip()
+
+    listing_data = {
+        "url": listing_url,
+        "title": title.strip(),
+        "price": price.strip(),
+        "province": province.strip(),
+        "area": area.strip(),
+        "neighborhood": neighborhood.strip(),
+        "date": date.strip(),
+        "description": description.strip(),
+        "owner_type": owner_type,
+        "owner_name": owner_name,
+        "owner_phone": owner_phone,
+        "store_name": store_name,
+        "attributes": listing_attributes
+    }
+    if fields is None:
+        return listing_data
+    keys = {key for section in fields for key in LISTING_FIELDS[section]}
+    return {key: value for key, value in listing_data.items() if key == "url" or key in keys}
+
+
+def _clean(text):
+    return " ".join(text.split())
+
+
+def _cell(row, name):
+    matches = _RESULTS[name](row)
+    return _clean(matches[0].text_content()) if matches else "N/A"
+
+
+def _pieces(row, name):
+    """Non-empty text pieces of a cell, split at tags such as <br>"""
+    matches = _RESULTS[name](row)
+    if not matches:
+        return []
+    return [_clean(text) for text in matches[0].itertext() if text.strip()]
+
+
+def parse_results_html(html, base_url):
+    """Parse a #searchResultsTable page's HTML into rows with absolute URLs"""
+    tree = lxml.html.fromstring(html)
+    headers = [_clean(cell.text_content()) for cell in _RESULTS['headers'](tree)]
+
+    rows = []
+    for row in _RESULTS['rows'](tree):
+        links = _RESULTS['link'](row)
+        href = links[0].get("href") if links else None
+        if not href:
+            continue
+
+        # Attribute columns (m², rooms...) are named by their header cell
+        attributes = {}
+        for cell in _RESULTS['attributes'](row):
+            column = row.index(cell)
+            label = headers[column] if column < len(headers) and headers[column] else f"column_{column}"
+            attributes[label] = _clean(cell.text_content())
+
+        rows.append({
+            "url": urllib.parse.urljoin(base_url, href),
+            "title": _clean(links[0].text_content()) or "N/A",
+            "price": _cell(row, 'price'),
+            "date": _cell(row, 'date'),
+            "location": _pieces(row, 'location'),
+            "attributes": attributes,
+        })
+    return rows
+
+
+def get_parser_pool():
+    """Lazily create the process pool used to parse off the event loop"""
+    global _parser_pool
+    if _parser_pool is None:
+        _parser_pool = ProcessPoolExecutor(
+            max_workers=int(os.getenv("PARSER_WORKERS", os.cpu_count() or 1)))
+    return _parser_pool
+
+
+def shutdown_parser_pool():
+    global _parser_pool
+    if _parser_pool is not None:
+        _parser_pool.shutdown(cancel_futures=True)
+        _parser_pool = None
+
+
+async def parse_in_pool(func, *args):
+    """Run one of the parse functions in the process pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_parser_pool(), func, *args)
@@ -0,0 +1,150 @@
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+
+
+class JobQueueFull(Exception):
+    """Raised when a job is submitted while the queue is at capacity"""
+
+
+class Job:
+    """A scrape running in the background, with its partial results"""
+
+    def __init__(self, options, description=""):
+        self.id = uuid.uuid4().hex
+        self.options = options
+        self.description = description
+        self.status = "queued"
+        self.results = []
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.task = None
+
+    @property
+    def finished(self):
+        return self.status in ("completed", "failed", "cancelled")
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "description": self.description,
+            "count": len(self.results),
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobManager:
+    """Bounded queue of scrape jobs drained by a fixed number of workers
+
+    ``runner`` is called with a job's options and must return an async
+    iterator of listings; every listing is appended to the job as it
+    arrives, so partial results are available while the job runs.
+    ``on_error`` turns an exception into the job's error payload, and
+    ``on_cancel`` is called with the options of a job cancelled (or left
+    behind by ``stop``) before it started, to release what they hold. At most
+    ``max_queued_jobs`` jobs wait at once; cancelled ones stop counting
+    right away, although they stay in the queue until a worker skips them.
+    """
+
+    def __init__(self, runner, max_concurrent_jobs=1, max_queued_jobs=10, max_finished_jobs=50,
+                 on_error=None, on_cancel=None):
+        self.runner = runner
+        self.max_concurrent_jobs = max_concurrent_jobs
+        self.max_finished_jobs = max_finished_jobs
+        self.on_error = on_error or (lambda e: {"message": str(e)})
+        self.on_cancel = on_cancel
+        self.max_queued_jobs = max_queued_jobs
+        self._queue = asyncio.Queue()
+        self._pending = 0
+        self._jobs = OrderedDict()
+        self._workers = []
+
+    def start(self):
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.max_concurrent_jobs)]
+
+    async def stop(self):
+        for job in self._jobs.values():
+            if job.task is not None:
+                job.task.cancel()
+            elif job.status == "queued":
+                self._cancel_queued(job)
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def submit(self, options, description=""):
+        if self._pending >= self.max_queued_jobs:
+            raise JobQueueFull(f"Job queue is full ({self._pending} jobs waiting)")
+        job = Job(options, description)
+        self._queue.put_nowait(job)
+        self._pending += 1
+        self._jobs[job.id] = job
+        self._evict_finished()
+        return job
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def list(self):
+        return list(self._jobs.values())
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job; returns the job or None"""
+        job = self._jobs.get(job_id)
+        if job is None or job.finished:
+            return job
+        if job.task is not None:
+            job.task.cancel()
+        else:
+            self._cancel_queued(job)
+        return job
+
+    def _cancel_queued(self, job):
+        # The worker skips it when dequeued
+        self._pending -= 1
+        job.status = "cancelled"
+        job.finished_at = time.time()
+        if self.on_cancel is not None:
+            self.on_cancel(job.options)
+
+    def _evict_finished(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+            del self._jobs[job_id]
+
+    async def _run(self, job):
+        async for listing_data in self.runner(job.options):
+            job.results.append(listing_data)
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            if job.status == "cancelled":
+                continue
+            self._pending -= 1
+
+            job.status = "running"
+            job.started_at = time.time()
+            job.task = asyncio.create_task(self._run(job))
+            try:
+                await job.task
+                job.status = "completed"
+            except asyncio.CancelledError:
+                job.status = "cancelled"
+                if asyncio.current_task().cancelling():
+                    # The worker itself is being stopped
+                    raise
+            except Exception as e:
+                job.status = "failed"
+                job.error = self.on_error(e)
+            finally:
+                job.finished_at = time.time()
+                job.task = None
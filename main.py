@@ -1,11 +1,31 @@
 from camoufox import AsyncCamoufox
+import argparse
 import asyncio
+import json
+import os
 from camoufox_captcha import solve_captcha
 import urllib.parse
 import time
 import sys
-import re
-import requests
+from contextlib import asynccontextmanager, nullcontext
+from extraction import (LISTING_FIELDS, extract_listing, extract_listing_per_element, extract_result_rows,
+                        summary_from_row)
+from checkpoint import CheckpointNotFound, CheckpointStore, CrawlState
+from governor import TabRecycler, current_governor
+from history import history_scope
+from html_parser import parse_in_pool, parse_listing_html, parse_results_html
+from metrics import listing_failures_total, listings_total, scrapes_total, session_swaps_total
+from pacing import AdaptivePacer
+from records import ListingRecord
+from resilience import (ChallengeDetected, CircuitOpen, ListingGone, ScrapeGuard, SessionBlocked,
+                        current_guard)
+from resource_blocking import TrafficMeter, blocking_resources, current_meter
+from search import SearchTarget
+from sinks import SINK_FORMATS, open_sink
+from session_cache import SessionCache, cloudflare_stats, session_key
+# test_proxy_connectivity is re-exported for callers that imported it from here
+from proxy_pool import proxy_health_cache, test_proxy_connectivity
+from timing import PhaseTimer, current_timer, phase
 
 
 def print_banner():
@@ -50,39 +70,48 @@ def print_section_header(title):
     print(f"\033[95m{'='*80}\033[0m\n")
 
 
-def print_listing_info(i, listing_data):
-    """Print listing information with fancy formatting"""
+def print_listing_info(i, listing):
+    """Print a ListingRecord with fancy formatting"""
     print(
         f"\n\033[96m┌─── 📋 LISTING {i} ───────────────────────────────────────────────────────┐\033[0m")
 
+    price = f"{listing.price:,}".replace(",", ".") + f" {listing.currency or ''}" if listing.price else None
+    size = f"{listing.gross_m2} m²" if listing.gross_m2 else None
+    rooms = f"{listing.rooms}+{listing.living_rooms or 0}" if listing.rooms is not None else None
+    phones = " | ".join(f"{phone['type']}: {phone['number']}" for phone in listing.phones)
+
     fields = [
-        ("🏷️  Title", listing_data['title']),
-        ("💰 Price", listing_data['price']),
-        ("🌍 Province", listing_data['province']),
-        ("📍 Area", listing_data['area']),
-        ("🏘️  Neighborhood", listing_data['neighborhood']),
-        ("📅 Date", listing_data['date']),
-        ("📝 Description", listing_data['description']),
-        ("👥 Owner Type", listing_data['owner_type']),
-        ("👤 Owner Name", listing_data['owner_name']),
-        ("📞 Owner Phone", listing_data['owner_phone']),
-        ("🔗 URL", listing_data['url'])
+        ("🏷️  Title", listing.title),
+        ("💰 Price", price),
+        ("🌍 Province", listing.province),
+        ("📍 Area", listing.area),
+        ("🏘️  Neighborhood", listing.neighborhood),
+        ("📅 Date", listing.date),
+        ("📐 Size / Rooms", " / ".join(value for value in (size, rooms) if value) or None),
+        ("📝 Description", listing.description),
+        ("👥 Owner Type", listing.owner_type),
+        ("👤 Owner Name", listing.owner_name),
+        ("📞 Owner Phone", phones or None),
+        ("🔗 URL", listing.url)
     ]
 
     # Add store name for agent listings
-    if listing_data['owner_type'] == 'Agent' and listing_data['store_name'] != 'N/A':
-        fields.insert(-1, ("🏢 Store/Agency", listing_data['store_name']))
+    if listing.owner_type == 'Agent' and listing.store_name:
+        fields.insert(-1, ("🏢 Store/Agency", listing.store_name))
 
     for label, value in fields:
+        value = "N/A" if value is None else str(value)
         if len(value) > 60:
             value = value[:57] + "..."
         print(f"\033[96m│\033[0m {label:<15} \033[97m{value}\033[0m")
 
     # Print additional attributes if they exist
-    if 'attributes' in listing_data and listing_data['attributes']:
+    attributes = {**listing.attributes, **listing.extra_attributes}
+    if attributes:
         print(f"\033[96m│\033[0m")
         print(f"\033[96m│\033[0m \033[93m📊 Additional Details:\033[0m")
-        for attr_label, attr_value in listing_data['attributes'].items():
+        for attr_label, attr_value in attributes.items():
+            attr_value = str(attr_value)
             if len(attr_value) > 55:
                 attr_value = attr_value[:52] + "..."
             print(
@@ -91,255 +120,121 @@ def print_listing_info(i, listing_data):
     print(f"\033[96m└──────────────────────────────────────────────────────────────────────────────┘\033[0m")
 
 
-async def scrape_listing_details(page, listing_url):
-    """Scrape details from a single listing page"""
-    try:
-        # Increased timeout for proxy
-        await page.goto(listing_url, timeout=60000)
-        await page.wait_for_timeout(1500)  # Slightly reduced wait time
-
-        # Extract all the required information using the selectors
-        title_element = await page.query_selector("#classifiedDetail > div.classifiedDetail > div.classifiedDetailTitle > h1")
-        title = await title_element.text_content() if title_element else "N/A"
-
-        price_element = await page.query_selector("#classifiedDetail > div.classifiedDetail > div.classifiedDetailContent > div.classifiedInfo > h3 > span")
-        price = await price_element.text_content() if price_element else "N/A"
-
-        province_element = await page.query_selector("#classifiedDetail > div.classifiedDetail > div.classifiedDetailContent > div.classifiedInfo > h2 > a:nth-child(1)")
-        province = await province_element.text_content() if province_element else "N/A"
-
-        area_element = await page.query_selector("#classifiedDetail > div.classifiedDetail > div.classifiedDetailContent > div.classifiedInfo > h2 > a:nth-child(3)")
-        area = await area_element.text_content() if area_element else "N/A"
-
-        neighborhood_element = await page.query_selector("#classifiedDetail > div.classifiedDetail > div.classifiedDetailContent > div.classifiedInfo > h2 > a:nth-child(5)")
-        neighborhood = await neighborhood_element.text_content() if neighborhood_element else "N/A"
-
-        date_element = await page.query_selector("#classifiedDetail > div.classifiedDetail > div.classifiedDetailContent > div.classifiedInfo > ul > li:nth-child(2) > span")
-        date = await date_element.text_content() if date_element else "N/A"
-
-        # Extract clean text content from the entire classifiedDescription div
-        desc_element = await page.query_selector("#classifiedDescription")
-        description = "N/A"
-        if desc_element:
-            # Get all text content and clean it up
-            description_text = await desc_element.text_content()
-            if description_text:
-                # Clean up the text: remove extra whitespace, newlines, etc.
-                description = " ".join(description_text.strip().split())
-            else:
-                description = "N/A"
-
-        # Check if it's an individual user or agent/real estate office
-        individual_user_container = await page.query_selector(".classifiedUserContent")
-        agent_container = await page.query_selector(".user-info-module")
-
-        owner_name = "N/A"
-        owner_phone = "N/A"
-        owner_type = "N/A"
-        store_name = "N/A"
+async def fetch_listing_details(page, listing_url, engine="evaluate", pacer=None, fields=None):
+    """Scrape details from a single listing page, raising on failure
 
-        if individual_user_container:
-            # Individual user listing
-            owner_type = "Individual"
-
-            # Get username from CSS content property in style tag
+    ``engine="evaluate"`` extracts inside the page; ``engine="html"`` only
+    fetches the HTML and parses it in the process pool off the event loop.
+    Only the sections in ``fields`` (see extraction.LISTING_FIELDS) are
+    extracted, all of them by default.
+    The navigation response is reported to ``pacer`` if one is given.
+    Raises ListingGone for taken-down listings and ChallengeDetected when
+    Cloudflare answered instead of the listing.
+    """
+    meter = current_meter.get()
+    bytes_before = meter.page_bytes(page) if meter else 0
+    start = time.perf_counter()
+    try:
+        with phase("goto"):
+            # Increased timeout for proxy
+            response = await page.goto(listing_url, timeout=60000, wait_until="domcontentloaded")
+            if pacer is not None:
+                pacer.record_response(response)
+            if response is not None and response.status in GONE_STATUSES:
+                raise ListingGone(f"Listing is no longer available (HTTP {response.status})")
             try:
-                style_element = await page.query_selector(".username-info-area style")
-                if style_element:
-                    style_content = await style_element.text_content()
-                    if style_content and 'content:' in style_content:
-                        # Extract content between quotes
-                        match = re.search(
-                            r'content:\s*["\']([^"\']+)["\']', style_content)
-                        if match:
-                            owner_name = match.group(1).strip()
-            except:
-                pass
-
-            # Get phone numbers from phoneInfoPart
-            phone_list = []
-            phone_items = await page.query_selector_all("#phoneInfoPart li")
-
-            for item in phone_items:
-                phone_type_element = await item.query_selector("strong")
-                phone_number_element = await item.query_selector("span[data-content]")
-
-                if phone_type_element and phone_number_element:
-                    phone_type = await phone_type_element.text_content()
-                    phone_number = await phone_number_element.get_attribute("data-content")
-                    if phone_type and phone_number:
-                        phone_list.append(
-                            f"{phone_type.strip()}: {phone_number.strip()}")
-
-            owner_phone = " | ".join(phone_list) if phone_list else "N/A"
-
-        elif agent_container:
-            # Agent/real estate office listing
-            owner_type = "Agent"
-
-            # Get store/agency name
-            store_name_element = await page.query_selector(".user-info-store-name a")
-            if store_name_element:
-                store_name = await store_name_element.text_content()
-                store_name = store_name.strip() if store_name else "N/A"
-
-            # Get agent's personal name
-            agent_name_element = await page.query_selector(".user-info-agent h3")
-            if agent_name_element:
-                owner_name = await agent_name_element.text_content()
-                owner_name = owner_name.strip() if owner_name else "N/A"
-
-            # Get phone numbers from dl-group divs
-            phone_list = []
-            phone_groups = await page.query_selector_all(".user-info-phones .dl-group")
-
-            for group in phone_groups:
-                phone_type_element = await group.query_selector("dt")
-                phone_number_element = await group.query_selector("dd")
-
-                if phone_type_element and phone_number_element:
-                    phone_type = await phone_type_element.text_content()
-                    phone_number = await phone_number_element.text_content()
-                    if phone_type and phone_number:
-                        phone_list.append(
-                            f"{phone_type.strip()}: {phone_number.strip()}")
-
-            owner_phone = " | ".join(phone_list) if phone_list else "N/A"
-
-        # Scrape additional listing attributes from classifiedInfoList
-        listing_attributes = {}
-        classified_info_lists = await page.query_selector_all("ul.classifiedInfoList")
-
-        for info_list in classified_info_lists:
-            list_items = await info_list.query_selector_all("li")
-
-            for item in list_items:
-                label_element = await item.query_selector("strong")
-                value_element = await item.query_selector("span")
-
-                if label_element and value_element:
-                    label = await label_element.text_content()
-                    value = await value_element.text_content()
-
-                    if label and value:
-                        listing_attributes[label.strip()] = value.strip()
-
-        return {
-            "url": listing_url,
-            "title": title.strip() if title != "N/A" else "N/A",
-            "price": price.strip() if price != "N/A" else "N/A",
-            "province": province.strip() if province != "N/A" else "N/A",
-            "area": area.strip() if area != "N/A" else "N/A",
-            "neighborhood": neighborhood.strip() if neighborhood != "N/A" else "N/A",
-            "date": date.strip() if date != "N/A" else "N/A",
-            "description": description.strip() if description != "N/A" else "N/A",
-            "owner_type": owner_type,
-            "owner_name": owner_name,
-            "owner_phone": owner_phone,
-            "store_name": store_name,
-            "attributes": listing_attributes
-        }
-    except Exception as e:
-        print(f"Error scraping {listing_url}: {str(e)}")
-        return None
+                await page.wait_for_selector("#classifiedDetail", timeout=15000)
+            except Exception:
+                if await is_challenge_page(page, response):
+                    raise ChallengeDetected(f"Cloudflare challenge instead of {listing_url}") from None
+                raise
 
+        with phase("extraction"):
+            if engine == "html":
+                html = await page.content()
+                return await parse_in_pool(parse_listing_html, html, listing_url, fields)
 
-def test_proxy_connectivity(proxy_config, max_retries=3, retry_delay=2):
-    """Test if proxy is working by making a simple HTTP request with retry logic"""
-    if not proxy_config or not proxy_config.get('server'):
-        return True, "No proxy configured", None
-
-    proxies = {
-        'http': proxy_config['server'],
-        'https': proxy_config['server']
-    }
-
-    # Add authentication if provided
-    if proxy_config.get('username') and proxy_config.get('password'):
-        import urllib.parse
-        parsed = urllib.parse.urlparse(proxy_config['server'])
-        auth_server = f"{parsed.scheme}://{proxy_config['username']}:{proxy_config['password']}@{parsed.netloc}"
-        proxies = {
-            'http': auth_server,
-            'https': auth_server
-        }
-
-    # Retry loop for proxy connection
-    for attempt in range(1, max_retries + 1):
+            try:
+                return await extract_listing(page, listing_url, fields)
+            except Exception as e:
+                # Fall back to per-element queries if the in-page script fails
+                print(f"In-page extraction failed for {listing_url}, falling back: {str(e)}")
+                return await extract_listing_per_element(page, listing_url, fields)
+    finally:
+        if meter:
+            meter.record_listing(listing_url, meter.page_bytes(page) - bytes_before)
+        timer = current_timer.get()
+        if timer is not None:
+            timer.record("listing", time.perf_counter() - start)
+
+
+async def scrape_listing_details(page, listing_url, engine="evaluate", pacer=None, fields=None):
+    """Scrape a listing page, retrying failures; None if it keeps failing
+
+    Attempts follow the run's ScrapeGuard (see resilience.py): failures are
+    retried with jittered exponential backoff and feed its circuit breaker,
+    which may pause the run or abort it with CircuitOpen. A Cloudflare
+    challenge is solved again in place; if that fails SessionBlocked is
+    raised so the run can move to a fresh browser. Listings that still
+    fail are recorded in the guard's failure report.
+    """
+    guard = current_guard.get() or ScrapeGuard()
+    error = None
+    for attempt in range(1, guard.retry.max_attempts + 1):
+        try:
+            await guard.breaker.wait()
+        except CircuitOpen:
+            if error is not None:
+                guard.record_failure(listing_url, error, attempt - 1)
+            raise
         try:
-            # Test with a simple HTTP request and get IP
-            response = requests.get('http://httpbin.org/ip',
-                                    proxies=proxies, timeout=10)
-            if response.status_code == 200:
-                proxy_ip = response.json().get('origin', 'Unknown')
+            listing_data = await fetch_listing_details(page, listing_url, engine, pacer, fields)
+        except ListingGone as e:
+            # Not the site failing, so the breaker doesn't count it
+            print(f"Skipping {listing_url}: {str(e)}")
+            guard.record_failure(listing_url, str(e), attempt, gone=True)
+            return None
+        except ChallengeDetected as e:
+            guard.breaker.record(False)
+            error = str(e)
+            print(f"🛡️  {error}, solving it again...")
+            if not await solve_cloudflare(page, ready_selector="#classifiedDetail"):
+                # Not a failure yet: the next session starts over from this listing
+                raise SessionBlocked(f"Could not get past Cloudflare on {listing_url}") from e
+            continue
+        except Exception as e:
+            guard.breaker.record(False)
+            error = str(e)
+            print(f"Error scraping {listing_url} (attempt {attempt}/{guard.retry.max_attempts}): {error}")
+            if attempt < guard.retry.max_attempts:
+                await guard.retry.wait(attempt)
+            continue
+        guard.breaker.record(True)
+        return listing_data
 
-                # Get country information from ip-api.com
-                try:
-                    geo_response = requests.get(
-                        f'http://ip-api.com/json/{proxy_ip}', timeout=10)
-                    if geo_response.status_code == 200:
-                        geo_data = geo_response.json()
-                        country = geo_data.get('country', 'Unknown')
-                        country_code = geo_data.get('countryCode', 'Unknown')
-                        city = geo_data.get('city', 'Unknown')
-                        region = geo_data.get('regionName', 'Unknown')
-
-                        location_info = f"{city}, {region}, {country} ({country_code})"
-                        return True, f"Proxy working. IP: {proxy_ip}", location_info
-                    else:
-                        return True, f"Proxy working. IP: {proxy_ip}", "Country lookup failed"
-                except:
-                    return True, f"Proxy working. IP: {proxy_ip}", "Country lookup failed"
-            else:
-                return False, f"Proxy returned status code: {response.status_code}", None
+    listing_failures_total.inc()
+    guard.record_failure(listing_url, error, guard.retry.max_attempts)
+    return None
 
-        except (requests.exceptions.ProxyError, requests.exceptions.ConnectionError, ConnectionResetError) as e:
-            if attempt < max_retries:
-                print(
-                    f"Proxy connection attempt {attempt}/{max_retries} failed, retrying in {retry_delay}s...")
-                time.sleep(retry_delay)
-                continue
-            else:
-                return False, f"Proxy connection failed after {max_retries} attempts: {str(e)}", None
-        except requests.exceptions.Timeout:
-            if attempt < max_retries:
-                print(
-                    f"Proxy timeout attempt {attempt}/{max_retries}, retrying in {retry_delay}s...")
-                time.sleep(retry_delay)
-                continue
-            else:
-                return False, f"Proxy connection timed out after {max_retries} attempts", None
-        except Exception as e:
-            if attempt < max_retries:
-                print(
-                    f"Proxy test attempt {attempt}/{max_retries} failed, retrying in {retry_delay}s...")
-                time.sleep(retry_delay)
-                continue
-            else:
-                return False, f"Proxy test error after {max_retries} attempts: {str(e)}", None
 
-    return False, "Proxy test failed for unknown reason", None
+BASE_URL = os.getenv("SCRAPER_BASE_URL", "https://www.sahibinden.com").rstrip("/")
+LISTINGS_URL = f"{BASE_URL}/satilik/bursa"
 
 
-async def run_scraper(limit=5, proxy=None):
-    """Main scraping function that can be called from webhook"""
-    scraped_listings = []
+def set_base_url(base_url):
+    """Point the scraper at another host, e.g. the offline replay server"""
+    global BASE_URL, LISTINGS_URL
+    BASE_URL = base_url.rstrip("/")
+    LISTINGS_URL = f"{BASE_URL}/satilik/bursa"
 
-    # Track start time
-    start_time = time.time()
 
-    # Test proxy connectivity if proxy is provided
-    if proxy:
-        print(f"Testing proxy connectivity for {proxy.get('server')}...")
-        is_working, message, country_info = test_proxy_connectivity(proxy)
-        if not is_working:
-            raise Exception(f"Proxy validation failed: {message}")
-        else:
-            print(f"Proxy test successful: {message}")
-            if country_info:
-                print(f"🌍 Proxy Location: {country_info}")
-
-    # Prepare browser options - keep stable for captcha solving
+def build_browser_options(proxy=None, user_agent=None):
+    """Build AsyncCamoufox launch options, optionally routed through a proxy
+
+    ``user_agent`` pins the browser to the user agent a cached Cloudflare
+    clearance was issued for.
+    """
+    # Keep options stable for captcha solving
     browser_options = {
         'headless': True,
         'geoip': True,
@@ -353,6 +248,9 @@ async def run_scraper(limit=5, proxy=None):
         ]
     }
 
+    if user_agent:
+        browser_options['config']['navigator.userAgent'] = user_agent
+
     # Add proxy configuration if provided
     if proxy:
         if proxy.get('server'):
@@ -367,111 +265,836 @@ async def run_scraper(limit=5, proxy=None):
 
             print(f"Camoufox will use proxy: {proxy['server']}")
 
-    async with AsyncCamoufox(**browser_options) as browser:
-        page = await browser.new_page()
+    return browser_options
+
 
-        # Navigate to the BURSA listings page
-        await page.goto("https://www.sahibinden.com/satilik/bursa")
+async def new_session_page(browser, session=None):
+    """Open a page, restoring a cached Cloudflare session's storage state if given"""
+    if session is None:
+        return await browser.new_page()
+    context = await browser.new_context(storage_state=session['storage_state'])
+    return await context.new_page()
 
-        # Handle multiple captcha attempts
-        max_captcha_attempts = 3
+
+# Status codes of listings that were taken down
+GONE_STATUSES = {404, 410}
+
+# Titles of Cloudflare's challenge ("Just a moment...", localized) and block pages
+CHALLENGE_TITLES = ("just a moment", "bir dakika", "attention required", "access denied")
+CHALLENGE_SELECTORS = (
+    "#challenge-form, #challenge-stage, #cf-challenge-running, iframe[src*='challenges.cloudflare.com']"
+)
+
+
+async def is_challenge_page(page, response=None):
+    """Whether ``page`` shows a Cloudflare challenge or block page instead of content"""
+    if response is not None and response.headers.get("cf-mitigated") == "challenge":
+        return True
+    try:
+        title = (await page.title()).lower()
+        if any(marker in title for marker in CHALLENGE_TITLES):
+            return True
+        return await page.query_selector(CHALLENGE_SELECTORS) is not None
+    except Exception:
+        return False
+
+
+async def solve_cloudflare(page, max_captcha_attempts=3, ready_selector="#searchResultsTable"):
+    """Solve the Cloudflare interstitial until ``ready_selector`` (the results table) is visible"""
+    start = time.perf_counter()
+    solved = False
+
+    with phase("captcha"):
         for attempt in range(max_captcha_attempts):
             # Try to solve captcha
             success = await solve_captcha(page, captcha_type='cloudflare', challenge_type='interstitial')
 
             if success:
-                await page.wait_for_timeout(5000)
-
                 # Check if we're on the actual listings page or still on captcha
                 try:
-                    await page.wait_for_selector("#searchResultsTable", timeout=10000)
+                    await page.wait_for_selector(ready_selector, timeout=15000)
+                    solved = True
                     break
                 except:
                     continue
-            else:
-                if attempt < max_captcha_attempts - 1:
-                    await page.wait_for_timeout(2000)
-                    continue
-                else:
-                    await page.wait_for_timeout(30000)
-                    break
+            elif attempt < max_captcha_attempts - 1:
+                # Let the challenge page settle before the next attempt
+                try:
+                    await page.wait_for_load_state("domcontentloaded", timeout=5000)
+                except:
+                    pass
+
+    cloudflare_stats.record_solve(solved, time.perf_counter() - start)
+    return solved
+
+
+async def open_listings_page(page, session_cache=None, session_key="direct", url=None, warm=False):
+    """Navigate to the listings page (or ``url``), solving Cloudflare only when needed
+
+    With a ``session_cache`` a fresh clearance is persisted for later runs,
+    and a cached one that no longer works is dropped. ``warm`` tells that
+    the page's session was restored from the cache or cleared before (a
+    pooled browser): only then does the outcome count as a clearance reuse
+    hit or miss, other opens are counted as cold starts.
+    """
+    with phase("results_page"):
+        await page.goto(url or LISTINGS_URL, wait_until="domcontentloaded")
+
+        # A warm browser or restored session keeps its clearance,
+        # so the table is usually already there
+        try:
+            await page.wait_for_selector("#searchResultsTable", timeout=5000)
+            cleared = True
+        except:
+            cleared = False
+
+    if warm:
+        cloudflare_stats.record_clearance(cleared)
+    else:
+        cloudflare_stats.record_cold_start()
+    if not cleared:
+        if session_cache is not None:
+            session_cache.invalidate(session_key)
+        cleared = await solve_cloudflare(page)
 
-        # Find all listing links using the selector from SELECTORS.md
+    if cleared and session_cache is not None and session_cache.load(session_key) is None:
         try:
-            # Wait for the search results table to load
-            await page.wait_for_selector("#searchResultsTable > tbody", timeout=30000)
+            await session_cache.save_from_page(session_key, page)
+        except Exception as e:
+            print(f"Could not cache Cloudflare session: {str(e)}")
+
+    return cleared
+
+
+RESULTS_PAGE_SIZE = 50
+
+
+def results_page_url(offset, page_size=RESULTS_PAGE_SIZE, target=None):
+    """URL of the results page starting at row ``offset``, of ``target`` if given"""
+    if target is not None:
+        return target.url(BASE_URL, pagingOffset=offset, pagingSize=page_size)
+    query = urllib.parse.urlencode({'pagingOffset': offset, 'pagingSize': page_size})
+    return f"{LISTINGS_URL}?{query}"
+
+
+async def load_results_page(page, offset, target=None):
+    """Load a results page into ``page``; False if it has no table"""
+    try:
+        with phase("results_page"):
+            await page.goto(results_page_url(offset, target=target), wait_until="domcontentloaded")
+            try:
+                await page.wait_for_selector("#searchResultsTable > tbody", timeout=15000)
+                return True
+            except:
+                pass
+        return await solve_cloudflare(page)
+    except Exception as e:
+        print(f"Error loading results page at offset {offset}: {str(e)}")
+        return False
 
-            # Get all listing links
-            listing_links = await page.query_selector_all("td.searchResultsTitleValue > a.classifiedTitle")
 
-            if not listing_links:
-                return []
+async def collect_result_rows(page, engine="evaluate"):
+    """Collect the rows (absolute URL, price, date) of the open results page"""
+    # Wait for the search results table to load
+    await page.wait_for_selector("#searchResultsTable > tbody", timeout=30000)
+
+    if engine == "html":
+        html = await page.content()
+        return await parse_in_pool(parse_results_html, html, BASE_URL)
+
+    try:
+        return await extract_result_rows(page, BASE_URL)
+    except Exception as e:
+        print(f"In-page results extraction failed, falling back: {str(e)}")
+
+    # Find all listing links using the selector from SELECTORS.md
+    listing_links = await page.query_selector_all("td.searchResultsTitleValue > a.classifiedTitle")
+
+    # Extract href attributes from the links
+    rows = []
+    for link in listing_links:
+        href = await link.get_attribute("href")
+        if href:
+            full_url = urllib.parse.urljoin(BASE_URL, href)
+            rows.append({"url": full_url, "price": "N/A", "date": "N/A"})
+    return rows
+
+
+async def iter_result_rows(page, rows, concurrency=1, engine="evaluate", deep_urls=None, fields=None):
+    """Yield (row, listing) for results-table rows, in row order
+
+    Rows in ``deep_urls`` (every row when None) get their detail page
+    scraped. The others become summary records built from the row alone,
+    as do failed detail pages when ``deep_urls`` is given; otherwise
+    failed listings are dropped. Detail pages are extracted for
+    ``fields`` only, see fetch_listing_details.
+    """
+    detail_urls = [row["url"] for row in rows if deep_urls is None or row["url"] in deep_urls]
+    details = iter_listing_urls(page, detail_urls, concurrency, engine=engine, fields=fields)
+    # iter_listing_urls keeps order and drops failures, so once a later
+    # listing has arrived, every earlier one missing from here failed
+    finished = {}
+    exhausted = not detail_urls
+    try:
+        for row in rows:
+            if deep_urls is not None and row["url"] not in deep_urls:
+                yield row, summary_from_row(row)
+                continue
+
+            if not finished and not exhausted:
+                try:
+                    listing_data = await details.__anext__()
+                    finished[listing_data["url"]] = listing_data
+                except StopAsyncIteration:
+                    exhausted = True
+
+            listing_data = finished.pop(row["url"], None)
+            if listing_data is not None:
+                yield row, listing_data
+            elif deep_urls is not None:
+                yield row, summary_from_row(row)
+    finally:
+        await details.aclose()
+
+
+async def report_results_page_failure(page, error):
+    """Record a results page that could not be read, raising SessionBlocked if Cloudflare is in the way"""
+    if await is_challenge_page(page):
+        raise SessionBlocked(f"Cloudflare challenge on results page {page.url}")
+    print(f"Results page {page.url} failed: {error}")
+    guard = current_guard.get()
+    if guard is not None:
+        guard.record_failure(page.url, f"Results page failed: {error}")
+
+
+async def iter_listings(page, limit, concurrency=1, engine="evaluate", seen_index=None, recheck_changed=False,
+                        target=None, seen_urls=None, mode="detail", deep_scrape_changed=False, state=None,
+                        fields=None):
+    """Walk result pages from the open results page and yield scraped listings
+
+    While the detail pages of one results page are scraped, the next results
+    page is prefetched in a separate tab. Stops at ``limit`` listings or when
+    the results run out. With a ``seen_index``, listings scraped by earlier
+    runs are skipped (unless ``recheck_changed`` and their row changed) and
+    crawling stops at the first fully-seen results page. Later pages are
+    those of ``target``, whose row filters apply, and URLs in ``seen_urls``
+    (shared between the searches of one run) are skipped. A CrawlState
+    ``state`` (see checkpoint.py) is kept at the current results page; when
+    it says the open page is at a later offset, the listings already done
+    for this search count towards ``limit``. Detail pages are scraped in a
+    tab that is replaced every TAB_RECYCLE_AFTER navigations, see
+    governor.TabRecycler.
+
+    ``mode="summary"`` yields records built from the results table rows
+    without opening detail pages. Adding ``deep_scrape_changed`` returns
+    every row, but scrapes the detail page of rows that are new or whose
+    price or date changed according to ``seen_index`` (all rows without one).
+    Detail pages only get the sections in ``fields`` extracted.
+    """
+    summary = mode == "summary"
+    hybrid = summary and deep_scrape_changed
+    try:
+        rows = await collect_result_rows(page, engine)
+    except Exception as e:
+        await report_results_page_failure(page, str(e))
+        return
+
+    seen_urls = set() if seen_urls is None else seen_urls
+    crawled_urls = set()
+    offset = state.offset if state is not None else 0
+    yielded = state.count() if state is not None else 0
+    results_tab = None
+    recycler = TabRecycler(page)
+
+    try:
+        while rows:
+            offset += len(rows)
+            page_urls = {row["url"] for row in rows}
+            if page_urls <= crawled_urls:
+                # Past the end the site serves the last page again
+                break
+            crawled_urls.update(page_urls)
+
+            rows_by_url = {row["url"]: row for row in rows if row["url"] not in seen_urls}
+            new_rows = list(rows_by_url.values())
+            if target is not None:
+                new_rows = [row for row in new_rows if target.matches_row(row)]
+
+            deep_urls = set() if summary else None
+            if hybrid:
+                deep_urls = {
+                    row["url"] for row in new_rows
+                    if seen_index is None or seen_index.needs_scrape(row, recheck_changed=True)
+                }
+            elif seen_index is not None and new_rows:
+                pending_rows = [row for row in new_rows if seen_index.needs_scrape(row, recheck_changed)]
+                seen_index.touch([row for row in new_rows if row not in pending_rows])
+                if not pending_rows:
+                    print(f"Results page at offset {offset - len(rows)} already seen, stopping")
+                    break
+                new_rows = pending_rows
 
-            # Extract href attributes from the links
-            listing_urls = []
             # Limit based on the parameter
-            for link in listing_links[:limit]:
-                href = await link.get_attribute("href")
-                if href:
-                    full_url = urllib.parse.urljoin(
-                        "https://www.sahibinden.com", href)
-                    listing_urls.append(full_url)
+            new_rows = new_rows[:limit - yielded]
+            seen_urls.update(row["url"] for row in new_rows)
+            if state is not None:
+                state.start_page(offset - len(rows), [row["url"] for row in new_rows])
+
+            prefetch = None
+            if yielded + len(new_rows) < limit:
+                if results_tab is None:
+                    results_tab = await page.context.new_page()
+                prefetch = asyncio.create_task(load_results_page(results_tab, offset, target))
+
+            detail_tab = await recycler.get(len(new_rows) if deep_urls is None else len(deep_urls))
+            try:
+                async for row, listing_data in iter_result_rows(
+                        detail_tab, new_rows, concurrency, engine, deep_urls, fields):
+                    if seen_index is not None:
+                        if not hybrid or not listing_data.get("summary"):
+                            seen_index.record(listing_data, row)
+                        elif row["url"] not in deep_urls:
+                            seen_index.touch([row])
+                    yield listing_data
+                    yielded += 1
+            except BaseException:
+                if prefetch is not None:
+                    prefetch.cancel()
+                raise
+
+            if yielded >= limit:
+                break
+
+            # Some listings failed, so the next page is needed after all
+            if prefetch is None:
+                if results_tab is None:
+                    results_tab = await page.context.new_page()
+                prefetch = load_results_page(results_tab, offset, target)
+
+            if not await prefetch:
+                await report_results_page_failure(results_tab, f"Could not load results page at offset {offset}")
+                break
 
-            # Scrape each listing sequentially (more stable)
-            for listing_url in listing_urls:
-                listing_data = await scrape_listing_details(page, listing_url)
+            try:
+                rows = await collect_result_rows(results_tab, engine)
+            except Exception as e:
+                await report_results_page_failure(results_tab, str(e))
+                break
+    finally:
+        if results_tab is not None:
+            await results_tab.close()
+        await recycler.close()
+
+
+class HostThrottle:
+    """Per-host politeness budget: minimum spacing between request starts"""
+
+    def __init__(self, min_interval=None):
+        if min_interval is None:
+            min_interval = float(os.getenv("MIN_HOST_INTERVAL", 1.0))
+        self.min_interval = min_interval
+        self._locks = {}
+        self._last_start = {}
+
+    async def wait(self, url):
+        host = urllib.parse.urlparse(url).netloc
+        lock = self._locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            elapsed = time.monotonic() - self._last_start.get(host, 0)
+            if elapsed < self.min_interval:
+                with phase("host_wait"):
+                    await asyncio.sleep(self.min_interval - elapsed)
+            self._last_start[host] = time.monotonic()
+
+
+async def iter_listing_urls(page, listing_urls, concurrency=1, min_host_interval=None, engine="evaluate",
+                            fields=None):
+    """Scrape listing detail pages and yield them, optionally across several tabs
+
+    With ``concurrency`` > 1 that many tabs in the page's browser context
+    (sharing its Cloudflare cookies, and as many as the run's
+    ResourceGovernor has memory for) pull URLs from a queue. Listings are
+    yielded in the order of ``listing_urls`` as soon as each is ready;
+    listings that failed every retry are left out (and reported by the
+    run's ScrapeGuard). Request starts are at least ``min_host_interval``
+    (MIN_HOST_INTERVAL) apart, sequential or not, and an AdaptivePacer adds
+    delays when the site throttles.
+    """
+    pacer = AdaptivePacer()
+    throttle = HostThrottle(min_host_interval)
 
-                if listing_data:
-                    scraped_listings.append(listing_data)
+    if concurrency <= 1:
+        # Scrape each listing sequentially (more stable)
+        for listing_url in listing_urls:
+            await throttle.wait(listing_url)
+            listing_data = await scrape_listing_details(page, listing_url, engine, pacer, fields)
 
-                # Small delay between requests
-                await page.wait_for_timeout(1000)  # Reduced from 2000
+            if listing_data:
+                yield listing_data
 
-        except Exception:
-            return []
+            await pacer.wait()
+        return
+
+    queue = asyncio.Queue()
+    for index, listing_url in enumerate(listing_urls):
+        queue.put_nowait((index, listing_url))
+
+    loop = asyncio.get_running_loop()
+    results = [loop.create_future() for _ in listing_urls]
+
+    async def worker(tab):
+        while True:
+            try:
+                index, listing_url = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            await throttle.wait(listing_url)
+            try:
+                listing_data = await scrape_listing_details(tab, listing_url, engine, pacer, fields)
+            except Exception as e:
+                # A blocked session or an open breaker ends the whole batch
+                results[index].set_exception(e)
+                return
+            results[index].set_result(listing_data)
+            await pacer.wait()
+
+    # The first worker reuses the cleared page, the others get fresh tabs
+    worker_count = min(concurrency, len(listing_urls))
+    governor = current_governor.get()
+    if governor is not None:
+        worker_count = governor.tab_count(worker_count)
+    extra_tabs = [await page.context.new_page() for _ in range(worker_count - 1)]
+    workers = [asyncio.create_task(worker(tab)) for tab in [page] + extra_tabs]
+    try:
+        for result in results:
+            listing_data = await result
+            if listing_data:
+                yield listing_data
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        for result in results:
+            if result.done() and not result.cancelled():
+                # Mark errors of the other tabs as retrieved
+                result.exception()
+        for tab in extra_tabs:
+            await tab.close()
+
+
+async def scrape_listing_urls(page, listing_urls, concurrency=1, min_host_interval=None, engine="evaluate",
+                              fields=None):
+    """Scrape listing detail pages into a list, see iter_listing_urls"""
+    return [
+        listing_data async for listing_data in iter_listing_urls(
+            page, listing_urls, concurrency, min_host_interval, engine, fields)
+    ]
+
+
+async def iter_with_page(page, limit, concurrency=1, engine="evaluate", block_resources=False,
+                         seen_index=None, recheck_changed=False, session_cache=None, proxy=None,
+                         proxy_pool=None, targets=None, mode="detail", deep_scrape_changed=False, state=None,
+                         fields=None, warm=False):
+    """Open the listings page on a ready browser page and yield its listings
+
+    Each of ``targets`` (default: Bursa for sale) is crawled in turn for up
+    to ``limit`` listings, all in this page's session so the Cloudflare
+    clearance is shared; listings found by an earlier target are skipped.
+    The crawl starts at the search and results page of ``state`` (a
+    CrawlState, e.g. a resumed Checkpoint), skipping the listings it has
+    done, and keeps it up to date.
+    Network traffic of the page's context is metered for the whole scrape.
+    Whether ``proxy`` got through Cloudflare is reported to ``proxy_pool``,
+    and SessionBlocked is raised when it didn't, at the start or mid-run.
+    See iter_listings for ``mode``, ``deep_scrape_changed`` and ``fields``,
+    and open_listings_page for ``warm``.
+    """
+    targets = targets or [SearchTarget()]
+    state = state if state is not None else CrawlState()
+    start_target = targets[state.target_index]
+    context = page.context
+    meter = current_meter.get()
+    if meter:
+        meter.attach(context)
+    try:
+        async with blocking_resources(context, block_resources):
+            open_start = time.perf_counter()
+            try:
+                start_url = (results_page_url(state.offset, target=start_target) if state.offset
+                             else start_target.url(BASE_URL))
+                cleared = await open_listings_page(page, session_cache, session_key(proxy), url=start_url,
+                                                   warm=warm)
+            except Exception:
+                if proxy_pool is not None:
+                    proxy_pool.report(proxy, ok=False)
+                raise
+            if not cleared:
+                raise SessionBlocked("Could not get past Cloudflare on the listings page")
+            if proxy_pool is not None:
+                proxy_pool.report(proxy, ok=True, latency=time.perf_counter() - open_start)
+
+            seen_urls = set(state.done)
+            for index, target in enumerate(targets):
+                if index < state.target_index:
+                    # Finished before the crawl was resumed or its session replaced
+                    continue
+                if len(targets) > 1:
+                    print(f"🔎 Search {index + 1}/{len(targets)}: {target.url(BASE_URL)}")
+                if index > state.target_index:
+                    state.start_target(index)
+                    if not await load_results_page(page, 0, target):
+                        await report_results_page_failure(page, f"Could not open search {target.url(BASE_URL)}")
+                        continue
+                async for listing_data in iter_listings(
+                        page, limit, concurrency, engine, seen_index, recheck_changed, target, seen_urls,
+                        mode=mode, deep_scrape_changed=deep_scrape_changed, state=state, fields=fields):
+                    yield listing_data
+    except SessionBlocked:
+        if proxy_pool is not None:
+            proxy_pool.report(proxy, ok=False, banned=True)
+        if session_cache is not None:
+            session_cache.invalidate(session_key(proxy))
+        raise
+    finally:
+        if meter:
+            meter.detach(context)
+
+
+@asynccontextmanager
+async def open_session(proxy=None, browser_pool=None, session_cache=None, governor=None):
+    """A browser page, its proxy and whether its session is warm (see open_listings_page)
+
+    The page is leased from ``browser_pool``, or opened in a fresh browser
+    using ``proxy``. A fresh browser is only launched once ``governor`` (a
+    ResourceGovernor) grants it a slot, and starts from a cached Cloudflare
+    session if there is one.
+    """
+    if browser_pool is not None and not proxy:
+        async with browser_pool.lease() as pooled:
+            yield pooled.page, pooled.proxy, True
+        return
+
+    session = session_cache.load(session_key(proxy)) if session_cache else None
+    user_agent = session['user_agent'] if session else None
+
+    async with governor.browser_slot() if governor is not None else nullcontext():
+        launch_start = time.perf_counter()
+        async with AsyncCamoufox(**build_browser_options(proxy, user_agent)) as browser:
+            timer = current_timer.get()
+            if timer is not None:
+                timer.record("browser_launch", time.perf_counter() - launch_start)
+            yield await new_session_page(browser, session), proxy, session is not None
+
+
+async def iter_session(limit, proxy=None, browser_pool=None, session_cache=None, governor=None, **crawl_options):
+    """Run iter_with_page in a session from open_session"""
+    async with open_session(proxy, browser_pool, session_cache, governor) as (page, proxy, warm):
+        # Navigate to the first search's results page, solving the captcha if shown
+        async for listing_data in iter_with_page(
+                page, limit, session_cache=session_cache, proxy=proxy, warm=warm, **crawl_options):
+            yield listing_data
+
+
+async def enrich_listings(listing_urls, fields=("owner",), proxy=None, browser_pool=None, session_cache=None,
+                          proxy_pool=None, concurrency=1, engine="evaluate", guard=None, governor=None):
+    """Scrape only ``fields`` of known listings, e.g. the owner and phones an earlier scrape left out
+
+    Runs in one session like iter_scraper (pooled or fresh browser, pool
+    proxy, cached Cloudflare clearance) and returns the listings it got;
+    the ones that failed are reported in ``guard``.
+    """
+    guard = guard or ScrapeGuard()
+    current_guard.set(guard)
+    current_governor.set(governor)
+    if not proxy and browser_pool is None and proxy_pool is not None:
+        proxy = proxy_pool.acquire()
+
+    async with open_session(proxy, browser_pool, session_cache, governor) as (page, proxy, warm):
+        if not await open_listings_page(page, session_cache, session_key(proxy), warm=warm):
+            if proxy_pool is not None:
+                proxy_pool.report(proxy, ok=False, banned=True)
+            raise SessionBlocked("Could not get past Cloudflare on the listings page")
+        return await scrape_listing_urls(page, listing_urls, concurrency, engine=engine, fields=fields)
 
-    # Calculate and print statistics
-    end_time = time.time()
-    total_time = end_time - start_time
 
-    # Calculate total data size (approximate JSON size)
-    import json
-    total_data_bytes = len(json.dumps(scraped_listings).encode('utf-8'))
+def output_size(listing_data):
+    """Approximate JSON size in bytes of a listing as handed to callers"""
+    if isinstance(listing_data, ListingRecord):
+        listing_data = listing_data.to_dict()
+    return len(json.dumps(listing_data).encode('utf-8'))
+
+
+def print_run_summary(count, total_time, total_data_bytes, timer, meter, guard=None):
+    """Print the statistics block shown at the end of a run"""
     total_data_kb = total_data_bytes / 1024
     total_data_mb = total_data_kb / 1024
 
     # Print statistics
     print(f"\n{'='*80}")
-    print(f"✅ Scraping completed successfully!")
-    print(f"📊 Total listings scraped: {len(scraped_listings)}")
+    if guard is not None and guard.aborted:
+        print(f"⚠️  Scraping stopped early: {guard.aborted}")
+    else:
+        print(f"✅ Scraping completed successfully!")
+    print(f"📊 Total listings scraped: {count}")
+    if guard is not None and guard.failed:
+        print(f"❌ Failed: {len(guard.failed)}")
+        for failure in guard.failed[:10]:
+            print(f"   {failure['url']}: {failure['error']}")
+        if len(guard.failed) > 10:
+            print(f"   ... and {len(guard.failed) - 10} more")
     print(
         f"⏱️  Time spent: {total_time:.2f} seconds ({total_time/60:.2f} minutes)")
 
     if total_data_mb >= 1:
         print(
-            f"💾 Data consumed: {total_data_mb:.2f} MB ({total_data_kb:.2f} KB)")
+            f"💾 Output size: {total_data_mb:.2f} MB ({total_data_kb:.2f} KB)")
     else:
         print(
-            f"💾 Data consumed: {total_data_kb:.2f} KB ({total_data_bytes} bytes)")
+            f"💾 Output size: {total_data_kb:.2f} KB ({total_data_bytes} bytes)")
+
+    meter.print_summary()
 
-    if len(scraped_listings) > 0:
-        avg_time_per_listing = total_time / len(scraped_listings)
+    if count > 0:
+        avg_time_per_listing = total_time / count
         print(
             f"⚡ Average time per listing: {avg_time_per_listing:.2f} seconds")
 
+    timer.print_summary()
+
     print(f"{'='*80}\n")
 
-    return scraped_listings
+
+async def iter_scraper(limit=5, proxy=None, browser_pool=None, concurrency=1, engine="evaluate",
+                       block_resources=False, seen_index=None, recheck_changed=False, session_cache=None,
+                       proxy_pool=None, targets=None, mode="detail", deep_scrape_changed=False, typed=False,
+                       sinks=None, history=None, guard=None, checkpoint=None, governor=None, fields=None):
+    """Async generator version of run_scraper that yields each listing as it is scraped
+
+    When a warm ``browser_pool`` is given and no per-request proxy is set,
+    an already-cleared browser is borrowed instead of launching a new one.
+    ``concurrency`` sets how many tabs scrape detail pages in parallel,
+    ``engine`` picks in-page extraction or offline HTML parsing and
+    ``block_resources`` skips images, media, fonts and ad/analytics hosts.
+    Result pages are followed until ``limit`` listings have been yielded.
+    A ``seen_index`` makes the run incremental, see iter_listings, and a
+    ``session_cache`` reuses Cloudflare clearance across runs. Without a
+    per-request proxy, a freshly launched browser takes the best proxy
+    from ``proxy_pool``. ``targets`` is a list of SearchTarget searches
+    crawled in one session, see iter_with_page. ``mode="summary"`` returns
+    the results table rows without opening detail pages, optionally
+    deep-scraping new or changed rows, see iter_listings. With ``typed``
+    listings are yielded as parsed ListingRecord objects instead of dicts.
+    ``fields`` limits detail pages to some sections (see
+    extraction.LISTING_FIELDS), e.g. ``["price", "attributes"]`` skips
+    the owner and phone extraction; enrich_listings fetches those later.
+    Every listing is also written to each of ``sinks`` (see sinks.py),
+    which are flushed in batches as the run goes and closed when it ends.
+    A ``history`` (ListingHistory) records every listing and the changes
+    since its last observation.
+
+    Failed listings are retried, and reported in ``guard`` (a ScrapeGuard,
+    see resilience.py) rather than dropped. A session Cloudflare blocks
+    mid-run is replaced by a fresh browser (with another pool proxy) that
+    carries on where it stopped, and a run whose failures spike is paused
+    and eventually cut short by the circuit breaker, keeping what it got.
+
+    A ``checkpoint`` (see checkpoint.py) saves the crawl's position and
+    listings as it goes. When it was opened to resume an earlier crawl,
+    that crawl's listings are yielded first, without fetching them again,
+    and crawling continues from its last results page; the other options
+    must match the ones the crawl was started with.
+
+    A ``governor`` (ResourceGovernor, see governor.py) shared by the runs
+    of a process keeps browser launches and detail tabs within the host's
+    memory; launching waits for it and may raise HostSaturated.
+    """
+    if checkpoint is not None:
+        checkpoint.begin()
+    state = checkpoint if checkpoint is not None else CrawlState()
+    resumed = state.resumed
+    sinks = sinks or []
+    history_run = history.begin_run(history_scope(targets or [SearchTarget()])) if history else None
+    guard = guard or ScrapeGuard()
+    current_guard.set(guard)
+    current_governor.set(governor)
+    finished = False
+
+    # Track start time
+    start_time = time.time()
+    timer = PhaseTimer()
+    current_timer.set(timer)
+    meter = TrafficMeter()
+    current_meter.set(meter)
+
+    count = 0
+    # Approximate JSON size of the output, counted as listings stream by
+    total_data_bytes = 0
+    pooled_proxy = False
+
+    try:
+        if checkpoint is not None:
+            for listing_data in checkpoint.results():
+                if typed:
+                    listing_data = ListingRecord.from_raw(listing_data)
+                count += 1
+                total_data_bytes += output_size(listing_data)
+                for sink in sinks:
+                    sink.write(listing_data)
+                yield listing_data
+            if resumed:
+                print(f"♻️  Resuming checkpoint {checkpoint.id}: {count} listing(s) already scraped")
+
+        # Test proxy connectivity if proxy is provided (cached, off the event loop)
+        if proxy:
+            print(f"Testing proxy connectivity for {proxy.get('server')}...")
+            is_working, message, country_info = await proxy_health_cache.check(proxy)
+            if not is_working:
+                raise Exception(f"Proxy validation failed: {message}")
+            else:
+                print(f"Proxy test successful: {message}")
+                if country_info:
+                    print(f"🌍 Proxy Location: {country_info}")
+        elif browser_pool is None and proxy_pool is not None:
+            # Pool proxies are health-checked in the background already
+            proxy = proxy_pool.acquire()
+            pooled_proxy = True
+
+        while not state.complete:
+            try:
+                async for listing_data in iter_session(
+                        limit, proxy=proxy, browser_pool=browser_pool, session_cache=session_cache,
+                        governor=governor, concurrency=concurrency, engine=engine, block_resources=block_resources,
+                        seen_index=seen_index, recheck_changed=recheck_changed, proxy_pool=proxy_pool,
+                        targets=targets, mode=mode, deep_scrape_changed=deep_scrape_changed, state=state,
+                        fields=fields):
+                    state.record(listing_data)
+                    if typed:
+                        listing_data = ListingRecord.from_raw(listing_data)
+                    count += 1
+                    total_data_bytes += output_size(listing_data)
+                    listings_total.inc(mode=mode)
+                    for sink in sinks:
+                        sink.write(listing_data)
+                    if history_run is not None:
+                        history_run.observe(listing_data)
+                    yield listing_data
+                state.complete = True
+            except SessionBlocked as e:
+                if guard.session_swaps >= guard.max_session_swaps:
+                    raise
+                guard.session_swaps += 1
+                session_swaps_total.inc()
+                if pooled_proxy:
+                    # The blocked proxy was reported banned, so this picks another
+                    proxy = proxy_pool.acquire()
+                print(f"🔄 {str(e)}, continuing in a fresh browser "
+                      f"({guard.session_swaps}/{guard.max_session_swaps})")
+            except CircuitOpen as e:
+                guard.aborted = str(e)
+                break
+        finished = state.complete
+    finally:
+        scrapes_total.inc(outcome="completed" if finished else "aborted" if guard.aborted else "interrupted")
+        if checkpoint is not None:
+            checkpoint.finish("completed" if finished else "interrupted")
+        # Whatever was scraped before a failure still reaches the sinks
+        for sink in sinks:
+            sink.close()
+        if history_run is not None:
+            # Only a run whose every search ran out of results (rather than hitting its per-search limit),
+            # that didn't skip seen (or, resumed, earlier) listings and didn't fail to read any page
+            # (taken-down listings aside) saw everything listed
+            skips_seen = seen_index is not None and not (mode == "summary" and deep_scrape_changed)
+            exhausted = all(state.count(index) < limit for index in range(len(targets or [None])))
+            complete = finished and exhausted and not skips_seen and not resumed and not guard.missed
+            removed = history_run.finish(complete)
+            if removed:
+                print(f"🗑️  {removed} listing(s) no longer listed")
+
+    # Calculate and print statistics
+    total_time = time.time() - start_time
+    print_run_summary(count, total_time, total_data_bytes, timer, meter, guard)
+
+
+async def run_scraper(limit=5, proxy=None, browser_pool=None, concurrency=1, engine="evaluate",
+                      block_resources=False, seen_index=None, recheck_changed=False, session_cache=None,
+                      proxy_pool=None, targets=None, mode="detail", deep_scrape_changed=False, typed=False,
+                      sinks=None, history=None, guard=None, checkpoint=None, governor=None, fields=None):
+    """Main scraping function that can be called from webhook
+
+    Collects everything iter_scraper yields into a list; see iter_scraper
+    for the options.
+    """
+    return [
+        listing_data async for listing_data in iter_scraper(
+            limit, proxy, browser_pool=browser_pool, concurrency=concurrency, engine=engine,
+            block_resources=block_resources, seen_index=seen_index,
+            recheck_changed=recheck_changed, session_cache=session_cache, proxy_pool=proxy_pool,
+            targets=targets, mode=mode, deep_scrape_changed=deep_scrape_changed, typed=typed,
+            sinks=sinks, history=history, guard=guard, checkpoint=checkpoint, governor=governor,
+            fields=fields)
+    ]
+
+
+def parse_args(argv=None):
+    """Command line options of the CLI"""
+    parser = argparse.ArgumentParser(description="Scrape sahibinden.com listings")
+    parser.add_argument("--limit", type=int, default=5, help="Number of listings to scrape")
+    parser.add_argument(
+        "--export", action="append", default=[], metavar="FORMAT:PATH",
+        help=f"Also write listings to a file; FORMAT is one of {', '.join(SINK_FORMATS)} "
+             "and may be left out for known extensions. Repeatable")
+    parser.add_argument("--batch-size", type=int, help="Listings per export flush (default EXPORT_BATCH_SIZE or 100)")
+    parser.add_argument(
+        "--fields", type=lambda value: value.split(","), metavar="SECTION,...",
+        help=f"Only extract these detail page sections: {', '.join(LISTING_FIELDS)} (default: all)")
+    parser.add_argument(
+        "--resume", metavar="CHECKPOINT_ID",
+        help="Continue an interrupted crawl from its checkpoint, with the limit it was started with")
+    return parser.parse_args(argv)
 
 
 async def main():
     """CLI entry point"""
+    args = parse_args()
+
+    # Every crawl is checkpointed, so one that dies can be resumed
+    checkpoints = CheckpointStore()
+    if args.resume:
+        try:
+            checkpoint = checkpoints.open(args.resume)
+        except CheckpointNotFound as e:
+            print(f"❌ {str(e)}")
+            return
+        limit = checkpoint.options.get("limit", args.limit)
+        fields = checkpoint.options.get("fields")
+    else:
+        limit = args.limit
+        fields = args.fields
+        unknown = set(fields or []) - set(LISTING_FIELDS)
+        if unknown:
+            print(f"❌ Unknown field(s): {', '.join(sorted(unknown))}")
+            return
+        checkpoint = checkpoints.create({"limit": limit, "fields": fields})
+
+    sinks = [open_sink(spec, args.batch_size) for spec in args.export]
+
     print_banner()
-    listings = await run_scraper(5)
+    print(f"💾 Checkpoint: {checkpoint.id}")
+    try:
+        listings = await run_scraper(limit, session_cache=SessionCache(), typed=True, sinks=sinks,
+                                     checkpoint=checkpoint, fields=fields)
+    finally:
+        if not checkpoint.complete:
+            print(f"⏸️  Crawl interrupted, continue it with: python main.py --resume {checkpoint.id}")
+        checkpoints.close()
 
     # Print listings for CLI usage
     for i, listing_data in enumerate(listings, 1):
         print_listing_info(i, listing_data)
 
+    for sink in sinks:
+        print(f"💾 Exported {sink.rows_written} listings to {sink.path} ({sink.format})")
+
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,46 @@
+import asyncio
+import os
+
+from timing import phase
+
+
+# Status codes sahibinden/Cloudflare answer with when we go too fast
+THROTTLE_STATUSES = {403, 429, 503}
+
+
+class AdaptivePacer:
+    """Inter-request delay that only grows when the site signals throttling
+
+    Starts at ``base_delay``, multiplies by ``backoff`` on every throttled
+    response (capped at ``max_delay``) and decays back by ``recovery`` on
+    every successful one.
+    """
+
+    def __init__(self, base_delay=None, max_delay=None, backoff=2.0, recovery=0.5):
+        if base_delay is None:
+            base_delay = float(os.getenv("PACING_BASE_DELAY", 0))
+        if max_delay is None:
+            max_delay = float(os.getenv("PACING_MAX_DELAY", 30))
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.backoff = backoff
+        self.recovery = recovery
+        self.delay = base_delay
+
+    def record(self, throttled):
+        if throttled:
+            self.delay = min(max(self.delay, 1.0) * self.backoff, self.max_delay)
+            print(f"Site is throttling, pacing delay raised to {self.delay:.1f}s")
+        else:
+            self.delay = max(self.base_delay, self.delay * self.recovery)
+            if self.delay - self.base_delay < 0.05:
+                self.delay = self.base_delay
+
+    def record_response(self, response):
+        """Feed a navigation response into the pacing policy"""
+        self.record(response is not None and response.status in THROTTLE_STATUSES)
+
+    async def wait(self):
+        if self.delay > 0:
+            with phase("delay"):
+                await asyncio.sleep(self.delay)
@@ -0,0 +1,206 @@
+import re
+from dataclasses import dataclass, field
+
+from seen_index import listing_id_from_url
+
+
+MISSING = "N/A"
+
+TURKISH_MONTHS = {
+    "ocak": 1, "şubat": 2, "mart": 3, "nisan": 4, "mayıs": 5, "haziran": 6,
+    "temmuz": 7, "ağustos": 8, "eylül": 9, "ekim": 10, "kasım": 11, "aralık": 12,
+}
+
+CURRENCIES = {"TL": "TRY", "₺": "TRY", "USD": "USD", "$": "USD", "EUR": "EUR", "€": "EUR", "GBP": "GBP", "£": "GBP"}
+
+INT_PATTERN = re.compile(r"\d+")
+ROOMS_PATTERN = re.compile(r"(\d+)\s*\+\s*(\d+)")
+
+
+def _text(value):
+    """None for missing scraped values, the stripped text otherwise"""
+    if value is None:
+        return None
+    value = value.strip()
+    return value if value and value != MISSING else None
+
+
+def parse_int(value):
+    """Leading integer of a value like "120", "5-10 arası" or "1.250", or None"""
+    value = _text(value)
+    if value is None:
+        return None
+    match = INT_PATTERN.search(value.replace(".", ""))
+    return int(match.group()) if match else None
+
+
+def parse_price(value):
+    """(amount, currency) from "3.450.000 TL", "125.000 €"..., None for unknown parts"""
+    value = _text(value)
+    if value is None:
+        return None, None
+    amount = parse_int(value.split(",")[0])
+    currency = next((code for symbol, code in CURRENCIES.items() if symbol in value), None)
+    return amount, currency
+
+
+def parse_date(value):
+    """ISO date from Turkish text like "17 Ekim 2026", or None"""
+    value = _text(value)
+    if value is None:
+        return None
+    parts = value.split()
+    if len(parts) != 3 or not parts[0].isdigit() or not parts[2].isdigit():
+        return None
+    month = TURKISH_MONTHS.get(parts[1].lower())
+    if month is None:
+        return None
+    return f"{int(parts[2]):04d}-{month:02d}-{int(parts[0]):02d}"
+
+
+def parse_rooms(value):
+    """(rooms, living rooms) from "3+1" or "Stüdyo (1+0)", None for unknown parts"""
+    value = _text(value)
+    if value is None:
+        return None, None
+    match = ROOMS_PATTERN.search(value)
+    if match:
+        return int(match.group(1)), int(match.group(2))
+    return parse_int(value), None
+
+
+def parse_bool(value):
+    value = _text(value)
+    if value is None:
+        return None
+    if value.lower() in ("evet", "var", "krediye uygun"):
+        return True
+    if value.lower() in ("hayır", "yok", "krediye uygun değil"):
+        return False
+    return None
+
+
+def parse_phones(value):
+    """[{"type", "number"}] from "Cep: 0 (532) ... | İş: 0 (224) ..." """
+    value = _text(value)
+    if value is None:
+        return []
+    phones = []
+    for part in value.split(" | "):
+        phone_type, _, number = part.partition(": ")
+        phones.append({"type": phone_type, "number": number} if number else {"type": None, "number": part})
+    return phones
+
+
+# sahibinden attribute label -> (canonical key, parser). Labels not listed
+# here are kept as text under ListingRecord.extra_attributes.
+ATTRIBUTE_SCHEMA = {
+    "Emlak Tipi": ("property_type", _text),
+    "Bina Yaşı": ("building_age", parse_int),
+    "Bulunduğu Kat": ("floor", _text),
+    "Kat Sayısı": ("total_floors", parse_int),
+    "Isıtma": ("heating", _text),
+    "Banyo Sayısı": ("bathrooms", parse_int),
+    "Balkon": ("balcony", parse_bool),
+    "Asansör": ("elevator", parse_bool),
+    "Otopark": ("parking", _text),
+    "Eşyalı": ("furnished", parse_bool),
+    "Kullanım Durumu": ("usage_status", _text),
+    "Site İçerisinde": ("in_complex", parse_bool),
+    "Site Adı": ("complex_name", _text),
+    "Aidat (TL)": ("dues", parse_int),
+    "Krediye Uygun": ("loan_eligible", parse_bool),
+    "Tapu Durumu": ("deed_status", _text),
+    "Kimden": ("seller", _text),
+    "Takas": ("swap", parse_bool),
+}
+
+# Labels lifted to top-level ListingRecord fields
+TOP_LEVEL_ATTRIBUTES = {"İlan No", "İlan Tarihi", "m² (Brüt)", "m² (Net)", "Oda Sayısı"}
+
+
+@dataclass(slots=True)
+class ListingRecord:
+    """A listing with parsed, typed fields
+
+    Built once from the raw scraped dict (or a summary row) so consumers
+    filter and aggregate on numbers and ISO dates instead of re-parsing
+    "3.450.000 TL" and "17 Ekim 2026" strings. Missing values are None.
+    """
+
+    url: str
+    listing_id: int | None = None
+    title: str | None = None
+    price: int | None = None
+    currency: str | None = None
+    province: str | None = None
+    area: str | None = None
+    neighborhood: str | None = None
+    date: str | None = None
+    gross_m2: int | None = None
+    net_m2: int | None = None
+    rooms: int | None = None
+    living_rooms: int | None = None
+    description: str | None = None
+    owner_type: str | None = None
+    owner_name: str | None = None
+    store_name: str | None = None
+    phones: list = field(default_factory=list)
+    attributes: dict = field(default_factory=dict)
+    extra_attributes: dict = field(default_factory=dict)
+    summary: bool = False
+
+    @classmethod
+    def from_raw(cls, raw):
+        """Parse a dict from scrape_listing_details or summary_from_row"""
+        labels = raw.get("attributes") or {}
+        price, currency = parse_price(raw.get("price"))
+        rooms, living_rooms = parse_rooms(labels.get("Oda Sayısı"))
+        listing_id = listing_id_from_url(raw["url"]) or labels.get("İlan No")
+
+        attributes = {}
+        extra_attributes = {}
+        for label, value in labels.items():
+            if label in TOP_LEVEL_ATTRIBUTES:
+                continue
+            if label in ATTRIBUTE_SCHEMA:
+                key, parse = ATTRIBUTE_SCHEMA[label]
+                parsed = parse(value)
+                if parsed is not None:
+                    attributes[key] = parsed
+            elif _text(value) is not None:
+                extra_attributes[label] = value
+
+        return cls(
+            url=raw["url"],
+            listing_id=parse_int(listing_id),
+            title=_text(raw.get("title")),
+            price=price,
+            currency=currency,
+            province=_text(raw.get("province")),
+            area=_text(raw.get("area")),
+            neighborhood=_text(raw.get("neighborhood")),
+            date=parse_date(raw.get("date")) or parse_date(labels.get("İlan Tarihi")),
+            gross_m2=parse_int(labels.get("m² (Brüt)")),
+            net_m2=parse_int(labels.get("m² (Net)")),
+            rooms=rooms,
+            living_rooms=living_rooms,
+            description=_text(raw.get("description")),
+            owner_type=_text(raw.get("owner_type")),
+            owner_name=_text(raw.get("owner_name")),
+            store_name=_text(raw.get("store_name")),
+            phones=parse_phones(raw.get("owner_phone")),
+            attributes=attributes,
+            extra_attributes=extra_attributes,
+            summary=bool(raw.get("summary")),
+        )
+
+    def to_dict(self):
+        """Compact JSON-ready dict: None, empty and false-summary fields are left out"""
+        data = {}
+        for name in self.__slots__:
+            value = getattr(self, name)
+            if value is None or value == [] or value == {} or (name == "summary" and not value):
+                continue
+            data[name] = value
+        return data
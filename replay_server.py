@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Offline replay of sahibinden.com for benchmarks and regression checks
+
+Serves results pages and listing detail pages rendered from the HTML
+fixtures in fixtures/replay, alternating individual (.classifiedUserContent)
+and agent (.user-info-module) listings. Latency and bandwidth can be
+throttled to mimic a proxy. Point the scraper at it with
+SCRAPER_BASE_URL=http://127.0.0.1:8765 or main.set_base_url().
+
+Usage:
+    python replay_server.py --port 8765 --listings 200 --latency-ms 150 --bandwidth-kbps 512
+"""
+
+import argparse
+import os
+import random
+import re
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from string import Template
+
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "replay")
+
+FIRST_LISTING_ID = 1200000000
+
+LISTING_PATH_PATTERN = re.compile(r"^/ilan/[\w-]*?-(\d+)/detay$")
+SEARCH_PATH_PATTERN = re.compile(r"^/[a-z0-9-]+/[a-z0-9-]+$")
+
+AREAS = [
+    ("Nilüfer", "Görükle"), ("Osmangazi", "Çekirge"), ("Yıldırım", "Emirsultan"),
+    ("Mudanya", "Güzelyalı"), ("Gemlik", "Kumla"), ("İnegöl", "Cuma"),
+]
+ROOMS = ["1+1", "2+1", "3+1", "4+1"]
+MONTHS = ["Ocak", "Şubat", "Mart", "Nisan", "Mayıs", "Haziran",
+          "Temmuz", "Ağustos", "Eylül", "Ekim", "Kasım", "Aralık"]
+NAMES = ["Ayşe Yılmaz", "Mehmet Kaya", "Elif Demir", "Mustafa Çelik", "Zeynep Şahin"]
+STORES = ["Uludağ Gayrimenkul", "Marmara Emlak", "Yeşil Bursa Yatırım"]
+
+
+def slugify(text):
+    table = str.maketrans("çğıöşüÇĞİÖŞÜ", "cgiosucgiosu")
+    return re.sub(r"[^a-z0-9]+", "-", text.translate(table).lower()).strip("-")
+
+
+def listing_price(index):
+    return 1_500_000 + (index * 137_000) % 9_000_000
+
+
+def listing_fields(index):
+    """Deterministic field values of the ``index``-th listing"""
+    area, neighborhood = AREAS[index % len(AREAS)]
+    rooms = ROOMS[index % len(ROOMS)]
+    area_m2 = 70 + (index * 17) % 130
+    price = listing_price(index)
+    day = 1 + index % 28
+    title = f"{neighborhood} {rooms} {area_m2} m² satılık daire"
+    return {
+        "listing_id": FIRST_LISTING_ID + index,
+        "title": title,
+        "slug": slugify(f"{area} {neighborhood}"),
+        "price": f"{price:,} TL".replace(",", "."),
+        "date": f"{day} {MONTHS[index % 12]} 2026",
+        "date_day": f"{day} {MONTHS[index % 12]}",
+        "date_year": "2026",
+        "area": area,
+        "neighborhood": neighborhood,
+        "area_m2": area_m2,
+        "net_m2": area_m2 - 10,
+        "rooms": rooms,
+        "building_age": index % 30,
+        "floor": 1 + index % 8,
+        "owner_name": NAMES[index % len(NAMES)],
+        "store_name": STORES[index % len(STORES)],
+        "phone": f"0 (5{30 + index % 70}) {100 + index % 900} {10 + index % 90} {10 + (index * 7) % 90}",
+        "office_phone": f"0 (224) {200 + index % 800} {10 + index % 90} {10 + (index * 3) % 90}",
+    }
+
+
+class ReplayServer:
+    """Threaded HTTP server replaying results and listing pages from fixtures
+
+    ``listings`` is the number of listings across all results pages.
+    Every response waits ``latency_ms`` (plus up to ``jitter_ms``) before
+    the first byte. ``bandwidth_kbps`` caps the kilobytes per second of all
+    connections together, like a proxy's uplink. Detail pages are padded by
+    ``page_padding_kb`` to get closer to the size of real pages.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, listings=200, latency_ms=0, jitter_ms=0,
+                 bandwidth_kbps=None, page_padding_kb=0, fixtures_dir=FIXTURES_DIR):
+        self.listings = listings
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.bandwidth = bandwidth_kbps * 1024 if bandwidth_kbps else None
+        self.padding = "x" * (page_padding_kb * 1024)
+        self.templates = {}
+        for name in ("results", "results_row", "listing_individual", "listing_agent"):
+            with open(os.path.join(fixtures_dir, f"{name}.html"), encoding='utf-8') as f:
+                self.templates[name] = Template(f.read())
+
+        self.requests_served = 0
+        self.bytes_served = 0
+        self._stats_lock = threading.Lock()
+        self._link_free_at = 0.0
+        self._link_lock = threading.Lock()
+
+        self.httpd = ThreadingHTTPServer((host, port), ReplayHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.replay = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def render_results(self, offset, page_size, price_min=None, price_max=None):
+        """Results page of every search; only the price filter is applied"""
+        matching = [
+            index for index in range(self.listings)
+            if (price_min is None or listing_price(index) >= price_min)
+            and (price_max is None or listing_price(index) <= price_max)
+        ]
+        indexes = matching[offset:offset + page_size]
+        rows = "".join(
+            self.templates["results_row"].safe_substitute(listing_fields(index)) for index in indexes)
+        return self.templates["results"].safe_substitute(
+            rows=rows, total=len(matching), offset=offset + 1, end=offset + len(indexes))
+
+    def render_listing(self, listing_id):
+        """Detail page of ``listing_id``, or None if there is no such listing"""
+        index = listing_id - FIRST_LISTING_ID
+        if not 0 <= index < self.listings:
+            return None
+        template = self.templates["listing_agent" if index % 2 else "listing_individual"]
+        return template.safe_substitute(listing_fields(index), padding=self.padding)
+
+    def reserve_transfer(self, size):
+        """Book ``size`` bytes on the shared link; returns when they are sent"""
+        with self._link_lock:
+            start = max(time.monotonic(), self._link_free_at)
+            self._link_free_at = start + size / self.bandwidth
+            return self._link_free_at
+
+    def record(self, sent_bytes):
+        with self._stats_lock:
+            self.requests_served += 1
+            self.bytes_served += sent_bytes
+
+    def start(self):
+        """Serve in a background thread"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    """Routes /{category}/{city} searches and /ilan/{title}-{id}/detay to the fixtures"""
+
+    def do_GET(self):
+        replay = self.server.replay
+        parsed = urllib.parse.urlparse(self.path)
+
+        if SEARCH_PATH_PATTERN.match(parsed.path.rstrip("/")):
+            query = urllib.parse.parse_qs(parsed.query)
+            offset = int(query.get("pagingOffset", ["0"])[0])
+            page_size = int(query.get("pagingSize", ["20"])[0])
+            price_min = int(query["price_min"][0]) if "price_min" in query else None
+            price_max = int(query["price_max"][0]) if "price_max" in query else None
+            body = replay.render_results(offset, page_size, price_min, price_max)
+        else:
+            match = LISTING_PATH_PATTERN.match(parsed.path)
+            body = replay.render_listing(int(match.group(1))) if match else None
+
+        if body is None:
+            self.send_error(404)
+            return
+        self.send_body(body.encode('utf-8'))
+
+    def send_body(self, payload):
+        replay = self.server.replay
+        delay = replay.latency + random.uniform(0, replay.jitter)
+        if delay:
+            time.sleep(delay)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+
+        if replay.bandwidth:
+            # Small chunks so concurrent responses interleave on the shared link
+            chunk_size = max(1, int(replay.bandwidth / 10))
+            for start in range(0, len(payload), chunk_size):
+                chunk = payload[start:start + chunk_size]
+                sent_at = replay.reserve_transfer(len(chunk))
+                time.sleep(max(0.0, sent_at - time.monotonic()))
+                self.wfile.write(chunk)
+                self.wfile.flush()
+        else:
+            self.wfile.write(payload)
+        replay.record(len(payload))
+
+    def log_message(self, format, *args):
+        # Benchmarks would drown in per-request access logs
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline replay server for the scraper")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--listings", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--bandwidth-kbps", type=float, help="Throughput cap in KB/s")
+    parser.add_argument("--page-padding-kb", type=int, default=0)
+    args = parser.parse_args()
+
+    server = ReplayServer(args.host, args.port, args.listings, args.latency_ms, args.jitter_ms,
+                          args.bandwidth_kbps, args.page_padding_kb)
+    print(f"Replaying {args.listings} listings at {server.url}")
+    print(f"Run the scraper with SCRAPER_BASE_URL={server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+import asyncio
+import os
+import random
+import time
+from collections import deque
+from contextvars import ContextVar
+
+from metrics import circuit_breaker_trips_total, listing_retries_total
+from timing import phase
+
+
+# Guard of the scrape running in the current task, see timing.current_timer
+current_guard = ContextVar("current_guard", default=None)
+
+
+class ChallengeDetected(Exception):
+    """A page came back as a Cloudflare challenge or block page"""
+
+
+class SessionBlocked(Exception):
+    """The browser session is stuck behind Cloudflare and has to be replaced"""
+
+
+class ListingGone(Exception):
+    """The listing was taken down, so retrying it is pointless"""
+
+
+class CircuitOpen(Exception):
+    """Too many requests kept failing, the run is aborted"""
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter between attempts
+
+    The wait after attempt ``n`` is uniform between 0 and
+    ``base_delay * 2 ** (n - 1)`` (capped at ``max_delay``), so tabs that
+    failed together don't retry in lockstep.
+    """
+
+    def __init__(self, max_attempts=None, base_delay=None, max_delay=None):
+        if max_attempts is None:
+            max_attempts = int(os.getenv("LISTING_MAX_ATTEMPTS", 3))
+        if base_delay is None:
+            base_delay = float(os.getenv("RETRY_BASE_DELAY", 2))
+        if max_delay is None:
+            max_delay = float(os.getenv("RETRY_MAX_DELAY", 30))
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt):
+        """Seconds to wait after failed attempt number ``attempt`` (from 1)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    async def wait(self, attempt):
+        listing_retries_total.inc()
+        with phase("retry_backoff"):
+            await asyncio.sleep(self.delay(attempt))
+
+
+class CircuitBreaker:
+    """Pauses, then aborts, a run whose requests keep failing
+
+    The outcomes of the last ``window`` requests are kept. Once at least
+    half the window is filled and ``failure_ratio`` of it failed, the
+    breaker trips: requests wait ``cooldown`` seconds so the site or proxy
+    can recover, and the window starts over. Tripping more than
+    ``max_trips`` times aborts the run with CircuitOpen. A ``window`` of 0
+    disables the breaker.
+    """
+
+    def __init__(self, window=None, failure_ratio=None, cooldown=None, max_trips=None):
+        if window is None:
+            window = int(os.getenv("BREAKER_WINDOW", 20))
+        if failure_ratio is None:
+            failure_ratio = float(os.getenv("BREAKER_FAILURE_RATIO", 0.5))
+        if cooldown is None:
+            cooldown = float(os.getenv("BREAKER_COOLDOWN", 60))
+        if max_trips is None:
+            max_trips = int(os.getenv("BREAKER_MAX_TRIPS", 2))
+        self.window = max(0, window)
+        self.failure_ratio = failure_ratio
+        self.cooldown = cooldown
+        self.max_trips = max_trips
+        self.outcomes = deque(maxlen=self.window or None)
+        self.trips = 0
+        self.open_until = 0.0
+        self.abort_reason = None
+
+    def record(self, ok):
+        if not self.window or self.abort_reason is not None:
+            return
+        self.outcomes.append(ok)
+        if len(self.outcomes) < max(1, self.window // 2):
+            return
+        failures = self.outcomes.count(False)
+        if failures / len(self.outcomes) < self.failure_ratio:
+            return
+
+        self.trips += 1
+        circuit_breaker_trips_total.inc()
+        reason = f"{failures} of the last {len(self.outcomes)} requests failed"
+        self.outcomes.clear()
+        if self.trips > self.max_trips:
+            self.abort_reason = f"Circuit breaker open: {reason} (tripped {self.trips} times)"
+            print(f"🛑 {self.abort_reason}, aborting the run")
+        else:
+            self.open_until = time.monotonic() + self.cooldown
+            print(f"⏸️  Circuit breaker tripped: {reason}, pausing for {self.cooldown:.0f}s")
+
+    async def wait(self):
+        """Hold a request while the breaker is open; raises CircuitOpen once it gave up"""
+        if self.abort_reason is not None:
+            raise CircuitOpen(self.abort_reason)
+        remaining = self.open_until - time.monotonic()
+        if remaining > 0:
+            with phase("circuit_open"):
+                await asyncio.sleep(remaining)
+            if self.abort_reason is not None:
+                raise CircuitOpen(self.abort_reason)
+
+    def to_dict(self):
+        return {
+            "trips": self.trips,
+            "open": self.abort_reason is not None or self.open_until > time.monotonic(),
+        }
+
+
+class ScrapeGuard:
+    """Retry policy, circuit breaker and failure report of one scrape
+
+    Listings that could not be scraped end up in ``failed`` (URL, error,
+    attempts) instead of being dropped; ``missed`` counts those of them
+    that may well still be listed (all but taken-down ones), so the run
+    didn't see everything. ``aborted`` holds the reason
+    when the breaker stopped the run early. A run whose session is blocked
+    is continued in a fresh browser (and proxy, when pooled) up to
+    ``max_session_swaps`` times.
+    """
+
+    def __init__(self, retry=None, breaker=None, max_session_swaps=None):
+        if max_session_swaps is None:
+            max_session_swaps = int(os.getenv("MAX_SESSION_SWAPS", 2))
+        self.retry = retry or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker()
+        self.max_session_swaps = max_session_swaps
+        self.session_swaps = 0
+        self.failed = []
+        self.missed = 0
+        self.aborted = None
+
+    def record_failure(self, url, error, attempts=1, gone=False):
+        self.failed.append({"url": url, "error": error, "attempts": attempts})
+        if not gone:
+            self.missed += 1
+
+    def to_dict(self):
+        return {
+            "failed": self.failed,
+            "aborted": self.aborted,
+            "session_swaps": self.session_swaps,
+            "circuit_breaker": self.breaker.to_dict(),
+        }
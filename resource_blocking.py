@@ -0,0 +1,133 @@
+import urllib.parse
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+
+
+# Nothing the selectors or the Cloudflare challenge depend on
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font"}
+
+# Ad, analytics and tracking hosts loaded by listing pages
+BLOCKED_HOSTS = (
+    "google-analytics.com",
+    "googletagmanager.com",
+    "googletagservices.com",
+    "googlesyndication.com",
+    "googleadservices.com",
+    "doubleclick.net",
+    "adservice.google.com",
+    "facebook.net",
+    "connect.facebook.com",
+    "hotjar.com",
+    "criteo.com",
+    "criteo.net",
+    "adform.net",
+    "yandex.ru",
+    "mc.yandex.com",
+    "scorecardresearch.com",
+    "clarity.ms",
+    "tiktok.com",
+    "insider.com",
+    "useinsider.com",
+)
+
+# Never blocked, whatever their resource type
+ALLOWED_HOSTS = (
+    "challenges.cloudflare.com",
+)
+
+# Meter of the scrape running in the current task, see timing.current_timer
+current_meter = ContextVar("current_meter", default=None)
+
+
+def _host_matches(host, hosts):
+    return any(host == candidate or host.endswith("." + candidate) for candidate in hosts)
+
+
+def should_block(resource_type, url):
+    host = urllib.parse.urlparse(url).hostname or ""
+    if _host_matches(host, ALLOWED_HOSTS):
+        return False
+    return resource_type in BLOCKED_RESOURCE_TYPES or _host_matches(host, BLOCKED_HOSTS)
+
+
+async def _route_handler(route):
+    request = route.request
+    if should_block(request.resource_type, request.url):
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+@asynccontextmanager
+async def blocking_resources(context, enabled=True):
+    """Block images, media, fonts and ad/analytics hosts on a browser context"""
+    if not enabled:
+        yield
+        return
+
+    await context.route("**/*", _route_handler)
+    try:
+        yield
+    finally:
+        try:
+            await context.unroute("**/*", _route_handler)
+        except Exception:
+            # The context may already be closed
+            pass
+
+
+class TrafficMeter:
+    """Counts bytes actually transferred over the network by a browser context"""
+
+    def __init__(self):
+        self.total_bytes = 0
+        self.requests = 0
+        self.by_page = {}
+        self.per_listing = {}
+
+    async def _on_request_finished(self, request):
+        try:
+            sizes = await request.sizes()
+            size = (
+                sizes["requestHeadersSize"] + sizes["requestBodySize"]
+                + sizes["responseHeadersSize"] + sizes["responseBodySize"])
+        except Exception:
+            # Fall back to the declared body size when sizes are unavailable
+            try:
+                response = await request.response()
+                size = int(response.headers.get("content-length", 0)) if response else 0
+            except Exception:
+                size = 0
+
+        self.total_bytes += size
+        self.requests += 1
+        try:
+            page = request.frame.page
+        except Exception:
+            return
+        self.by_page[page] = self.by_page.get(page, 0) + size
+
+    def attach(self, context):
+        context.on("requestfinished", self._on_request_finished)
+
+    def detach(self, context):
+        context.remove_listener("requestfinished", self._on_request_finished)
+
+    def page_bytes(self, page):
+        return self.by_page.get(page, 0)
+
+    def record_listing(self, listing_url, transferred_bytes):
+        self.per_listing[listing_url] = transferred_bytes
+
+    def print_summary(self):
+        total_kb = self.total_bytes / 1024
+        if total_kb >= 1024:
+            print(f"🌐 Network transferred: {total_kb / 1024:.2f} MB in {self.requests} requests")
+        else:
+            print(f"🌐 Network transferred: {total_kb:.2f} KB in {self.requests} requests")
+
+        if self.per_listing:
+            per_listing_kb = [size / 1024 for size in self.per_listing.values()]
+            print(
+                f"📦 Per listing: {sum(per_listing_kb) / len(per_listing_kb):.1f} KB avg, "
+                f"{max(per_listing_kb):.1f} KB max")
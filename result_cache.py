@@ -0,0 +1,92 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+
+
+class ResultCache:
+    """In-memory cache of scrape results with request coalescing
+
+    Results are kept per key for ``ttl`` seconds, up to ``max_entries``
+    keys. Concurrent requests for a key that is being scraped wait for the
+    in-flight scrape instead of starting their own. Failures are shared
+    with the waiting requests but never cached.
+    """
+
+    def __init__(self, ttl=None, max_entries=None):
+        if ttl is None:
+            ttl = float(os.getenv("RESULT_CACHE_TTL", 60))
+        if max_entries is None:
+            max_entries = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", 100))
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get(self, key):
+        """(value, age) of a fresh entry, or None"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, value = entry
+        age = time.time() - stored_at
+        if age >= self.ttl:
+            del self._entries[key]
+            return None
+        return value, age
+
+    async def get_or_run(self, key, runner):
+        """Return (value, status, age) for ``key``, calling ``runner`` on a miss
+
+        ``status`` is "HIT" for a cached value, "COALESCED" when another
+        request's scrape was joined and "MISS" when ``runner`` was started.
+        """
+        cached = self.get(key)
+        if cached is not None:
+            self.hits += 1
+            return cached[0], "HIT", cached[1]
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            status = "COALESCED"
+        else:
+            self.misses += 1
+            status = "MISS"
+            task = asyncio.create_task(runner())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._store(key, done))
+
+        # Shielded so one caller going away doesn't cancel the others' scrape
+        return await asyncio.shield(task), status, 0.0
+
+    def _store(self, key, task):
+        self._inflight.pop(key, None)
+        if task.cancelled() or task.exception() is not None or self.ttl <= 0:
+            return
+        self._entries[key] = (time.time(), task.result())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def discard(self, key):
+        """Drop the entry of ``key``, e.g. results that turned out incomplete"""
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def to_dict(self):
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "ttl_seconds": self.ttl,
+            "entries": len(self._entries),
+            "in_flight": len(self._inflight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_ratio": round((self.hits + self.coalesced) / lookups, 3) if lookups else None,
+        }
@@ -0,0 +1,77 @@
+import re
+import urllib.parse
+
+
+SLUG_PATTERN = re.compile(r"^[a-z0-9-]+$")
+
+# sahibinden's own `sorting` values
+SORT_ORDERS = ("date_desc", "date_asc", "price_asc", "price_desc")
+
+
+class SearchTarget:
+    """One sahibinden search: category and city path plus filters
+
+    ``category`` and ``city`` are URL slugs (``satilik``, ``kiralik-daire``,
+    ``bursa``, ``istanbul-kadikoy``...). Price bounds and sort order are
+    passed to the site; ``rooms`` (e.g. ``["2+1", "3+1"]``) is matched
+    against the results table cells, since the site's room filter uses
+    opaque IDs. ``params`` adds raw query parameters for anything else.
+    """
+
+    def __init__(self, city="bursa", category="satilik", price_min=None, price_max=None, rooms=None,
+                 sort=None, params=None):
+        for name, value in (("city", city), ("category", category)):
+            if not SLUG_PATTERN.match(value):
+                raise ValueError(f"Invalid {name} slug: {value!r}")
+        if sort is not None and sort not in SORT_ORDERS:
+            raise ValueError(f"Invalid sort order: {sort!r}")
+        self.city = city
+        self.category = category
+        self.price_min = price_min
+        self.price_max = price_max
+        self.rooms = [room.strip() for room in rooms] if rooms else None
+        self.sort = sort
+        self.params = dict(params or {})
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{key: value for key, value in data.items() if value is not None})
+
+    def query(self):
+        """Query parameters the site filters on"""
+        query = dict(self.params)
+        if self.price_min is not None:
+            query['price_min'] = self.price_min
+        if self.price_max is not None:
+            query['price_max'] = self.price_max
+        if self.sort:
+            query['sorting'] = self.sort
+        return query
+
+    def url(self, base_url, **extra_params):
+        """Results page URL on ``base_url``, with ``extra_params`` (e.g. paging) appended"""
+        url = f"{base_url}/{self.category}/{self.city}"
+        query = {**self.query(), **extra_params}
+        if query:
+            url = f"{url}?{urllib.parse.urlencode(query)}"
+        return url
+
+    def matches_row(self, row):
+        """Whether a results-table row passes the filters the site can't apply"""
+        if not self.rooms or not row.get("attributes"):
+            return True
+        return any(cell in self.rooms for cell in row["attributes"].values())
+
+    def to_dict(self):
+        return {
+            "city": self.city,
+            "category": self.category,
+            "price_min": self.price_min,
+            "price_max": self.price_max,
+            "rooms": self.rooms,
+            "sort": self.sort,
+            "params": self.params or None,
+        }
+
+    def __repr__(self):
+        return f"SearchTarget({self.url('')})"
@@ -0,0 +1,117 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+
+
+LISTING_ID_PATTERN = re.compile(r"-(\d+)/detay")
+
+
+def listing_id_from_url(listing_url):
+    """Listing ID from an /ilan/{title}-{id}/detay URL, or None"""
+    match = LISTING_ID_PATTERN.search(listing_url)
+    return match.group(1) if match else None
+
+
+def content_hash(listing_data):
+    """Stable hash of a scraped listing's content"""
+    payload = json.dumps(listing_data, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class SeenIndex:
+    """Persistent SQLite index of listings scraped by earlier runs
+
+    Keyed on the listing ID, it remembers the content hash of the last
+    scrape and the price/date shown for the listing on the results table,
+    so later runs can skip detail pages that cannot have changed.
+    """
+
+    def __init__(self, path=None):
+        if path is None:
+            path = os.getenv("SEEN_INDEX_PATH", "data/seen_listings.db")
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS seen_listings (
+                listing_id TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                content_hash TEXT,
+                list_price TEXT,
+                list_date TEXT,
+                first_seen REAL NOT NULL,
+                last_seen REAL NOT NULL
+            )
+        """)
+        self.conn.commit()
+
+    def get(self, listing_id):
+        row = self.conn.execute(
+            "SELECT url, content_hash, list_price, list_date, first_seen, last_seen "
+            "FROM seen_listings WHERE listing_id = ?", (listing_id,)).fetchone()
+        if row is None:
+            return None
+        url, digest, list_price, list_date, first_seen, last_seen = row
+        return {
+            "listing_id": listing_id,
+            "url": url,
+            "content_hash": digest,
+            "list_price": list_price,
+            "list_date": list_date,
+            "first_seen": first_seen,
+            "last_seen": last_seen,
+        }
+
+    def needs_scrape(self, row, recheck_changed=False):
+        """Whether a results-table row needs its detail page scraped
+
+        Unknown listings always do. Known ones only do when
+        ``recheck_changed`` is set and the row's price or date moved.
+        """
+        listing_id = listing_id_from_url(row["url"])
+        if listing_id is None:
+            return True
+        seen = self.get(listing_id)
+        if seen is None:
+            return True
+        if recheck_changed:
+            return seen["list_price"] != row.get("price") or seen["list_date"] != row.get("date")
+        return False
+
+    def touch(self, rows):
+        """Refresh last_seen for results-table rows that were skipped"""
+        now = time.time()
+        ids = [listing_id_from_url(row["url"]) for row in rows]
+        self.conn.executemany(
+            "UPDATE seen_listings SET last_seen = ? WHERE listing_id = ?",
+            [(now, listing_id) for listing_id in ids if listing_id])
+        self.conn.commit()
+
+    def record(self, listing_data, row=None):
+        """Store a freshly scraped listing along with its results-table row"""
+        listing_id = listing_id_from_url(listing_data["url"])
+        if listing_id is None:
+            return
+        now = time.time()
+        row = row or {}
+        self.conn.execute("""
+            INSERT INTO seen_listings
+                (listing_id, url, content_hash, list_price, list_date, first_seen, last_seen)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(listing_id) DO UPDATE SET
+                url = excluded.url,
+                content_hash = excluded.content_hash,
+                list_price = excluded.list_price,
+                list_date = excluded.list_date,
+                last_seen = excluded.last_seen
+        """, (listing_id, listing_data["url"], content_hash(listing_data),
+              row.get("price"), row.get("date"), now, now))
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,130 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+
+class CloudflareStats:
+    """Process-wide counters for captcha solves and clearance reuse"""
+
+    def __init__(self):
+        self.solves_attempted = 0
+        self.solves_succeeded = 0
+        self.solve_seconds_total = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cold_starts = 0
+
+    def record_solve(self, success, duration):
+        self.solves_attempted += 1
+        self.solve_seconds_total += duration
+        if success:
+            self.solves_succeeded += 1
+
+    def record_clearance(self, reused):
+        """Count whether a cached or warm session opened the results page without solving a challenge"""
+        if reused:
+            self.cache_hits += 1
+        else:
+            self.cache_misses += 1
+
+    def record_cold_start(self):
+        """Count a results page opened in a session with no clearance to reuse"""
+        self.cold_starts += 1
+
+    def to_dict(self):
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            "solves_attempted": self.solves_attempted,
+            "solves_succeeded": self.solves_succeeded,
+            "solve_rate": round(self.solves_succeeded / self.solves_attempted, 3) if self.solves_attempted else None,
+            "avg_solve_seconds": round(self.solve_seconds_total / self.solves_attempted, 2) if self.solves_attempted else None,
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "cache_hit_ratio": round(self.cache_hits / lookups, 3) if lookups else None,
+            "cold_starts": self.cold_starts,
+        }
+
+
+cloudflare_stats = CloudflareStats()
+
+
+def session_key(proxy=None):
+    """Cache key for a proxy; clearance is tied to the exit IP"""
+    if proxy and proxy.get('server'):
+        return proxy['server']
+    return "direct"
+
+
+class SessionCache:
+    """On-disk cache of Cloudflare-cleared browser sessions
+
+    One entry per proxy holds the context's storage state (cookies and
+    local storage) and the user agent it was cleared with, so later runs
+    and other pool workers can skip the challenge until it expires.
+    """
+
+    def __init__(self, directory=None, ttl_minutes=None):
+        if directory is None:
+            directory = os.getenv("SESSION_CACHE_DIR", "data/sessions")
+        if ttl_minutes is None:
+            ttl_minutes = float(os.getenv("SESSION_TTL_MINUTES", 30))
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.ttl = ttl_minutes * 60
+
+    def _path(self, key):
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.directory, f"{digest}.json")
+
+    def load(self, key):
+        """Cached session for ``key``, or None when missing or expired"""
+        try:
+            with open(self._path(key), encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if time.time() >= entry.get("expires_at", 0):
+            self.invalidate(key)
+            return None
+        return entry
+
+    async def save_from_page(self, key, page):
+        """Persist the cleared session of ``page``'s browser context"""
+        storage_state = await page.context.storage_state()
+        user_agent = await page.evaluate("navigator.userAgent")
+
+        expires_at = time.time() + self.ttl
+        # Never outlive the clearance cookie itself
+        for cookie in storage_state.get("cookies", []):
+            if cookie.get("name") == "cf_clearance" and cookie.get("expires", -1) > 0:
+                expires_at = min(expires_at, cookie["expires"])
+
+        entry = {
+            "key": key,
+            "saved_at": time.time(),
+            "expires_at": expires_at,
+            "user_agent": user_agent,
+            "storage_state": storage_state,
+        }
+
+        # Write atomically so concurrent readers never see a partial file, through
+        # a temporary file of its own so concurrent saves don't write into each other's
+        with tempfile.NamedTemporaryFile("w", dir=self.directory, suffix=".tmp", delete=False,
+                                         encoding='utf-8') as f:
+            tmp_path = f.name
+            try:
+                json.dump(entry, f)
+            except BaseException:
+                f.close()
+                os.remove(tmp_path)
+                raise
+        os.replace(tmp_path, self._path(key))
+
+    def invalidate(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
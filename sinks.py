@@ -0,0 +1,265 @@
+import csv
+import json
+import os
+import sqlite3
+from datetime import datetime, timezone
+
+from records import ATTRIBUTE_SCHEMA, ListingRecord, parse_bool, parse_int
+from timing import phase
+
+
+SINK_FORMATS = ("parquet", "csv", "jsonl", "sqlite")
+
+EXTENSIONS = {
+    ".parquet": "parquet",
+    ".csv": "csv",
+    ".jsonl": "jsonl",
+    ".ndjson": "jsonl",
+    ".db": "sqlite",
+    ".sqlite": "sqlite",
+    ".sqlite3": "sqlite",
+}
+
+# Flat column layout shared by the tabular sinks: the record's scalar
+# fields, one column per known attribute, then the nested parts as text.
+RECORD_COLUMNS = {
+    "listing_id": int,
+    "url": str,
+    "title": str,
+    "price": int,
+    "currency": str,
+    "province": str,
+    "area": str,
+    "neighborhood": str,
+    "date": str,
+    "gross_m2": int,
+    "net_m2": int,
+    "rooms": int,
+    "living_rooms": int,
+    "description": str,
+    "owner_type": str,
+    "owner_name": str,
+    "store_name": str,
+    "summary": bool,
+}
+ATTRIBUTE_COLUMNS = {
+    key: int if parse is parse_int else bool if parse is parse_bool else str
+    for key, parse in ATTRIBUTE_SCHEMA.values()
+}
+COLUMNS = {
+    **RECORD_COLUMNS,
+    **ATTRIBUTE_COLUMNS,
+    "phones": str,
+    "extra_attributes": str,
+    "scraped_at": str,
+}
+
+
+def flat_row(record, scraped_at):
+    """One flat dict per listing, keyed by COLUMNS"""
+    row = {name: getattr(record, name) for name in RECORD_COLUMNS}
+    row.update({key: record.attributes.get(key) for key in ATTRIBUTE_COLUMNS})
+    row["phones"] = " | ".join(
+        f"{phone['type']}: {phone['number']}" if phone["type"] else phone["number"]
+        for phone in record.phones) or None
+    row["extra_attributes"] = (
+        json.dumps(record.extra_attributes, ensure_ascii=False) if record.extra_attributes else None)
+    row["scraped_at"] = scraped_at
+    return row
+
+
+class Sink:
+    """Buffers listings and writes them out in batches
+
+    Listings (raw dicts or ListingRecord objects) are parsed into records
+    on ``write`` and flushed every ``batch_size`` rows, so a long crawl
+    keeps at most one batch in memory and a crash loses at most one batch.
+    ``close`` flushes the rest, ``discard`` drops a sink nothing was
+    written to.
+    """
+
+    format = None
+
+    def __init__(self, path, batch_size=None):
+        if batch_size is None:
+            batch_size = int(os.getenv("EXPORT_BATCH_SIZE", 100))
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        # A SQLite export may reuse a database filled by earlier runs
+        self.created = not os.path.exists(path)
+        self.batch_size = max(1, batch_size)
+        self.rows_written = 0
+        self._buffer = []
+
+    def write(self, listing):
+        if not isinstance(listing, ListingRecord):
+            listing = ListingRecord.from_raw(listing)
+        self._buffer.append(listing)
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        with phase("export"):
+            self.write_batch(self._buffer, datetime.now(timezone.utc).isoformat(timespec='seconds'))
+        self.rows_written += len(self._buffer)
+        self._buffer = []
+
+    def write_batch(self, records, scraped_at):
+        raise NotImplementedError
+
+    def close(self):
+        self.flush()
+
+    def discard(self):
+        """Close a sink that won't be used, deleting its file if this sink created it"""
+        self._buffer = []
+        self.close()
+        if self.created and self.rows_written == 0:
+            for path in (self.path, self.path + "-wal", self.path + "-shm"):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def to_dict(self):
+        return {"format": self.format, "path": self.path, "rows": self.rows_written}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class JsonLinesSink(Sink):
+    """One compact ListingRecord.to_dict() object per line"""
+
+    format = "jsonl"
+
+    def __init__(self, path, batch_size=None):
+        super().__init__(path, batch_size)
+        self.file = open(path, "w", encoding='utf-8')
+
+    def write_batch(self, records, scraped_at):
+        for record in records:
+            self.file.write(json.dumps({**record.to_dict(), "scraped_at": scraped_at}, ensure_ascii=False))
+            self.file.write("\n")
+        self.file.flush()
+
+    def close(self):
+        super().close()
+        self.file.close()
+
+
+class CsvSink(Sink):
+    """Flat rows with a header, one column per COLUMNS entry"""
+
+    format = "csv"
+
+    def __init__(self, path, batch_size=None):
+        super().__init__(path, batch_size)
+        # utf-8-sig so spreadsheet apps read the Turkish characters right
+        self.file = open(path, "w", encoding='utf-8-sig', newline="")
+        self.writer = csv.DictWriter(self.file, fieldnames=list(COLUMNS))
+        self.writer.writeheader()
+
+    def write_batch(self, records, scraped_at):
+        self.writer.writerows(flat_row(record, scraped_at) for record in records)
+        self.file.flush()
+
+    def close(self):
+        super().close()
+        self.file.close()
+
+
+class SqliteSink(Sink):
+    """Flat rows in a ``listings`` table, upserted by listing ID
+
+    Re-exporting a listing updates its row in place, so the same database
+    can be fed by every run. Values the new row lacks are kept, so a
+    summary row refreshes the price of a detail-scraped listing without
+    wiping its description and owner. Listings without an ID are skipped.
+    """
+
+    format = "sqlite"
+
+    SQL_TYPES = {int: "INTEGER", bool: "INTEGER", str: "TEXT"}
+
+    def __init__(self, path, batch_size=None, table="listings"):
+        super().__init__(path, batch_size)
+        self.table = table
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        columns = ",\n".join(
+            f"{name} {self.SQL_TYPES[kind]}{' PRIMARY KEY' if name == 'listing_id' else ''}"
+            for name, kind in COLUMNS.items())
+        self.conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (\n{columns}\n)")
+        self.conn.commit()
+
+        names = ", ".join(COLUMNS)
+        placeholders = ", ".join(f":{name}" for name in COLUMNS)
+        updates = ", ".join(
+            f"{name} = MIN({name}, excluded.{name})" if name == "summary"
+            else f"{name} = COALESCE(excluded.{name}, {name})"
+            for name in COLUMNS if name != "listing_id")
+        self.upsert_sql = (
+            f"INSERT INTO {table} ({names}) VALUES ({placeholders}) "
+            f"ON CONFLICT(listing_id) DO UPDATE SET {updates}")
+
+    def write_batch(self, records, scraped_at):
+        rows = [flat_row(record, scraped_at) for record in records if record.listing_id is not None]
+        with self.conn:
+            self.conn.executemany(self.upsert_sql, rows)
+
+    def close(self):
+        super().close()
+        self.conn.close()
+
+
+class ParquetSink(Sink):
+    """Flat rows in a Parquet file, one row group per batch
+
+    Needs pyarrow, which is not a core dependency: ``pip install pyarrow``.
+    """
+
+    format = "parquet"
+
+    def __init__(self, path, batch_size=None):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise RuntimeError("Parquet export needs pyarrow: pip install pyarrow") from None
+        super().__init__(path, batch_size)
+        self.pyarrow = pyarrow
+        arrow_types = {int: pyarrow.int64(), bool: pyarrow.bool_(), str: pyarrow.string()}
+        self.schema = pyarrow.schema([(name, arrow_types[kind]) for name, kind in COLUMNS.items()])
+        self.writer = pyarrow.parquet.ParquetWriter(path, self.schema)
+
+    def write_batch(self, records, scraped_at):
+        rows = [flat_row(record, scraped_at) for record in records]
+        self.writer.write_table(self.pyarrow.Table.from_pylist(rows, schema=self.schema))
+
+    def close(self):
+        super().close()
+        self.writer.close()
+
+
+SINK_CLASSES = {
+    "parquet": ParquetSink,
+    "csv": CsvSink,
+    "jsonl": JsonLinesSink,
+    "sqlite": SqliteSink,
+}
+
+
+def open_sink(spec, batch_size=None):
+    """Sink for a ``FORMAT:PATH`` spec, or a bare path with a known extension"""
+    sink_format, separator, path = spec.partition(":")
+    if not separator or sink_format not in SINK_CLASSES:
+        path = spec
+        sink_format = EXTENSIONS.get(os.path.splitext(spec)[1].lower())
+        if sink_format is None:
+            raise ValueError(f"Unknown export format for {spec!r}, use one of {', '.join(SINK_FORMATS)}")
+    return SINK_CLASSES[sink_format](path, batch_size)
@@ -0,0 +1,117 @@
+import asyncio
+
+import httpx
+import pytest
+
+import main
+from replay_server import ReplayServer
+
+
+class FakeResponse:
+    def __init__(self, status):
+        self.status = status
+        self.headers = {}
+
+
+class FakeContext:
+    def on(self, *args):
+        pass
+
+    def remove_listener(self, *args):
+        pass
+
+    async def route(self, *args):
+        pass
+
+    async def unroute(self, *args):
+        pass
+
+    async def new_page(self):
+        return FakePage(self)
+
+
+class FakePage:
+    """Just enough of a Playwright page to scrape the replay server with the html engine"""
+
+    # URL substrings whose navigations time out or answer 404, shared by every page
+    failing = set()
+    gone = set()
+
+    def __init__(self, context):
+        self.context = context
+        self.url = ""
+        self.html = ""
+
+    async def goto(self, url, **kwargs):
+        self.url = url
+        if any(part in url for part in self.failing):
+            raise Exception("Timeout 60000ms exceeded")
+        if any(part in url for part in self.gone):
+            return FakeResponse(404)
+        async with httpx.AsyncClient() as client:
+            response = await client.get(url)
+        self.html = response.text
+        return FakeResponse(response.status_code)
+
+    async def wait_for_selector(self, *args, **kwargs):
+        pass
+
+    async def wait_for_load_state(self, *args, **kwargs):
+        pass
+
+    async def title(self):
+        return "ilan"
+
+    async def query_selector(self, selector):
+        return None
+
+    async def content(self):
+        return self.html
+
+    def is_closed(self):
+        return False
+
+    async def close(self):
+        pass
+
+
+class FakeBrowser:
+    def is_connected(self):
+        return True
+
+    async def new_page(self):
+        return FakePage(FakeContext())
+
+
+class FakeCamoufox:
+    def __init__(self, **options):
+        pass
+
+    async def __aenter__(self):
+        await asyncio.sleep(0)
+        return FakeBrowser()
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+
+@pytest.fixture
+def fake_browser(monkeypatch):
+    """Camoufox replaced by FakeCamoufox, with pacing and retry delays turned off"""
+    monkeypatch.setattr(main, "AsyncCamoufox", FakeCamoufox)
+    monkeypatch.setenv("MIN_HOST_INTERVAL", "0")
+    monkeypatch.setenv("PACING_BASE_DELAY", "0")
+    monkeypatch.setenv("RETRY_BASE_DELAY", "0")
+    FakePage.failing, FakePage.gone = set(), set()
+    yield FakePage
+    FakePage.failing, FakePage.gone = set(), set()
+
+
+@pytest.fixture
+def replay():
+    """A replay server with 30 listings the scraper points at"""
+    base_url = main.BASE_URL
+    with ReplayServer(listings=30) as server:
+        main.set_base_url(server.url)
+        yield server
+    main.set_base_url(base_url)
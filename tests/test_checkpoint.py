@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+
+import main
+from checkpoint import CheckpointInUse, CheckpointNotFound, CheckpointStore
+
+
+def url(n):
+    return f"https://www.sahibinden.com/ilan/emlak-konut-satilik-daire-{n}/detay"
+
+
+def test_store_resumes_position_and_results(tmp_path):
+    store = CheckpointStore(str(tmp_path / "checkpoints.db"), interval=2)
+    checkpoint = store.create({"limit": 10})
+    checkpoint.begin()
+    checkpoint.start_page(0, [url(1), url(2), url(3)])
+    checkpoint.record({"url": url(1)})
+    checkpoint.record({"url": url(2)})
+    with pytest.raises(CheckpointInUse):
+        store.open(checkpoint.id)
+    checkpoint.finish("interrupted")
+
+    resumed = store.open(checkpoint.id)
+    assert resumed.options == {"limit": 10}
+    assert resumed.resumed
+    assert resumed.pending == [url(3)]
+    assert list(resumed.done) == [url(1), url(2)]
+    assert [listing["url"] for listing in resumed.results()] == [url(1), url(2)]
+    assert store.get(checkpoint.id)["status"] == "interrupted"
+
+    assert store.delete(checkpoint.id)
+    with pytest.raises(CheckpointNotFound):
+        store.open(checkpoint.id)
+    store.close()
+
+
+def test_interrupted_crawl_resumes_without_duplicates(fake_browser, replay, tmp_path):
+    store = CheckpointStore(str(tmp_path / "checkpoints.db"), interval=1)
+    checkpoint = store.create({"limit": 20})
+
+    async def scrape_until(stop_after):
+        listings = []
+        scraper = main.iter_scraper(20, engine="html", checkpoint=checkpoint)
+        async for listing_data in scraper:
+            listings.append(listing_data)
+            if len(listings) == stop_after:
+                break
+        await scraper.aclose()
+        return listings
+
+    first = asyncio.run(scrape_until(7))
+    assert store.get(checkpoint.id)["status"] == "interrupted"
+
+    checkpoint = store.open(checkpoint.id)
+    resumed = asyncio.run(scrape_until(None))
+    assert store.get(checkpoint.id)["status"] == "completed"
+    assert resumed[:7] == first
+    urls = [listing["url"] for listing in resumed]
+    assert len(urls) == 20 and len(set(urls)) == 20
+    store.close()
@@ -0,0 +1,16 @@
+import governor
+from governor import ResourceGovernor
+
+
+def test_status_reuses_the_cached_browser_measurement(monkeypatch):
+    calls = []
+    monkeypatch.setattr(governor, "browser_rss", lambda: calls.append(1) or 600 * governor.MB)
+    resources = ResourceGovernor(browser_memory_mb=500, measure_interval=60)
+    resources.browsers = 1
+
+    for _ in range(5):
+        status = resources.to_dict()
+    assert status["browser_rss_mb"] == 600
+    assert status["browser_estimate_mb"] == 600
+    assert resources.measured_rss == 600 * governor.MB
+    assert len(calls) == 1
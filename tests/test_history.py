@@ -0,0 +1,72 @@
+import asyncio
+
+import main
+from history import ListingHistory
+from replay_server import FIRST_LISTING_ID
+
+
+def scrape(history, limit=100, mode="detail"):
+    return asyncio.run(main.run_scraper(limit, engine="html", mode=mode, history=history))
+
+
+def test_failed_detail_fetch_does_not_mark_listing_removed(fake_browser, replay, tmp_path):
+    history = ListingHistory(str(tmp_path / "history.db"), removed_after_runs=1)
+    listings = scrape(history)
+    assert len(listings) == 30
+
+    # Still listed, but its detail page keeps failing
+    fake_browser.failing.add(f"-{FIRST_LISTING_ID + 3}/detay")
+    assert len(scrape(history)) == 29
+    assert [change for change in history.changes_since() if change["kind"] == "removed"] == []
+    history.close()
+
+
+def test_taken_down_listing_is_marked_removed(fake_browser, replay, tmp_path):
+    history = ListingHistory(str(tmp_path / "history.db"), removed_after_runs=1)
+    scrape(history)
+
+    # Still in the results, but its detail page answers 404
+    fake_browser.gone.add(f"-{FIRST_LISTING_ID + 3}/detay")
+    scrape(history)
+    removed = [change["listing_id"] for change in history.changes_since() if change["kind"] == "removed"]
+    assert removed == [FIRST_LISTING_ID + 3]
+    history.close()
+
+
+def listing(listing_id, price, description="Daire"):
+    return {
+        "url": f"https://www.sahibinden.com/ilan/emlak-konut-satilik-daire-{listing_id}/detay",
+        "title": "Daire",
+        "price": f"{price} TL",
+        "description": description,
+    }
+
+
+def test_new_changed_and_removed_listings(tmp_path):
+    history = ListingHistory(str(tmp_path / "history.db"), removed_after_runs=2)
+
+    run = history.begin_run("bursa")
+    assert run.observe(listing(1, 1000)) == ["new"]
+    assert run.observe(listing(2, 2000)) == ["new"]
+    run.finish(complete=True)
+
+    run = history.begin_run("bursa")
+    assert run.observe(listing(1, 900)) == ["price_changed"]
+    assert run.observe(listing(1, 900, "Yeni açıklama")) == ["description_changed"]
+    assert run.finish(complete=True) == 0
+
+    # An incomplete run (e.g. stopped by its limit) doesn't count towards removals
+    history.begin_run("bursa").finish(complete=False)
+    run = history.begin_run("bursa")
+    run.observe(listing(1, 900, "Yeni açıklama"))
+    assert run.finish(complete=True) == 1
+
+    changes = [(change["kind"], change["listing_id"]) for change in history.changes_since()]
+    assert changes == [("new", 1), ("new", 2), ("price_changed", 1), ("description_changed", 1), ("removed", 2)]
+    assert history.get(2)["removed_at"] is not None
+    assert [entry["price"] for entry in history.price_history(1)] == [1000, 900]
+
+    run = history.begin_run("bursa")
+    assert run.observe(listing(2, 2000)) == ["relisted"]
+    run.finish()
+    history.close()
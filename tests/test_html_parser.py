@@ -0,0 +1,58 @@
+import pytest
+
+from html_parser import parse_listing_html, parse_results_html
+from replay_server import FIRST_LISTING_ID, ReplayServer, listing_fields
+
+
+@pytest.fixture(scope="module")
+def pages():
+    """Replay server used only to render its fixture pages"""
+    server = ReplayServer(listings=60)
+    yield server
+    server.httpd.server_close()
+
+
+def test_individual_listing(pages):
+    listing = parse_listing_html(pages.render_listing(FIRST_LISTING_ID), "url")
+    expected = listing_fields(0)
+    assert listing["title"] == expected["title"]
+    assert listing["price"] == expected["price"]
+    assert (listing["province"], listing["area"], listing["neighborhood"]) == ("Bursa", "Nilüfer", "Görükle")
+    assert listing["date"] == expected["date"]
+    assert listing["owner_type"] == "Individual"
+    assert listing["owner_name"] == expected["owner_name"]
+    assert listing["owner_phone"] == f"Cep: {expected['phone']}"
+    assert listing["store_name"] == "N/A"
+    assert listing["attributes"]["İlan No"] == str(FIRST_LISTING_ID)
+    assert listing["attributes"]["Oda Sayısı"] == expected["rooms"]
+
+
+def test_agent_listing(pages):
+    listing = parse_listing_html(pages.render_listing(FIRST_LISTING_ID + 1), "url")
+    expected = listing_fields(1)
+    assert listing["owner_type"] == "Agent"
+    assert listing["store_name"] == expected["store_name"]
+    assert listing["owner_phone"] == f"İş: {expected['office_phone']} | Cep: {expected['phone']}"
+    assert listing["description"].startswith(expected["store_name"])
+
+
+def test_fields_limit_the_sections(pages):
+    listing = parse_listing_html(pages.render_listing(FIRST_LISTING_ID + 1), "url", fields=["price", "location"])
+    assert listing == {
+        "url": "url",
+        "price": listing_fields(1)["price"],
+        "province": "Bursa",
+        "area": "Osmangazi",
+        "neighborhood": "Çekirge",
+    }
+
+
+def test_results_page_rows(pages):
+    rows = parse_results_html(pages.render_results(0, 50), "http://replay")
+    assert len(rows) == 50
+    first = rows[0]
+    assert first["url"] == f"http://replay/ilan/emlak-konut-satilik-nilufer-gorukle-{FIRST_LISTING_ID}/detay"
+    assert first["title"] == listing_fields(0)["title"]
+    assert first["price"] == listing_fields(0)["price"]
+    assert first["location"] == ["Nilüfer", "Görükle"]
+    assert first["attributes"] == {"m² (Brüt)": "70", "Oda Sayısı": "1+1"}
@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+
+from jobs import JobManager, JobQueueFull
+
+
+async def slow_runner(options):
+    await asyncio.sleep(0.2)
+    yield {"job": options}
+
+
+def test_cancelled_queued_jobs_free_their_queue_slot_and_resources():
+    async def run():
+        cancelled = []
+        manager = JobManager(slow_runner, max_concurrent_jobs=1, max_queued_jobs=1, on_cancel=cancelled.append)
+        manager.start()
+        running = manager.submit("running")
+        await asyncio.sleep(0.01)
+        queued = manager.submit("queued")
+        with pytest.raises(JobQueueFull):
+            manager.submit("rejected")
+
+        manager.cancel(queued.id)
+        assert queued.status == "cancelled"
+        assert cancelled == ["queued"]
+        left_behind = manager.submit("left behind")
+
+        await manager.stop()
+        assert cancelled == ["queued", "left behind"]
+        assert left_behind.status == "cancelled"
+        assert running.status == "cancelled"
+
+    asyncio.run(run())
+
+
+def test_jobs_collect_results():
+    async def run():
+        manager = JobManager(slow_runner)
+        manager.start()
+        job = manager.submit("a")
+        while not job.finished:
+            await asyncio.sleep(0.05)
+        await manager.stop()
+        return job
+
+    job = asyncio.run(run())
+    assert job.status == "completed"
+    assert job.results == [{"job": "a"}]
@@ -0,0 +1,13 @@
+import asyncio
+import time
+
+import main
+
+
+def test_sequential_detail_pages_keep_the_host_interval(fake_browser, replay, monkeypatch):
+    monkeypatch.setenv("MIN_HOST_INTERVAL", "0.2")
+    start = time.monotonic()
+    listings = asyncio.run(main.run_scraper(3, concurrency=1, engine="html"))
+    assert len(listings) == 3
+    # Three request starts, at least two intervals apart
+    assert time.monotonic() - start >= 0.4
@@ -0,0 +1,70 @@
+import pytest
+
+from records import ListingRecord, parse_date, parse_phones, parse_price, parse_rooms
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("3.450.000 TL", (3450000, "TRY")),
+    ("125.000 €", (125000, "EUR")),
+    ("1.250.000,50 TL", (1250000, "TRY")),
+    ("N/A", (None, None)),
+    (None, (None, None)),
+])
+def test_parse_price(text, expected):
+    assert parse_price(text) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("17 Ekim 2026", "2026-10-17"),
+    ("1 şubat 2026", "2026-02-01"),
+    ("3 Aralık 2025", "2025-12-03"),
+    ("17 October 2026", None),
+    ("Ekim 2026", None),
+    ("N/A", None),
+])
+def test_parse_date(text, expected):
+    assert parse_date(text) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("3+1", (3, 1)),
+    ("Stüdyo (1+0)", (1, 0)),
+    ("10 üzeri", (10, None)),
+    ("N/A", (None, None)),
+])
+def test_parse_rooms(text, expected):
+    assert parse_rooms(text) == expected
+
+
+def test_parse_phones():
+    assert parse_phones("Cep: 0 (530) 100 10 10 | 0 (224) 200 10 10") == [
+        {"type": "Cep", "number": "0 (530) 100 10 10"},
+        {"type": None, "number": "0 (224) 200 10 10"},
+    ]
+
+
+def test_record_from_raw_listing():
+    record = ListingRecord.from_raw({
+        "url": "https://www.sahibinden.com/ilan/emlak-konut-satilik-daire-1234567890/detay",
+        "title": "Daire",
+        "price": "2.100.000 TL",
+        "date": "N/A",
+        "owner_phone": "N/A",
+        "attributes": {
+            "İlan Tarihi": "5 Mart 2026",
+            "m² (Brüt)": "120",
+            "m² (Net)": "105",
+            "Oda Sayısı": "3+1",
+            "Bina Yaşı": "5-10 arası",
+            "Asansör": "Evet",
+            "Cephe": "Güney",
+        },
+    })
+    assert record.listing_id == 1234567890
+    assert (record.price, record.currency) == (2100000, "TRY")
+    assert record.date == "2026-03-05"
+    assert (record.gross_m2, record.net_m2, record.rooms, record.living_rooms) == (120, 105, 3, 1)
+    assert record.attributes == {"building_age": 5, "elevator": True}
+    assert record.extra_attributes == {"Cephe": "Güney"}
+    assert record.phones == []
+    assert "phones" not in record.to_dict()
@@ -0,0 +1,51 @@
+import asyncio
+
+from result_cache import ResultCache
+
+
+def test_concurrent_requests_share_one_run():
+    cache = ResultCache(ttl=60)
+    runs = []
+
+    async def runner():
+        runs.append(1)
+        await asyncio.sleep(0.05)
+        return ["listing"]
+
+    async def lookups():
+        first = await asyncio.gather(*(cache.get_or_run("key", runner) for _ in range(3)))
+        return first, await cache.get_or_run("key", runner)
+
+    first, later = asyncio.run(lookups())
+    assert len(runs) == 1
+    assert sorted(status for _, status, _ in first) == ["COALESCED", "COALESCED", "MISS"]
+    assert all(value == ["listing"] for value, _, _ in first)
+    assert later[:2] == (["listing"], "HIT")
+    assert (cache.misses, cache.coalesced, cache.hits) == (1, 2, 1)
+
+
+def test_failures_are_shared_but_not_cached():
+    cache = ResultCache(ttl=60)
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("blocked")
+
+    async def lookups():
+        results = await asyncio.gather(*(cache.get_or_run("key", failing) for _ in range(2)),
+                                       return_exceptions=True)
+        assert all(isinstance(result, RuntimeError) for result in results)
+        return await cache.get_or_run("key", lambda: asyncio.sleep(0, result=["ok"]))
+
+    assert asyncio.run(lookups())[:2] == (["ok"], "MISS")
+
+
+def test_expired_entries_are_dropped():
+    cache = ResultCache(ttl=0.01)
+
+    async def lookup():
+        await cache.get_or_run("key", lambda: asyncio.sleep(0, result=[]))
+        await asyncio.sleep(0.02)
+
+    asyncio.run(lookup())
+    assert cache.get("key") is None
@@ -0,0 +1,52 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import main
+from session_cache import SessionCache, cloudflare_stats
+
+
+class ClearedContext:
+    def __init__(self, name):
+        self.name = name
+
+    async def storage_state(self):
+        await asyncio.sleep(0)
+        return {"cookies": [{"name": "owner", "value": self.name * 200000}], "origins": []}
+
+
+class ClearedPage:
+    def __init__(self, name):
+        self.context = ClearedContext(name)
+
+    async def evaluate(self, expression):
+        return f"agent-{self.context.name}"
+
+
+def test_concurrent_saves_leave_a_whole_entry(tmp_path):
+    cache = SessionCache(str(tmp_path))
+
+    # Pool browsers and workers save from several threads or processes
+    with ThreadPoolExecutor(8) as executor:
+        list(executor.map(lambda name: asyncio.run(cache.save_from_page("direct", ClearedPage(name))),
+                          "abcdefgh" * 10))
+    entry = cache.load("direct")
+    assert entry["user_agent"] in {f"agent-{name}" for name in "abcdefgh"}
+    assert entry["storage_state"]["cookies"][0]["value"] == entry["user_agent"][-1] * 200000
+    assert [name for name in os.listdir(tmp_path) if name.endswith(".tmp")] == []
+
+
+def test_only_warm_sessions_count_toward_clearance_reuse(fake_browser, replay):
+    before = cloudflare_stats.to_dict()
+
+    async def open_pages():
+        async with main.AsyncCamoufox() as browser:
+            page = await browser.new_page()
+            assert await main.open_listings_page(page)
+            assert await main.open_listings_page(page, warm=True)
+
+    asyncio.run(open_pages())
+    after = cloudflare_stats.to_dict()
+    assert after["cold_starts"] - before["cold_starts"] == 1
+    assert after["cache_hits"] - before["cache_hits"] == 1
+    assert after["cache_misses"] == before["cache_misses"]
@@ -0,0 +1,74 @@
+import csv
+import json
+import sqlite3
+
+import pytest
+
+from sinks import open_sink
+
+URL = "https://www.sahibinden.com/ilan/emlak-konut-satilik-daire-1234567890/detay"
+
+DETAIL = {
+    "url": URL,
+    "title": "Daire",
+    "price": "2.100.000 TL",
+    "date": "5 Mart 2026",
+    "description": "Güney cephe",
+    "owner_type": "Individual",
+    "owner_phone": "Cep: 0 (530) 100 10 10",
+    "attributes": {"Oda Sayısı": "3+1", "Asansör": "Evet"},
+}
+SUMMARY = {"url": URL, "title": "Daire", "price": "1.950.000 TL", "attributes": {}, "summary": True}
+
+
+def test_jsonl_and_csv_rows(tmp_path):
+    with open_sink(str(tmp_path / "out.jsonl")) as jsonl, open_sink(f"csv:{tmp_path / 'out.csv'}") as table:
+        for sink in (jsonl, table):
+            sink.write(DETAIL)
+    assert (jsonl.rows_written, table.rows_written) == (1, 1)
+
+    with open(tmp_path / "out.jsonl", encoding="utf-8") as f:
+        record = json.loads(f.readline())
+    assert (record["listing_id"], record["price"], record["rooms"]) == (1234567890, 2100000, 3)
+
+    with open(tmp_path / "out.csv", encoding="utf-8-sig", newline="") as f:
+        row = next(csv.DictReader(f))
+    assert (row["listing_id"], row["price"], row["elevator"]) == ("1234567890", "2100000", "True")
+    assert row["phones"] == "Cep: 0 (530) 100 10 10"
+
+
+def test_sqlite_upsert_keeps_detail_values(tmp_path):
+    path = tmp_path / "listings.db"
+    with open_sink(str(path)) as sink:
+        sink.write(DETAIL)
+    # A later summary run refreshes the price without wiping the description
+    with open_sink(str(path)) as sink:
+        sink.write(SUMMARY)
+
+    conn = sqlite3.connect(path)
+    rows = conn.execute("SELECT listing_id, price, description, summary FROM listings").fetchall()
+    conn.close()
+    assert rows == [(1234567890, 1950000, "Güney cephe", 0)]
+
+
+@pytest.mark.parametrize("spec", ["csv:{dir}/new.csv", "jsonl:{dir}/new.jsonl", "sqlite:{dir}/new.db"])
+def test_discard_deletes_files_it_created(tmp_path, spec):
+    sink = open_sink(spec.format(dir=tmp_path))
+    sink.discard()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_discard_keeps_an_existing_database(tmp_path):
+    path = tmp_path / "listings.db"
+    with open_sink(str(path)) as sink:
+        sink.write(DETAIL)
+    open_sink(str(path)).discard()
+
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT COUNT(*) FROM listings").fetchone() == (1,)
+    conn.close()
+
+
+def test_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        open_sink(str(tmp_path / "out.xls"))
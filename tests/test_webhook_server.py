@@ -0,0 +1,64 @@
+from fastapi.testclient import TestClient
+
+import webhook_server
+
+
+# Requests rejected while building the request models never reach the
+# scraper, so the app is exercised without its lifespan (no browsers)
+client = TestClient(webhook_server.app)
+
+
+def test_get_scrape_rejects_bad_city_slug():
+    response = client.get("/webhook/scrape", params={"city": "Bad City"})
+    assert response.status_code == 422
+    assert response.json()["error_type"] == "invalid_request"
+
+
+def test_get_scrape_rejects_bad_category_slug():
+    response = client.get("/webhook/scrape", params={"category": "satılık"})
+    assert response.status_code == 422
+
+
+def test_get_scrape_rejects_unknown_export_format():
+    response = client.get("/webhook/scrape", params={"export": "csv,xls"})
+    assert response.status_code == 422
+    assert "xls" in response.json()["message"]
+
+
+def test_get_scrape_rejects_unknown_field():
+    response = client.get("/webhook/scrape", params={"fields": "price,bogus"})
+    assert response.status_code == 422
+    assert "bogus" in response.json()["message"]
+    assert "attributes" in response.json()["message"]
+
+
+def test_enrich_refuses_urls_off_the_scraped_site():
+    urls = [
+        "http://169.254.169.254/latest/meta-data/",
+        f"{webhook_server.main.BASE_URL}/kategori/emlak",
+        f"{webhook_server.main.BASE_URL}/ilan/x-1/detay?next=http://evil",
+        "https://evil.example/ilan/emlak-konut-satilik-1200000000/detay",
+    ]
+    response = client.post("/enrich", json={"urls": urls})
+    assert response.status_code == 200
+    assert response.json()["count"] == 0
+    assert [failure["url"] for failure in response.json()["failed"]] == urls
+
+
+def test_empty_fields_are_rejected():
+    assert client.post("/enrich", json={"urls": [], "fields": []}).status_code == 422
+    assert client.post("/webhook/scrape", json={"fields": []}).status_code == 422
+
+
+def test_limit_is_capped_over_all_targets(monkeypatch):
+    monkeypatch.setenv("MAX_LIMIT", "20")
+    request = webhook_server.ScrapeRequest(limit=20, targets=[{"city": f"bursa-{i}"} for i in range(5)])
+    kwargs = webhook_server.build_scraper_kwargs(request)
+    assert len(kwargs["targets"]) == 5
+    assert kwargs["limit"] * len(kwargs["targets"]) <= 20
+
+
+def test_single_target_keeps_the_full_limit(monkeypatch):
+    monkeypatch.setenv("MAX_LIMIT", "20")
+    kwargs = webhook_server.build_scraper_kwargs(webhook_server.ScrapeRequest(limit=50))
+    assert kwargs["limit"] == 20
@@ -0,0 +1,49 @@
+import pytest
+
+from work_queue import WorkQueue, first_pages
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = WorkQueue(str(tmp_path / "queue.db"), lease_seconds=60, max_attempts=2, retry_delay=0)
+    yield queue
+    queue.close()
+
+
+def test_listings_are_queued_and_stored_up_to_the_limit(queue):
+    crawl_id = queue.create_crawl({}, 3, [])
+    assert queue.enqueue_listings(crawl_id, [("1", {}), ("2", {}), ("1", {})]) == (2, False)
+    assert queue.enqueue_listings(crawl_id, [("3", {}), ("4", {})]) == (1, True)
+
+    assert queue.add_results(crawl_id, [("1", {"n": 1}), ("1", {"n": "again"})]) == (1, False)
+    assert queue.add_results(crawl_id, [("2", {"n": 2}), ("3", {"n": 3}), ("4", {"n": 4})]) == (2, True)
+    assert queue.results(crawl_id) == [{"n": 1}, {"n": 2}, {"n": 3}]
+
+
+def test_results_pages_lease_first_and_failures_retry(queue):
+    crawl_id = queue.create_crawl({"mode": "detail"}, 10, first_pages(None))
+    queue.enqueue_listings(crawl_id, [("1", {"url": "u1"})])
+
+    task = queue.lease("w1")
+    assert (task["kind"], task["attempt"], task["options"]) == ("results_page", 1, {"mode": "detail"})
+    queue.complete(task, "w1")
+
+    task = queue.lease("w1")
+    assert task["kind"] == "listing"
+    queue.fail(task, "w1", "Timeout")
+    task = queue.lease("w2")
+    assert (task["kind"], task["attempt"]) == ("listing", 2)
+    queue.fail(task, "w2", "Timeout")
+    assert queue.lease("w2") is None
+
+    status = queue.crawl_status(crawl_id)
+    assert status["status"] == "completed"
+    assert status["tasks"] == {"results_page": {"done": 1}, "listing": {"failed": 1}}
+    assert len(status["failed"]) == 1
+
+
+def test_cancelled_crawls_are_not_leased(queue):
+    crawl_id = queue.create_crawl({}, 10, first_pages(None))
+    assert queue.cancel(crawl_id)
+    assert queue.lease("w1") is None
+    assert queue.crawl_status(crawl_id)["status"] == "cancelled"
@@ -0,0 +1,75 @@
+import math
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from metrics import phase_seconds
+
+
+# Timer of the scrape running in the current task; tabs spawned with
+# asyncio.gather inherit it, so nested helpers don't need it passed in.
+current_timer = ContextVar("current_timer", default=None)
+
+
+class PhaseTimer:
+    """Accumulates wall-clock time per scrape phase
+
+    Individual durations are kept too, for percentiles in benchmarks, and
+    every duration also feeds the process-wide /metrics histogram.
+    """
+
+    def __init__(self):
+        self.totals = {}
+        self.counts = {}
+        self.samples = {}
+
+    def record(self, name, duration):
+        self.totals[name] = self.totals.get(name, 0.0) + duration
+        self.counts[name] = self.counts.get(name, 0) + 1
+        self.samples.setdefault(name, []).append(duration)
+        phase_seconds.observe(duration, phase=name)
+
+    def percentile(self, name, q):
+        """Nearest-rank ``q``-th percentile (0-100) of a phase, or None"""
+        samples = sorted(self.samples.get(name, []))
+        if not samples:
+            return None
+        rank = max(1, math.ceil(q / 100 * len(samples)))
+        return samples[rank - 1]
+
+    def summary(self):
+        return {
+            name: {
+                "count": self.counts[name],
+                "total_seconds": round(total, 3),
+                "avg_seconds": round(total / self.counts[name], 3),
+            }
+            for name, total in self.totals.items()
+        }
+
+    def print_summary(self):
+        if not self.totals:
+            return
+        print("⏱️  Time per phase:")
+        for name, stats in self.summary().items():
+            print(
+                f"   {name:<16} {stats['total_seconds']:8.2f}s total | "
+                f"{stats['count']:4d}x | {stats['avg_seconds']:6.2f}s avg")
+
+
+@contextmanager
+def phase(name):
+    """Time a block and record it on the current scrape's timer
+
+    Outside a scrape (e.g. browser pool warm-ups) only /metrics gets it.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        timer = current_timer.get()
+        if timer is not None:
+            timer.record(name, duration)
+        else:
+            phase_seconds.observe(duration, phase=name)
@@ -1,16 +1,134 @@
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel
-from typing import Optional
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
+from typing import Dict, List, Literal, Optional
+from contextlib import asynccontextmanager
 import asyncio
+import json
 import os
-from main import run_scraper
+import re
+import time
+import urllib.parse
+import uuid
+from datetime import datetime, timezone
+import main
+from main import enrich_listings, iter_scraper, run_scraper
+from browser_pool import BrowserPool
+from checkpoint import CheckpointInUse, CheckpointNotFound, CheckpointStore
+from extraction import LISTING_FIELDS
+from governor import HostSaturated, ResourceGovernor, ScrapeQueueFull, available_memory
+from history import CHANGE_KINDS, ListingHistory
+from html_parser import shutdown_parser_pool
+from seen_index import SeenIndex, listing_id_from_url
+from session_cache import SessionCache, cloudflare_stats
+from proxy_pool import ProxyPool
+from records import ListingRecord
+from resilience import ScrapeGuard, SessionBlocked
+from search import SORT_ORDERS, SearchTarget
+from sinks import SINK_FORMATS, open_sink
+from jobs import JobManager, JobQueueFull
+from metrics import errors_total, registry
+from result_cache import ResultCache
+from work_queue import WorkQueue, first_pages
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Sahibinden Scraper Webhook", version="1.0.0")
+browser_pool = None
+seen_index = None
+session_cache = None
+proxy_pool = None
+job_manager = None
+result_cache = None
+listing_history = None
+work_queue = None
+checkpoint_store = None
+governor = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Start the warm browser pool and job workers on startup and close them on shutdown
+    """
+    global browser_pool, seen_index, session_cache, proxy_pool, job_manager, result_cache, listing_history
+    global work_queue, checkpoint_store, governor
+
+    session_cache = SessionCache()
+    result_cache = ResultCache()
+
+    proxy_pool = ProxyPool.from_env()
+    if len(proxy_pool):
+        proxy_pool.start()
+        logger.info(f"Proxy pool loaded with {len(proxy_pool)} proxy(ies)")
+
+    # Shared by every scrape, so parallel requests can't launch more browsers than memory allows
+    governor = ResourceGovernor()
+
+    pool_size = int(os.getenv("BROWSER_POOL_SIZE", 1))
+    if pool_size > 0:
+        browser_pool = BrowserPool(
+            size=pool_size,
+            max_uses=int(os.getenv("BROWSER_MAX_USES", 20)),
+            max_age_minutes=int(os.getenv("BROWSER_MAX_AGE_MINUTES", 30)),
+            session_cache=session_cache,
+            proxy_pool=proxy_pool if len(proxy_pool) else None,
+            governor=governor,
+        )
+        browser_pool.start()
+        logger.info(f"Warming up browser pool with {pool_size} browser(s)")
+
+    seen_index = SeenIndex()
+    listing_history = ListingHistory()
+    checkpoint_store = CheckpointStore()
+
+    # Distributed crawls are run by worker.py processes sharing this queue
+    if os.getenv("WORK_QUEUE_PATH"):
+        work_queue = WorkQueue()
+        logger.info(f"Distributed crawls enabled, queue at {work_queue.path}")
+
+    job_manager = JobManager(
+        runner=iter_listing_payloads,
+        max_concurrent_jobs=int(os.getenv("MAX_CONCURRENT_JOBS", 1)),
+        max_queued_jobs=int(os.getenv("MAX_QUEUED_JOBS", 10)),
+        on_error=lambda e: classify_error(e)[1],
+        on_cancel=discard_scrape,
+    )
+    job_manager.start()
+
+    yield
+
+    await job_manager.stop()
+    job_manager = None
+
+    seen_index.close()
+    seen_index = None
+
+    listing_history.close()
+    listing_history = None
+
+    # After the job manager, whose cancelled jobs save their checkpoints
+    checkpoint_store.close()
+    checkpoint_store = None
+
+    if work_queue is not None:
+        work_queue.close()
+        work_queue = None
+
+    if browser_pool is not None:
+        await browser_pool.stop()
+        browser_pool = None
+
+    await proxy_pool.stop()
+    proxy_pool = None
+
+    governor = None
+
+    shutdown_parser_pool()
+
+
+app = FastAPI(title="Sahibinden Scraper Webhook", version="1.0.0", lifespan=lifespan)
 
 
 class ProxyConfig(BaseModel):
@@ -19,17 +137,115 @@ class ProxyConfig(BaseModel):
     password: Optional[str] = None
 
 
+class SearchQuery(BaseModel):
+    city: str = Field("bursa", pattern=r"^[a-z0-9-]+$")
+    category: str = Field("satilik", pattern=r"^[a-z0-9-]+$")
+    price_min: Optional[int] = None
+    price_max: Optional[int] = None
+    rooms: Optional[List[str]] = None
+    sort: Optional[Literal[SORT_ORDERS]] = None
+    params: Optional[Dict[str, str]] = None
+
+
+class ExportConfig(BaseModel):
+    format: Literal[SINK_FORMATS]
+    # File name under EXPORT_DIR; reusing a SQLite name upserts into the same database
+    name: Optional[str] = Field(None, pattern=r"^[\w][\w.-]*$")
+
+
 class ScrapeRequest(BaseModel):
     limit: Optional[int] = None
     proxy: Optional[ProxyConfig] = None
+    target: Optional[SearchQuery] = None
+    targets: Optional[List[SearchQuery]] = None
+    concurrency: Optional[int] = None
+    engine: Optional[Literal["evaluate", "html"]] = None
+    block_resources: Optional[bool] = None
+    incremental: bool = False
+    recheck_changed: bool = False
+    stream: Optional[Literal["ndjson", "sse"]] = None
+    cache: bool = True
+    mode: Literal["detail", "summary"] = "detail"
+    deep_scrape_changed: bool = False
+    typed: bool = False
+    export: Optional[List[ExportConfig]] = None
+    # Save progress so the crawl can be resumed if it dies (always on for jobs)
+    checkpoint: bool = False
+    # Checkpoint ID of an interrupted crawl to continue with its original options
+    resume: Optional[str] = None
+    # Detail page sections to extract (default all); leaving out "owner" skips the phone parsing
+    fields: Optional[List[Literal[tuple(LISTING_FIELDS)]]] = Field(None, min_length=1)
+
+
+# Options a checkpoint keeps to resume its crawl; proxy credentials are not stored
+CHECKPOINT_OPTIONS = {
+    "limit", "target", "targets", "concurrency", "engine", "block_resources", "incremental", "recheck_changed",
+    "mode", "deep_scrape_changed", "typed", "fields",
+}
 
 
 @app.get("/webhook/scrape")
-async def trigger_scrape_get(limit: int = None):
+async def trigger_scrape_get(limit: int = None, concurrency: int = None, engine: Literal["evaluate", "html"] = None,
+                             block_resources: bool = None, incremental: bool = False, recheck_changed: bool = False,
+                             stream: Literal["ndjson", "sse"] = None, cache: bool = True, city: str = None,
+                             category: str = None, price_min: int = None, price_max: int = None, rooms: str = None,
+                             sort: Literal[SORT_ORDERS] = None, mode: Literal["detail", "summary"] = "detail",
+                             deep_scrape_changed: bool = False, typed: bool = False, export: str = None,
+                             checkpoint: bool = False, resume: str = None, fields: str = None):
     """
     GET endpoint to trigger scraping (backwards compatibility)
+
+    A single search can be given with city, category, price_min, price_max,
+    rooms (comma-separated, e.g. 2+1,3+1) and sort. ``export`` is a
+    comma-separated list of formats written with default file names, and
+    ``fields`` a comma-separated list of detail page sections.
     """
-    return await trigger_scrape_logic(limit=limit, proxy=None)
+    target_fields = {
+        "city": city,
+        "category": category,
+        "price_min": price_min,
+        "price_max": price_max,
+        "rooms": rooms.split(",") if rooms else None,
+        "sort": sort,
+    }
+    target_fields = {key: value for key, value in target_fields.items() if value is not None}
+    formats = export.split(",") if export else []
+    unknown = [name for name in formats if name not in SINK_FORMATS]
+    if unknown:
+        return invalid_request(
+            f"Unknown export format(s): {', '.join(unknown)}. Supported formats: {', '.join(SINK_FORMATS)}")
+    sections = fields.split(",") if fields else []
+    unknown = [name for name in sections if name not in LISTING_FIELDS]
+    if unknown:
+        return invalid_request(
+            f"Unknown field(s): {', '.join(unknown)}. Allowed fields: {', '.join(LISTING_FIELDS)}")
+    try:
+        request = ScrapeRequest(limit=limit, concurrency=concurrency, engine=engine, block_resources=block_resources,
+                                incremental=incremental, recheck_changed=recheck_changed, stream=stream,
+                                cache=cache, target=SearchQuery(**target_fields) if target_fields else None,
+                                mode=mode, deep_scrape_changed=deep_scrape_changed, typed=typed,
+                                export=[ExportConfig(format=name) for name in formats] or None,
+                                checkpoint=checkpoint, resume=resume, fields=sections or None)
+    except ValidationError as e:
+        return invalid_request("; ".join(
+            f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in e.errors()))
+    return await trigger_scrape_logic(request)
+
+
+def invalid_request(message: str):
+    """
+    422 response for query parameters the request models reject, like the
+    ones FastAPI sends for invalid typed parameters
+    """
+    errors_total.inc(error_type="invalid_request")
+    return JSONResponse(
+        status_code=422,
+        content={
+            "status": "error",
+            "error_type": "invalid_request",
+            "message": message,
+        }
+    )
 
 
 @app.post("/webhook/scrape")
@@ -37,96 +253,904 @@ async def trigger_scrape_post(request: ScrapeRequest):
     """
     POST endpoint to trigger scraping with proxy support
     """
-    proxy_dict = None
-    if request.proxy:
-        proxy_dict = request.proxy.model_dump()
+    return await trigger_scrape_logic(request)
+
+
+def build_scraper_kwargs(request: ScrapeRequest, max_limit: int = None):
+    """
+    Turn a ScrapeRequest into run_scraper/iter_scraper keyword arguments,
+    applying environment defaults and limits
+
+    ``limit`` applies to each search, and is lowered so that all searches
+    together stay within ``max_limit`` (at least one listing per search).
+    Resuming a checkpoint restores the options the crawl was started with;
+    only the proxy and how results are delivered come from this request.
+    """
+    checkpoint = None
+    if request.resume:
+        checkpoint = checkpoint_store.open(request.resume)
+        request = ScrapeRequest(**{**request.model_dump(), **checkpoint.options})
+
+    # Get default values from environment or use hardcoded defaults
+    default_limit = int(os.getenv("DEFAULT_LIMIT", 5))
+    if max_limit is None:
+        # Summary rows come 50 per results page, so they can go much higher
+        if request.mode == "summary":
+            max_limit = int(os.getenv("MAX_SUMMARY_LIMIT", 500))
+        else:
+            max_limit = int(os.getenv("MAX_LIMIT", 20))
+
+    # One session crawls every search, capped like the other limits
+    queries = ([request.target] if request.target else []) + (request.targets or [])
+    max_targets = int(os.getenv("MAX_TARGETS", 5))
+    targets = [SearchTarget.from_dict(query.model_dump()) for query in queries[:max_targets]]
+
+    # Use default if limit not provided
+    limit = request.limit if request.limit is not None else default_limit
+
+    # Ensure limit is between 1 and max_limit over all searches; a resumed crawl keeps the one it was accepted with
+    if checkpoint is None:
+        limit = min(max(limit, 1), max(max_limit // max(len(targets), 1), 1))
+
+    # Same for the number of parallel detail-page tabs
+    default_concurrency = int(os.getenv("DEFAULT_CONCURRENCY", 1))
+    max_concurrency = int(os.getenv("MAX_CONCURRENCY", 4))
+    concurrency = request.concurrency if request.concurrency is not None else default_concurrency
+    concurrency = min(max(concurrency, 1), max_concurrency)
+
+    engine = request.engine or os.getenv("DEFAULT_ENGINE", "evaluate")
+
+    block_resources = request.block_resources
+    if block_resources is None:
+        block_resources = os.getenv("DEFAULT_BLOCK_RESOURCES", "false").lower() == "true"
+
+    proxy = request.proxy.model_dump() if request.proxy else None
+
+    # Opened here so a bad export fails the request, and before the checkpoint so there is nothing else to undo
+    sinks = []
+    try:
+        for config in request.export or []:
+            sinks.append(open_sink(f"{config.format}:{export_path(config)}"))
+    except Exception:
+        for sink in sinks:
+            sink.discard()
+        raise
+
+    if checkpoint is None and request.checkpoint:
+        checkpoint = checkpoint_store.create({**request.model_dump(include=CHECKPOINT_OPTIONS), "limit": limit})
+
+    return {
+        "limit": limit,
+        "proxy": proxy,
+        "browser_pool": browser_pool,
+        "concurrency": concurrency,
+        "engine": engine,
+        "block_resources": block_resources,
+        # Telling new or changed rows apart needs the index even without incremental
+        "seen_index": seen_index if request.incremental or request.deep_scrape_changed else None,
+        "recheck_changed": request.recheck_changed,
+        "session_cache": session_cache,
+        "proxy_pool": proxy_pool if proxy_pool else None,
+        "targets": targets or None,
+        "mode": request.mode,
+        "deep_scrape_changed": request.deep_scrape_changed,
+        "typed": request.typed,
+        "history": listing_history,
+        "sinks": sinks,
+        "guard": ScrapeGuard(),
+        "checkpoint": checkpoint,
+        "governor": governor,
+        "fields": request.fields,
+    }
+
+
+EXPORT_EXTENSIONS = {"parquet": ".parquet", "csv": ".csv", "jsonl": ".jsonl", "sqlite": ".db"}
+
+
+def discard_scrape(kwargs: dict):
+    """
+    Undo build_scraper_kwargs for a scrape that won't run: close its sinks,
+    deleting their empty files, and drop a checkpoint it started
+    """
+    for sink in kwargs["sinks"]:
+        sink.discard()
+    if kwargs["checkpoint"] is not None and not kwargs["checkpoint"].resumed:
+        checkpoint_store.delete(kwargs["checkpoint"].id)
+
 
-    return await trigger_scrape_logic(limit=request.limit, proxy=proxy_dict)
+def export_path(config: ExportConfig):
+    """
+    Path of an export file under EXPORT_DIR; unnamed exports get a unique name
+    """
+    extension = EXPORT_EXTENSIONS[config.format]
+    name = config.name or f"scrape-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    if not name.endswith(extension):
+        name += extension
+    return os.path.join(os.getenv("EXPORT_DIR", "data/exports"), name)
 
 
-async def trigger_scrape_logic(limit: int = None, proxy: dict = None):
+def listing_payload(listing):
+    """
+    JSON-ready form of a listing; typed records are sent in compact form
+    """
+    return listing.to_dict() if isinstance(listing, ListingRecord) else listing
+
+
+async def iter_listing_payloads(kwargs: dict):
+    """
+    iter_scraper with every listing converted by listing_payload
+    """
+    async for listing in iter_scraper(**kwargs):
+        yield listing_payload(listing)
+
+
+async def run_scraper_payloads(kwargs: dict):
+    """
+    run_scraper with every listing converted by listing_payload
+    """
+    return [listing_payload(listing) for listing in await run_scraper(**kwargs)]
+
+
+def run_report(kwargs: dict):
+    """
+    Checkpoint of a scrape, its failed URLs and why it was cut short, if it was
+    """
+    guard = kwargs["guard"]
+    report = {}
+    if kwargs["checkpoint"] is not None:
+        report["checkpoint_id"] = kwargs["checkpoint"].id
+    if guard.failed:
+        report["failed"] = guard.failed
+    if guard.aborted:
+        report["aborted"] = guard.aborted
+    return report
+
+
+def describe_scrape(kwargs: dict):
+    """
+    One-line description of a scrape for logs
+    """
+    proxy_info = ""
+    proxy = kwargs["proxy"]
+    if proxy and proxy.get('server'):
+        proxy_info = f" with proxy {proxy['server']}"
+    targets = kwargs["targets"] or [SearchTarget()]
+    searches = ", ".join(target.url("") for target in targets)
+    exports = "".join(f", exporting {sink.format} to {sink.path}" for sink in kwargs["sinks"])
+    checkpoint = kwargs["checkpoint"]
+    if checkpoint is not None:
+        exports += f", {'resuming' if checkpoint.resumed else 'checkpoint'} {checkpoint.id}"
+    fields = f" ({', '.join(kwargs['fields'])})" if kwargs["fields"] else ""
+    return (f"limit {kwargs['limit']}, concurrency {kwargs['concurrency']}, {kwargs['mode']} mode{fields}{proxy_info}, "
+            f"searching {searches}{exports}")
+
+
+def result_cache_key(kwargs: dict):
+    """
+    Cache key of a scrape: only the options that change which listings come
+    back, so requests differing in concurrency, engine or proxy share results
+    """
+    targets = kwargs["targets"] or [SearchTarget()]
+    return json.dumps({
+        # Read per call: set_base_url (e.g. the replay server) rebinds it
+        "base_url": main.BASE_URL,
+        "targets": [target.to_dict() for target in targets],
+        "limit": kwargs["limit"],
+        "mode": kwargs["mode"],
+        "typed": kwargs["typed"],
+        "fields": sorted(kwargs["fields"]) if kwargs["fields"] else None,
+    }, sort_keys=True)
+
+
+def cache_headers(status: str, age: float):
+    """
+    Headers telling clients whether they got fresh or cached listings
+    """
+    headers = {"X-Cache-Status": status}
+    if status == "HIT":
+        headers["Age"] = str(int(age))
+        headers["Cache-Control"] = f"max-age={max(int(result_cache.ttl - age), 0)}"
+    return headers
+
+
+def classify_error(error: Exception):
+    """
+    Map a scraping exception to an HTTP status code and error payload,
+    counting it by error type for /metrics
+    """
+    error_msg = str(error)
+
+    if isinstance(error, ScrapeQueueFull):
+        logger.warning(f"Scrape rejected, too many waiting: {error_msg}")
+        status_code, content = 429, {
+            "status": "error",
+            "error_type": "too_many_scrapes",
+            "message": error_msg,
+            "retry_after": error.retry_after,
+            "suggestion": "Retry later, or queue large scrapes as background jobs (POST /jobs)."
+        }
+    elif isinstance(error, HostSaturated):
+        logger.warning(f"Scrape rejected, host saturated: {error_msg}")
+        status_code, content = 503, {
+            "status": "error",
+            "error_type": "host_saturated",
+            "message": error_msg,
+            "retry_after": error.retry_after,
+            "suggestion": "The server is out of memory for more browsers. Retry later or lower concurrency."
+        }
+    elif isinstance(error, CheckpointNotFound):
+        status_code, content = 404, {
+            "status": "error",
+            "error_type": "checkpoint_not_found",
+            "message": error_msg
+        }
+    elif isinstance(error, CheckpointInUse):
+        status_code, content = 409, {
+            "status": "error",
+            "error_type": "checkpoint_in_use",
+            "message": error_msg,
+            "suggestion": "Wait for the running crawl to finish or cancel its job before resuming it."
+        }
+    elif isinstance(error, SessionBlocked):
+        logger.error(f"Cloudflare blocked the scrape: {error_msg}")
+        status_code, content = 503, {
+            "status": "error",
+            "error_type": "cloudflare_blocked",
+            "message": error_msg,
+            "suggestion": "Every browser session tried was blocked. Try again later or with other proxies."
+        }
+    # Provide more specific error messages for common proxy issues
+    elif "Proxy validation failed" in error_msg:
+        logger.error(f"Proxy validation error: {error_msg}")
+        status_code, content = 400, {
+            "status": "error",
+            "error_type": "proxy_validation_failed",
+            "message": error_msg,
+            "suggestion": "Check if your proxy server is running and accessible. Verify the proxy URL format and credentials."
+        }
+    elif "NS_ERROR_PROXY_BAD_GATEWAY" in error_msg:
+        logger.error(f"Proxy gateway error: {error_msg}")
+        status_code, content = 400, {
+            "status": "error",
+            "error_type": "proxy_bad_gateway",
+            "message": "The proxy server returned a bad gateway error",
+            "suggestion": "The proxy server may be down, overloaded, or misconfigured. Try a different proxy server."
+        }
+    elif "export" in error_msg.lower():
+        logger.error(f"Export error: {error_msg}")
+        status_code, content = 400, {
+            "status": "error",
+            "error_type": "export_error",
+            "message": error_msg,
+            "suggestion": "Check the export format and that its library is installed on the server."
+        }
+    elif "proxy" in error_msg.lower():
+        logger.error(f"Proxy-related error: {error_msg}")
+        status_code, content = 400, {
+            "status": "error",
+            "error_type": "proxy_error",
+            "message": error_msg,
+            "suggestion": "Check your proxy configuration. Ensure the proxy server supports the required protocol (HTTP/SOCKS5)."
+        }
+    else:
+        logger.error(f"General scraping error: {error_msg}")
+        status_code, content = 500, {
+            "status": "error",
+            "error_type": "scraping_error",
+            "message": f"Failed to run scraper: {error_msg}"
+        }
+
+    errors_total.inc(error_type=content["error_type"])
+    return status_code, content
+
+
+async def trigger_scrape_logic(request: ScrapeRequest):
     """
     Common logic for both GET and POST endpoints
     """
     try:
-        # Get default values from environment or use hardcoded defaults
-        default_limit = int(os.getenv("DEFAULT_LIMIT", 5))
-        max_limit = int(os.getenv("MAX_LIMIT", 20))
+        if request.stream:
+            # A stream can't change its status once started, so turn it away up front
+            governor.check()
 
-        # Use default if limit not provided
-        if limit is None:
-            limit = default_limit
+        kwargs = build_scraper_kwargs(request)
 
-        # Ensure limit is between 1 and max_limit
-        limit = min(max(limit, 1), max_limit)
+        logger.info(f"Webhook received - starting scraper with {describe_scrape(kwargs)}")
 
-        proxy_info = ""
-        if proxy and proxy.get('server'):
-            proxy_info = f" with proxy {proxy['server']}"
+        if request.stream:
+            return StreamingResponse(
+                stream_scrape(kwargs, request.stream),
+                media_type=STREAM_MEDIA_TYPES[request.stream],
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+            )
+
+        # Incremental runs depend on (and update) the seen index, and exports
+        # and checkpoints have to see the listings to write them, so never share those
+        if request.cache and kwargs["seen_index"] is None and not kwargs["sinks"] and kwargs["checkpoint"] is None:
+            listings, cache_status, age = await result_cache.get_or_run(
+                result_cache_key(kwargs), lambda: run_scraper_payloads(kwargs))
+            if cache_status == "HIT":
+                logger.info(f"Serving cached results ({age:.0f}s old)")
+            elif cache_status == "COALESCED":
+                logger.info("Joined an identical in-flight scrape")
+        else:
+            listings = await run_scraper_payloads(kwargs)
+            cache_status, age = "BYPASS", 0.0
+
+        content = {
+            "status": "success",
+            "count": len(listings),
+            "listings": listings
+        }
+        if kwargs["sinks"]:
+            content["exports"] = [sink.to_dict() for sink in kwargs["sinks"]]
+        # Cached and coalesced results come from another request's scrape
+        if cache_status in ("MISS", "BYPASS"):
+            content.update(run_report(kwargs))
+            if kwargs["guard"].aborted:
+                content["status"] = "partial"
+                if cache_status == "MISS":
+                    result_cache.discard(result_cache_key(kwargs))
+
+        return JSONResponse(status_code=200, content=content, headers=cache_headers(cache_status, age))
+    except Exception as e:
+        status_code, content = classify_error(e)
+        headers = {"Retry-After": str(e.retry_after)} if isinstance(e, HostSaturated) else None
+        return JSONResponse(status_code=status_code, content=content, headers=headers)
+
+
+STREAM_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "sse": "text/event-stream",
+}
+
+
+def format_event(event: dict, stream_format: str):
+    """
+    Serialize one stream event as an NDJSON line or an SSE message
+    """
+    data = json.dumps(event, ensure_ascii=False)
+    if stream_format == "sse":
+        return f"event: {event['type']}\ndata: {data}\n\n"
+    return data + "\n"
+
+
+async def stream_scrape(kwargs: dict, stream_format: str):
+    """
+    Run the scraper and emit each listing as soon as it is scraped, with
+    progress events in between, so nothing is buffered server-side
+    """
+    start_time = time.time()
+    count = 0
+    start = {"type": "start", "limit": kwargs["limit"]}
+    if kwargs["checkpoint"] is not None:
+        # Known before anything can go wrong, so a dropped stream can be resumed
+        start["checkpoint_id"] = kwargs["checkpoint"].id
+    yield format_event(start, stream_format)
+
+    try:
+        async for listing_data in iter_listing_payloads(kwargs):
+            count += 1
+            yield format_event({"type": "listing", "index": count - 1, "listing": listing_data}, stream_format)
+            yield format_event({
+                "type": "progress",
+                "count": count,
+                "limit": kwargs["limit"],
+                "elapsed_seconds": round(time.time() - start_time, 2)
+            }, stream_format)
+    except Exception as e:
+        # Headers are already sent, so errors are reported in-band
+        _, content = classify_error(e)
+        yield format_event({"type": "error", **content}, stream_format)
+        return
+
+    done = {
+        "type": "done",
+        "status": "success",
+        "count": count,
+        "elapsed_seconds": round(time.time() - start_time, 2)
+    }
+    if kwargs["sinks"]:
+        done["exports"] = [sink.to_dict() for sink in kwargs["sinks"]]
+    done.update(run_report(kwargs))
+    if kwargs["guard"].aborted:
+        done["status"] = "partial"
+    yield format_event(done, stream_format)
 
-        logger.info(f"Webhook received - starting scraper with limit {limit}{proxy_info}")
-        listings = await run_scraper(limit, proxy)
 
+@app.post("/jobs", status_code=202)
+async def create_job(request: ScrapeRequest):
+    """
+    Queue a scrape as a background job and return its ID immediately
+    """
+    max_job_limit = int(os.getenv("MAX_JOB_LIMIT", 500))
+    try:
+        kwargs = build_scraper_kwargs(request.model_copy(update={"checkpoint": True}), max_limit=max_job_limit)
+    except Exception as e:
+        status_code, content = classify_error(e)
+        return JSONResponse(status_code=status_code, content=content)
+    try:
+        job = job_manager.submit(kwargs, description=describe_scrape(kwargs))
+    except JobQueueFull as e:
+        discard_scrape(kwargs)
         return JSONResponse(
-            status_code=200,
+            status_code=429,
             content={
-                "status": "success",
-                "count": len(listings),
-                "listings": listings
+                "status": "error",
+                "error_type": "job_queue_full",
+                "message": str(e),
+                "suggestion": "Wait for running jobs to finish or cancel queued ones."
             }
         )
+
+    logger.info(f"Job {job.id} queued with {job.description}")
+    return {**job.to_dict(), **run_report(kwargs)}
+
+
+@app.get("/jobs")
+async def list_jobs():
+    """
+    List known jobs, oldest first
+    """
+    return {"jobs": [job.to_dict() for job in job_manager.list()]}
+
+
+def job_not_found(job_id: str):
+    return JSONResponse(
+        status_code=404,
+        content={
+            "status": "error",
+            "error_type": "job_not_found",
+            "message": f"No job with ID {job_id}"
+        }
+    )
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Status of a job
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        return job_not_found(job_id)
+    return {**job.to_dict(), **run_report(job.options)}
+
+
+@app.get("/jobs/{job_id}/results")
+async def get_job_results(job_id: str, offset: int = 0):
+    """
+    Results of a job so far, starting at ``offset`` so clients can poll for new ones
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        return job_not_found(job_id)
+
+    offset = max(offset, 0)
+    listings = job.results[offset:]
+    return {
+        **job.to_dict(),
+        **run_report(job.options),
+        "offset": offset,
+        "next_offset": offset + len(listings),
+        "listings": listings
+    }
+
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """
+    Cancel a queued or running job, keeping the results scraped so far
+    """
+    job = job_manager.cancel(job_id)
+    if job is None:
+        return job_not_found(job_id)
+    logger.info(f"Job {job.id} cancellation requested")
+    return job.to_dict()
+
+
+def work_queue_disabled():
+    return JSONResponse(
+        status_code=503,
+        content={
+            "status": "error",
+            "error_type": "work_queue_disabled",
+            "message": "Distributed crawls are not enabled on this server",
+            "suggestion": "Set WORK_QUEUE_PATH and run worker.py processes, or use /jobs."
+        }
+    )
+
+
+def crawl_not_found(crawl_id: str):
+    return JSONResponse(
+        status_code=404,
+        content={
+            "status": "error",
+            "error_type": "crawl_not_found",
+            "message": f"No crawl with ID {crawl_id}"
+        }
+    )
+
+
+@app.post("/crawls", status_code=202)
+async def create_crawl(request: ScrapeRequest):
+    """
+    Queue a scrape for the worker processes and return its ID immediately
+
+    The API process only enqueues the first results page of each search;
+    workers page through the results, share the listing pages between them
+    and store each listing once. Proxy, incremental, export and streaming
+    options are not supported here, and the queue itself is the checkpoint.
+    """
+    if work_queue is None:
+        return work_queue_disabled()
+
+    max_job_limit = int(os.getenv("MAX_JOB_LIMIT", 500))
+    try:
+        kwargs = build_scraper_kwargs(
+            request.model_copy(update={"export": None, "checkpoint": False, "resume": None}), max_limit=max_job_limit)
     except Exception as e:
-        error_msg = str(e)
-
-        # Provide more specific error messages for common proxy issues
-        if "Proxy validation failed" in error_msg:
-            logger.error(f"Proxy validation error: {error_msg}")
-            return JSONResponse(
-                status_code=400,
-                content={
-                    "status": "error",
-                    "error_type": "proxy_validation_failed",
-                    "message": error_msg,
-                    "suggestion": "Check if your proxy server is running and accessible. Verify the proxy URL format and credentials."
-                }
-            )
-        elif "NS_ERROR_PROXY_BAD_GATEWAY" in error_msg:
-            logger.error(f"Proxy gateway error: {error_msg}")
-            return JSONResponse(
-                status_code=400,
-                content={
-                    "status": "error",
-                    "error_type": "proxy_bad_gateway",
-                    "message": "The proxy server returned a bad gateway error",
-                    "suggestion": "The proxy server may be down, overloaded, or misconfigured. Try a different proxy server."
-                }
-            )
-        elif "proxy" in error_msg.lower():
-            logger.error(f"Proxy-related error: {error_msg}")
-            return JSONResponse(
-                status_code=400,
-                content={
-                    "status": "error",
-                    "error_type": "proxy_error",
-                    "message": error_msg,
-                    "suggestion": "Check your proxy configuration. Ensure the proxy server supports the required protocol (HTTP/SOCKS5)."
-                }
-            )
+        status_code, content = classify_error(e)
+        return JSONResponse(status_code=status_code, content=content)
+
+    options = {
+        "mode": kwargs["mode"],
+        "engine": kwargs["engine"],
+        "block_resources": kwargs["block_resources"],
+        "typed": kwargs["typed"],
+        "fields": kwargs["fields"],
+    }
+    crawl_id = work_queue.create_crawl(
+        options, kwargs["limit"], first_pages(kwargs["targets"]), description=describe_scrape(kwargs))
+    logger.info(f"Crawl {crawl_id} queued with {describe_scrape(kwargs)}")
+    return work_queue.crawl_status(crawl_id)
+
+
+@app.get("/crawls/{crawl_id}")
+async def get_crawl(crawl_id: str):
+    """
+    Progress of a crawl: task counts, listings stored and failed URLs
+    """
+    if work_queue is None:
+        return work_queue_disabled()
+    status = work_queue.crawl_status(crawl_id)
+    if status is None:
+        return crawl_not_found(crawl_id)
+    return status
+
+
+@app.get("/crawls/{crawl_id}/results")
+async def get_crawl_results(crawl_id: str, offset: int = 0):
+    """
+    Listings of a crawl so far, starting at ``offset`` so clients can poll for new ones
+    """
+    if work_queue is None:
+        return work_queue_disabled()
+    status = work_queue.crawl_status(crawl_id)
+    if status is None:
+        return crawl_not_found(crawl_id)
+
+    offset = max(offset, 0)
+    listings = work_queue.results(crawl_id, offset)
+    if work_queue.crawl_options(crawl_id).get("typed"):
+        listings = [listing_payload(ListingRecord.from_raw(listing)) for listing in listings]
+    return {
+        **status,
+        "offset": offset,
+        "next_offset": offset + len(listings),
+        "listings": listings
+    }
+
+
+@app.delete("/crawls/{crawl_id}")
+async def cancel_crawl(crawl_id: str):
+    """
+    Stop handing out a crawl's remaining tasks, keeping the listings stored so far
+    """
+    if work_queue is None:
+        return work_queue_disabled()
+    if not work_queue.cancel(crawl_id):
+        return crawl_not_found(crawl_id)
+    logger.info(f"Crawl {crawl_id} cancelled")
+    return work_queue.crawl_status(crawl_id)
+
+
+def checkpoint_not_found(checkpoint_id: str):
+    return JSONResponse(
+        status_code=404,
+        content={
+            "status": "error",
+            "error_type": "checkpoint_not_found",
+            "message": f"No checkpoint with ID {checkpoint_id}"
+        }
+    )
+
+
+@app.get("/checkpoints")
+async def list_checkpoints(limit: int = 50):
+    """
+    Checkpoints of recent crawls, most recently updated first
+    """
+    return {"checkpoints": checkpoint_store.list(min(max(limit, 1), 500))}
+
+
+@app.get("/checkpoints/{checkpoint_id}")
+async def get_checkpoint(checkpoint_id: str):
+    """
+    Progress saved for a crawl: status, listings scraped, current search and
+    results page, and the listings still pending on that page
+    """
+    checkpoint = checkpoint_store.get(checkpoint_id)
+    if checkpoint is None:
+        return checkpoint_not_found(checkpoint_id)
+    return checkpoint
+
+
+@app.delete("/checkpoints/{checkpoint_id}")
+async def delete_checkpoint(checkpoint_id: str):
+    """
+    Forget a checkpoint and the listings it holds
+    """
+    try:
+        deleted = checkpoint_store.delete(checkpoint_id)
+    except CheckpointInUse as e:
+        status_code, content = classify_error(e)
+        return JSONResponse(status_code=status_code, content=content)
+    if not deleted:
+        return checkpoint_not_found(checkpoint_id)
+    return {"status": "deleted", "checkpoint_id": checkpoint_id}
+
+
+def parse_since(since: str):
+    """
+    Epoch seconds from a ``since`` parameter given as epoch seconds or an
+    ISO 8601 date/time (UTC unless it has an offset)
+    """
+    try:
+        return float(since)
+    except ValueError:
+        pass
+    moment = datetime.fromisoformat(since)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+@app.get("/changes")
+async def list_changes(since: str = None, after_id: int = None, kind: str = None, limit: int = 500):
+    """
+    Listing changes (new, relisted, removed, price_changed, description_changed)
+    recorded by scrapes after ``since`` and/or change ID ``after_id``, oldest
+    first. Pass ``last_id`` back as ``after_id`` to poll for the next delta.
+    """
+    kinds = kind.split(",") if kind else None
+    unknown = [name for name in kinds or [] if name not in CHANGE_KINDS]
+    try:
+        if unknown:
+            raise ValueError(f"Unknown change kind(s): {', '.join(unknown)}")
+        since_ts = parse_since(since) if since else None
+    except ValueError as e:
+        return JSONResponse(
+            status_code=400,
+            content={
+                "status": "error",
+                "error_type": "invalid_parameter",
+                "message": str(e),
+                "suggestion": f"Use epoch seconds or ISO 8601 for since and {', '.join(CHANGE_KINDS)} for kind."
+            }
+        )
+
+    limit = min(max(limit, 1), int(os.getenv("MAX_CHANGES_LIMIT", 5000)))
+    changes = listing_history.changes_since(since_ts, after_id, kinds, limit)
+    return {
+        "status": "success",
+        "count": len(changes),
+        "last_id": changes[-1]["id"] if changes else after_id,
+        # A full page means more changes may be waiting
+        "has_more": len(changes) == limit,
+        "changes": changes
+    }
+
+
+@app.get("/listings/{listing_id}/history")
+async def get_listing_history(listing_id: int):
+    """
+    Latest known state and price history of one listing
+    """
+    listing = listing_history.get(listing_id)
+    if listing is None:
+        return JSONResponse(
+            status_code=404,
+            content={
+                "status": "error",
+                "error_type": "listing_not_found",
+                "message": f"No history for listing {listing_id}"
+            }
+        )
+    return {**listing, "prices": listing_history.price_history(listing_id)}
+
+
+class EnrichRequest(BaseModel):
+    listing_ids: List[int] = []
+    # Listings the history and seen index don't know can be given by URL
+    urls: List[str] = []
+    fields: List[Literal[tuple(LISTING_FIELDS)]] = Field(["owner"], min_length=1)
+    proxy: Optional[ProxyConfig] = None
+    concurrency: Optional[int] = None
+    engine: Optional[Literal["evaluate", "html"]] = None
+
+
+def listing_url(listing_id: int):
+    """
+    Detail page URL of a listing scraped before, from the history or seen index
+    """
+    known = listing_history.get(listing_id) or seen_index.get(str(listing_id))
+    return known["url"] if known else None
+
+
+LISTING_PATH_PATTERN = re.compile(r"/ilan/[\w-]*?-\d+/detay")
+
+
+def is_listing_url(url: str):
+    """
+    Whether ``url`` is a listing detail page on the scraped site, the only
+    pages /enrich opens for callers
+    """
+    parts = urllib.parse.urlsplit(url)
+    base = urllib.parse.urlsplit(main.BASE_URL)
+    return ((parts.scheme, parts.netloc.lower()) == (base.scheme, base.netloc.lower())
+            and LISTING_PATH_PATTERN.fullmatch(parts.path) is not None and not parts.query and not parts.fragment)
+
+
+@app.post("/enrich")
+async def enrich(request: EnrichRequest):
+    """
+    Fetch detail page sections an earlier scrape left out, by default the
+    owner and phones, for chosen listings only
+
+    Listings are given by ID (scraped before, so their URL is known) or by
+    URL, at most MAX_ENRICH_LISTINGS per request. URLs that aren't listing
+    detail pages of the scraped site are not opened but returned in
+    ``failed``.
+    """
+    failed = []
+    urls = []
+    for listing_id in request.listing_ids:
+        url = listing_url(listing_id)
+        if url is None:
+            failed.append({"listing_id": listing_id, "error": "Unknown listing, pass its URL instead"})
         else:
-            logger.error(f"General scraping error: {error_msg}")
-            return JSONResponse(
-                status_code=500,
-                content={
-                    "status": "error",
-                    "error_type": "scraping_error",
-                    "message": f"Failed to run scraper: {error_msg}"
-                }
-            )
+            urls.append(url)
+    for url in request.urls:
+        if is_listing_url(url):
+            urls.append(url)
+        else:
+            failed.append({"url": url, "error": f"Not a listing detail page URL on {main.BASE_URL}"})
+    urls = list(dict.fromkeys(urls))
+
+    max_listings = int(os.getenv("MAX_ENRICH_LISTINGS", 50))
+    if len(urls) > max_listings:
+        return JSONResponse(
+            status_code=400,
+            content={
+                "status": "error",
+                "error_type": "too_many_listings",
+                "message": f"{len(urls)} listings requested, at most {max_listings} can be enriched at once",
+                "suggestion": "Split the listings over several requests."
+            }
+        )
+
+    guard = ScrapeGuard()
+    concurrency = min(max(request.concurrency or 1, 1), int(os.getenv("MAX_CONCURRENCY", 4)))
+    logger.info(f"Enriching {len(urls)} listing(s) with {', '.join(request.fields)}")
+    try:
+        listings = await enrich_listings(
+            urls, request.fields, proxy=request.proxy.model_dump() if request.proxy else None,
+            browser_pool=browser_pool, session_cache=session_cache, proxy_pool=proxy_pool if proxy_pool else None,
+            concurrency=concurrency, engine=request.engine or os.getenv("DEFAULT_ENGINE", "evaluate"),
+            guard=guard, governor=governor) if urls else []
+    except Exception as e:
+        status_code, content = classify_error(e)
+        headers = {"Retry-After": str(e.retry_after)} if isinstance(e, HostSaturated) else None
+        return JSONResponse(status_code=status_code, content=content, headers=headers)
+
+    for listing in listings:
+        listing_id = listing_id_from_url(listing["url"])
+        if listing_id is not None:
+            listing["listing_id"] = int(listing_id)
+    content = {"status": "success", "count": len(listings), "listings": listings}
+    if failed or guard.failed:
+        content["failed"] = failed + guard.failed
+    return content
+
+
+@app.get("/proxies")
+async def list_proxies():
+    """
+    Health, latency and ban status of every proxy in the pool
+    """
+    return proxy_pool.to_dict()
+
+
+cloudflare_solves_total = registry.counter(
+    "scraper_cloudflare_solves_total", "Cloudflare challenge solves by result", labels=("result",))
+cloudflare_clearance_total = registry.counter(
+    "scraper_cloudflare_clearance_total",
+    "Results page opens by whether a cached or warm clearance was reused (true, false) or there was none (cold)",
+    labels=("reused",))
+result_cache_lookups_total = registry.counter(
+    "scraper_result_cache_lookups_total", "Result cache lookups by status", labels=("status",))
+result_cache_entries = registry.gauge("scraper_result_cache_entries", "Scrape results held in the result cache")
+jobs_gauge = registry.gauge("scraper_jobs", "Known background jobs by status", labels=("status",))
+idle_browsers = registry.gauge("scraper_browser_pool_idle", "Warm browsers waiting for a lease")
+available_proxies = registry.gauge("scraper_proxies_available", "Pool proxies that are healthy and not banned")
+queue_tasks = registry.gauge("scraper_work_queue_tasks", "Distributed crawl tasks by status", labels=("status",))
+browsers_gauge = registry.gauge("scraper_browsers", "Browsers holding a slot of the resource governor")
+waiting_scrapes = registry.gauge("scraper_scrapes_waiting", "Scrapes waiting for a browser slot or pooled browser")
+browser_rss_bytes = registry.gauge("scraper_browser_rss_bytes", "Resident memory of this server's browser processes")
+memory_available_bytes = registry.gauge(
+    "scraper_memory_available_bytes", "Memory still available to the server (host or container limit)")
+
+
+def collect_metrics():
+    """
+    Copy the state kept by the other components into the registry
+    """
+    cloudflare = cloudflare_stats.to_dict()
+    cloudflare_solves_total.set_total(cloudflare["solves_succeeded"], result="succeeded")
+    cloudflare_solves_total.set_total(cloudflare["solves_attempted"] - cloudflare["solves_succeeded"], result="failed")
+    cloudflare_clearance_total.set_total(cloudflare["cache_hits"], reused="true")
+    cloudflare_clearance_total.set_total(cloudflare["cache_misses"], reused="false")
+    cloudflare_clearance_total.set_total(cloudflare["cold_starts"], reused="cold")
+
+    cache = result_cache.to_dict()
+    for status in ("hits", "misses", "coalesced"):
+        result_cache_lookups_total.set_total(cache[status], status=status)
+    result_cache_entries.set(cache["entries"])
+
+    statuses = [job.status for job in job_manager.list()]
+    for status in ("queued", "running", "completed", "failed", "cancelled"):
+        jobs_gauge.set(statuses.count(status), status=status)
+
+    idle_browsers.set(browser_pool.idle if browser_pool is not None else 0)
+    available_proxies.set(sum(state.available for state in proxy_pool.states.values()))
+
+    browsers_gauge.set(governor.browsers)
+    waiting_scrapes.set(governor.waiting)
+    # Measured at most every few seconds by the governor, not on every scrape of /metrics
+    rss = governor.measured_rss
+    if rss is not None:
+        browser_rss_bytes.set(rss)
+    available = available_memory()
+    if available is not None:
+        memory_available_bytes.set(available)
+
+    if work_queue is not None:
+        tasks = work_queue.stats()
+        for status in ("pending", "leased", "done", "failed"):
+            queue_tasks.set(tasks.get(status, 0), status=status)
+
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Prometheus metrics: phase duration histograms, listings, errors by type
+    and the state of the caches, job queue, browser pool, proxy pool and
+    browser memory
+    """
+    collect_metrics()
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy"}
+    return {
+        "status": "healthy",
+        "cloudflare": cloudflare_stats.to_dict(),
+        "result_cache": result_cache.to_dict(),
+        "resources": governor.to_dict(),
+    }
 
 if __name__ == "__main__":
     import uvicorn
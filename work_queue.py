@@ -0,0 +1,305 @@
+import json
+import os
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+
+from search import SearchTarget
+
+
+class WorkQueue:
+    """SQLite-backed queue of crawl tasks shared by API and worker processes
+
+    The API creates a crawl and enqueues its first results pages; workers
+    (worker.py, each with its own browser) lease tasks, enqueue the listing
+    detail pages they find and store the scraped listings. Leases expire
+    after ``lease_seconds`` so a task held by a crashed worker goes back to
+    the queue, and failed tasks are retried with exponential backoff up to
+    ``max_attempts`` times. Listing tasks and results are unique per crawl
+    and listing ID, so a listing is scraped and returned once per crawl no
+    matter how many workers see it.
+
+    Every process opens its own connection to the same file, so replicas
+    on one host (or sharing a volume) coordinate through SQLite locks.
+    """
+
+    def __init__(self, path=None, lease_seconds=None, max_attempts=None, retry_delay=None):
+        if path is None:
+            path = os.getenv("WORK_QUEUE_PATH", "data/work_queue.db")
+        if lease_seconds is None:
+            lease_seconds = float(os.getenv("WORK_LEASE_SECONDS", 300))
+        if max_attempts is None:
+            max_attempts = int(os.getenv("WORK_MAX_ATTEMPTS", 3))
+        if retry_delay is None:
+            retry_delay = float(os.getenv("WORK_RETRY_DELAY", 10))
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        # Autocommit mode, transactions are opened explicitly with BEGIN IMMEDIATE
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS crawls (
+                id TEXT PRIMARY KEY,
+                options TEXT NOT NULL,
+                max_listings INTEGER NOT NULL,
+                description TEXT,
+                created_at REAL NOT NULL,
+                cancelled INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS tasks (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                crawl_id TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                dedup_key TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                available_at REAL NOT NULL,
+                lease_owner TEXT,
+                lease_expires REAL,
+                error TEXT,
+                finished_at REAL,
+                UNIQUE (crawl_id, kind, dedup_key)
+            );
+            CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, available_at);
+            CREATE TABLE IF NOT EXISTS results (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                crawl_id TEXT NOT NULL,
+                listing_id TEXT NOT NULL,
+                data TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                UNIQUE (crawl_id, listing_id)
+            );
+        """)
+
+    def create_crawl(self, options, max_listings, first_pages, description=""):
+        """Create a crawl and enqueue its first results pages; returns the crawl ID
+
+        ``first_pages`` are results_page payloads, one per search.
+        """
+        crawl_id = uuid.uuid4().hex
+        now = time.time()
+        with transaction(self.conn):
+            self.conn.execute(
+                "INSERT INTO crawls (id, options, max_listings, description, created_at) VALUES (?, ?, ?, ?, ?)",
+                (crawl_id, json.dumps(options), max_listings, description, now))
+            for payload in first_pages:
+                self._insert_task(crawl_id, "results_page", results_page_key(payload), payload, now)
+        return crawl_id
+
+    def _insert_task(self, crawl_id, kind, dedup_key, payload, now):
+        cursor = self.conn.execute(
+            "INSERT OR IGNORE INTO tasks (crawl_id, kind, dedup_key, payload, available_at) VALUES (?, ?, ?, ?, ?)",
+            (crawl_id, kind, dedup_key, json.dumps(payload), now))
+        return cursor.rowcount == 1
+
+    def enqueue_results_page(self, crawl_id, payload):
+        with transaction(self.conn):
+            return self._insert_task(crawl_id, "results_page", results_page_key(payload), payload, time.time())
+
+    def enqueue_listings(self, crawl_id, listings):
+        """Enqueue (listing_id, payload) detail pages until the crawl's limit
+
+        Listings already queued by this crawl are skipped. Returns the number
+        of new tasks and whether the crawl has reached its limit.
+        """
+        now = time.time()
+        added = 0
+        with transaction(self.conn):
+            max_listings, = self.conn.execute(
+                "SELECT max_listings FROM crawls WHERE id = ?", (crawl_id,)).fetchone()
+            queued, = self.conn.execute(
+                "SELECT COUNT(*) FROM tasks WHERE crawl_id = ? AND kind = 'listing'", (crawl_id,)).fetchone()
+            for listing_id, payload in listings:
+                if queued >= max_listings:
+                    break
+                if self._insert_task(crawl_id, "listing", listing_id, payload, now):
+                    queued += 1
+                    added += 1
+        return added, queued >= max_listings
+
+    def add_results(self, crawl_id, listings):
+        """Store (listing_id, data) results until the crawl's limit
+
+        A listing already stored for the crawl is kept as is. Returns the
+        number stored and whether the crawl has reached its limit.
+        """
+        now = time.time()
+        added = 0
+        with transaction(self.conn):
+            max_listings, = self.conn.execute(
+                "SELECT max_listings FROM crawls WHERE id = ?", (crawl_id,)).fetchone()
+            stored, = self.conn.execute(
+                "SELECT COUNT(*) FROM results WHERE crawl_id = ?", (crawl_id,)).fetchone()
+            for listing_id, data in listings:
+                if stored >= max_listings:
+                    break
+                cursor = self.conn.execute(
+                    "INSERT OR IGNORE INTO results (crawl_id, listing_id, data, created_at) VALUES (?, ?, ?, ?)",
+                    (crawl_id, listing_id, json.dumps(data, ensure_ascii=False), now))
+                if cursor.rowcount == 1:
+                    stored += 1
+                    added += 1
+        return added, stored >= max_listings
+
+    def lease(self, worker_id):
+        """Lease the next runnable task to ``worker_id``, or None if there is none
+
+        Results pages go first so crawls keep discovering listings. Expired
+        leases are taken over, or failed once their attempts are used up.
+        """
+        now = time.time()
+        with transaction(self.conn):
+            self.conn.execute("""
+                UPDATE tasks SET status = 'failed', error = COALESCE(error, 'Lease expired'), finished_at = ?
+                WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?
+            """, (now, now, self.max_attempts))
+            row = self.conn.execute("""
+                SELECT t.id, t.crawl_id, t.kind, t.payload, t.attempts, c.options
+                FROM tasks t JOIN crawls c ON c.id = t.crawl_id
+                WHERE c.cancelled = 0 AND (
+                    (t.status = 'pending' AND t.available_at <= ?)
+                    OR (t.status = 'leased' AND t.lease_expires < ?))
+                ORDER BY t.kind = 'results_page' DESC, t.id
+                LIMIT 1
+            """, (now, now)).fetchone()
+            if row is None:
+                return None
+            task_id, crawl_id, kind, payload, attempts, options = row
+            self.conn.execute(
+                "UPDATE tasks SET status = 'leased', lease_owner = ?, lease_expires = ?, attempts = attempts + 1 "
+                "WHERE id = ?", (worker_id, now + self.lease_seconds, task_id))
+        return {
+            "id": task_id,
+            "crawl_id": crawl_id,
+            "kind": kind,
+            "payload": json.loads(payload),
+            "attempt": attempts + 1,
+            "options": json.loads(options),
+        }
+
+    def complete(self, task, worker_id):
+        """Mark a leased task done; ignored if the lease was lost to another worker"""
+        with transaction(self.conn):
+            self.conn.execute(
+                "UPDATE tasks SET status = 'done', error = NULL, finished_at = ? "
+                "WHERE id = ? AND lease_owner = ? AND status = 'leased'",
+                (time.time(), task["id"], worker_id))
+
+    def fail(self, task, worker_id, error):
+        """Retry a leased task after a backoff, or fail it once out of attempts"""
+        now = time.time()
+        with transaction(self.conn):
+            if task["attempt"] >= self.max_attempts:
+                self.conn.execute(
+                    "UPDATE tasks SET status = 'failed', error = ?, finished_at = ? "
+                    "WHERE id = ? AND lease_owner = ? AND status = 'leased'",
+                    (error, now, task["id"], worker_id))
+            else:
+                delay = self.retry_delay * 2 ** (task["attempt"] - 1)
+                self.conn.execute(
+                    "UPDATE tasks SET status = 'pending', error = ?, available_at = ?, lease_owner = NULL "
+                    "WHERE id = ? AND lease_owner = ? AND status = 'leased'",
+                    (error, now + delay, task["id"], worker_id))
+
+    def cancel(self, crawl_id):
+        """Stop leasing a crawl's tasks; returns False for an unknown crawl"""
+        with transaction(self.conn):
+            cursor = self.conn.execute("UPDATE crawls SET cancelled = 1 WHERE id = ?", (crawl_id,))
+        return cursor.rowcount == 1
+
+    def crawl_status(self, crawl_id):
+        """Progress of a crawl, or None for an unknown crawl"""
+        crawl = self.conn.execute(
+            "SELECT max_listings, description, created_at, cancelled FROM crawls WHERE id = ?",
+            (crawl_id,)).fetchone()
+        if crawl is None:
+            return None
+        max_listings, description, created_at, cancelled = crawl
+        tasks = {}
+        for kind, status, count in self.conn.execute(
+                "SELECT kind, status, COUNT(*) FROM tasks WHERE crawl_id = ? GROUP BY kind, status", (crawl_id,)):
+            tasks.setdefault(kind, {})[status] = count
+        results, = self.conn.execute("SELECT COUNT(*) FROM results WHERE crawl_id = ?", (crawl_id,)).fetchone()
+        failed = self.conn.execute(
+            "SELECT kind, payload, error FROM tasks WHERE crawl_id = ? AND status = 'failed' ORDER BY id",
+            (crawl_id,)).fetchall()
+
+        by_status = {}
+        for counts in tasks.values():
+            for task_status, count in counts.items():
+                by_status[task_status] = by_status.get(task_status, 0) + count
+        if cancelled:
+            status = "cancelled"
+        elif not by_status.get("pending") and not by_status.get("leased"):
+            status = "completed"
+        elif by_status.get("leased") or by_status.get("done") or by_status.get("failed"):
+            status = "running"
+        else:
+            status = "queued"
+        return {
+            "crawl_id": crawl_id,
+            "status": status,
+            "description": description,
+            "limit": max_listings,
+            "count": results,
+            "tasks": tasks,
+            "failed": [failed_task(kind, json.loads(payload), error) for kind, payload, error in failed],
+            "created_at": created_at,
+        }
+
+    def crawl_options(self, crawl_id):
+        row = self.conn.execute("SELECT options FROM crawls WHERE id = ?", (crawl_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def results(self, crawl_id, offset=0, limit=None):
+        """Stored listings of a crawl in the order they were scraped"""
+        rows = self.conn.execute(
+            "SELECT data FROM results WHERE crawl_id = ? ORDER BY seq LIMIT ? OFFSET ?",
+            (crawl_id, -1 if limit is None else limit, offset)).fetchall()
+        return [json.loads(data) for data, in rows]
+
+    def stats(self):
+        """Task counts by status across all crawls"""
+        return dict(self.conn.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall())
+
+    def close(self):
+        self.conn.close()
+
+
+@contextmanager
+def transaction(conn):
+    """BEGIN IMMEDIATE ... COMMIT, so concurrent processes serialize their writes"""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+def failed_task(kind, payload, error):
+    """What a client needs to retry a failed task: the listing URL or the results page"""
+    failed = {"kind": kind, "error": error}
+    for key in ("url", "search", "offset"):
+        if key in payload:
+            failed[key] = payload[key]
+    return failed
+
+
+def first_pages(targets):
+    """results_page payloads starting each of ``targets`` (default: Bursa for sale)"""
+    return [
+        {"search": target.url(""), "target": target.to_dict(), "offset": 0}
+        for target in targets or [SearchTarget()]
+    ]
+
+
+def results_page_key(payload):
+    return f"{payload['search']}@{payload['offset']}"
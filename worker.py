@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Worker process for distributed crawls
+
+Drains the shared work queue (see work_queue.py) with its own browser:
+results pages are turned into listing tasks that any worker can pick up,
+and listing pages are scraped into their crawl's results. Start as many
+workers as the host (or hosts sharing the queue file) can run browsers;
+webhook_server.py only creates crawls and serves their results.
+
+Usage:
+    WORK_QUEUE_PATH=data/work_queue.db python worker.py
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import time
+import uuid
+
+from camoufox import AsyncCamoufox
+
+from extraction import summary_from_row
+from main import (HostThrottle, build_browser_options, collect_result_rows, load_results_page, new_session_page,
+                  open_listings_page, fetch_listing_details)
+from pacing import AdaptivePacer
+from proxy_pool import ProxyPool
+from resilience import ListingGone
+from resource_blocking import blocking_resources
+from search import SearchTarget
+from seen_index import listing_id_from_url
+from session_cache import SessionCache, session_key
+from work_queue import WorkQueue
+
+
+class Worker:
+    """Leases crawl tasks and runs them in one long-lived browser
+
+    The browser is launched on the first task, cleared through Cloudflare
+    and recycled after ``recycle_after`` tasks or any failed task, so a
+    blocked or broken session is not reused. Without tasks the worker
+    polls the queue every ``poll_interval`` seconds.
+    """
+
+    def __init__(self, queue, worker_id=None, poll_interval=None, recycle_after=None, session_cache=None,
+                 proxy_pool=None):
+        if worker_id is None:
+            worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        if poll_interval is None:
+            poll_interval = float(os.getenv("WORKER_POLL_INTERVAL", 2))
+        if recycle_after is None:
+            recycle_after = int(os.getenv("WORKER_RECYCLE_AFTER", 100))
+        self.queue = queue
+        self.id = worker_id
+        self.poll_interval = poll_interval
+        self.recycle_after = recycle_after
+        self.session_cache = session_cache
+        self.proxy_pool = proxy_pool
+        self.pacer = AdaptivePacer()
+        self.throttle = HostThrottle()
+        self.camoufox = None
+        self.page = None
+        self.proxy = None
+        self.page_tasks = 0
+        self.tasks_done = 0
+        self.tasks_failed = 0
+
+    async def open_browser(self):
+        self.proxy = self.proxy_pool.acquire(sticky_key=self.id) if self.proxy_pool else None
+        key = session_key(self.proxy)
+        session = self.session_cache.load(key) if self.session_cache else None
+        user_agent = session['user_agent'] if session else None
+
+        self.camoufox = AsyncCamoufox(**build_browser_options(self.proxy, user_agent))
+        browser = await self.camoufox.__aenter__()
+        try:
+            self.page = await new_session_page(browser, session)
+            start = time.perf_counter()
+            cleared = await open_listings_page(self.page, self.session_cache, key, warm=session is not None)
+            if self.proxy_pool is not None:
+                self.proxy_pool.report(self.proxy, ok=cleared, latency=time.perf_counter() - start,
+                                       banned=not cleared)
+            if not cleared:
+                raise Exception("Could not pass Cloudflare")
+        except Exception:
+            await self.close_browser()
+            raise
+        self.page_tasks = 0
+
+    async def close_browser(self):
+        if self.camoufox is not None:
+            try:
+                await self.camoufox.__aexit__(None, None, None)
+            except Exception as e:
+                print(f"Error closing worker browser: {str(e)}")
+        self.camoufox = None
+        self.page = None
+
+    async def run(self, stop=None):
+        """Work until ``stop`` (an asyncio.Event) is set, or forever"""
+        print(f"👷 Worker {self.id} polling {self.queue.path}")
+        try:
+            while stop is None or not stop.is_set():
+                task = self.queue.lease(self.id)
+                if task is None:
+                    await asyncio.sleep(self.poll_interval)
+                    continue
+                await self.run_task(task)
+        finally:
+            await self.close_browser()
+
+    async def run_task(self, task):
+        try:
+            if self.page is None:
+                await self.open_browser()
+            async with blocking_resources(self.page.context, task["options"].get("block_resources", False)):
+                if task["kind"] == "results_page":
+                    await self.scrape_results_page(task)
+                else:
+                    await self.scrape_listing(task)
+        except Exception as e:
+            self.tasks_failed += 1
+            print(f"Task {task['id']} ({task['kind']}, attempt {task['attempt']}) failed: {str(e)}")
+            self.queue.fail(task, self.id, str(e))
+            await self.close_browser()
+            # Don't burn through the queue while the site or proxy is failing
+            await asyncio.sleep(self.poll_interval)
+            return
+
+        self.queue.complete(task, self.id)
+        self.tasks_done += 1
+        self.page_tasks += 1
+        if self.page_tasks >= self.recycle_after:
+            await self.close_browser()
+        await self.pacer.wait()
+
+    async def scrape_results_page(self, task):
+        """Queue the listings of one results page, then the next page if needed"""
+        payload = task["payload"]
+        options = task["options"]
+        target = SearchTarget.from_dict(payload["target"])
+        if not await load_results_page(self.page, payload["offset"], target):
+            raise Exception(f"Could not load results page at offset {payload['offset']}")
+        rows = await collect_result_rows(self.page, options.get("engine", "evaluate"))
+
+        # Past the end the site serves the last page again
+        if not rows or rows[0]["url"] == payload.get("previous_first_url"):
+            return
+
+        matching = [row for row in rows if target.matches_row(row)]
+        if options.get("mode") == "summary":
+            added, full = self.queue.add_results(
+                task["crawl_id"],
+                [(listing_id_from_url(row["url"]) or row["url"], summary_from_row(row)) for row in matching])
+        else:
+            added, full = self.queue.enqueue_listings(
+                task["crawl_id"],
+                [(listing_id_from_url(row["url"]) or row["url"], {"url": row["url"]}) for row in matching])
+        print(f"Results page at offset {payload['offset']}: {added} new listing(s)")
+
+        if not full:
+            self.queue.enqueue_results_page(task["crawl_id"], {
+                **payload,
+                "offset": payload["offset"] + len(rows),
+                "previous_first_url": rows[0]["url"],
+            })
+
+    async def scrape_listing(self, task):
+        url = task["payload"]["url"]
+        await self.throttle.wait(url)
+        # The queue retries failed tasks itself, with backoff and in a fresh browser
+        try:
+            listing_data = await fetch_listing_details(
+                self.page, url, task["options"].get("engine", "evaluate"), self.pacer, task["options"].get("fields"))
+        except ListingGone as e:
+            print(f"Skipping {url}: {str(e)}")
+            return
+        self.queue.add_results(task["crawl_id"], [(listing_id_from_url(url) or url, listing_data)])
+
+
+async def run_workers(count):
+    """Run ``count`` workers in this process, each with its own browser"""
+    session_cache = SessionCache()
+    proxy_pool = ProxyPool.from_env()
+    if len(proxy_pool):
+        proxy_pool.start()
+    workers = [
+        Worker(WorkQueue(), session_cache=session_cache, proxy_pool=proxy_pool if len(proxy_pool) else None)
+        for _ in range(count)
+    ]
+    try:
+        await asyncio.gather(*(worker.run() for worker in workers))
+    finally:
+        await proxy_pool.stop()
+        for worker in workers:
+            worker.queue.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Work queue worker for distributed crawls")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WORKER_BROWSERS", 1)),
+                        help="Browsers (workers) to run in this process")
+    args = parser.parse_args()
+    try:
+        asyncio.run(run_workers(max(1, args.workers)))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()